@@ -0,0 +1,99 @@
+"""Round trip of the bedrock-batch classification mode against local stand-ins.
+
+Stages a generated CSV in a directory-backed S3 (local_s3.py), submits it as a batch
+inference job to local_batch_inference.py, collects the output and checks every row
+came back with the answer the fake model gave for it.
+
+    python benchmarks/batch_inference_roundtrip.py --tickets 5000 --fail-every 50
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'lambda', 'classify-tickets'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'shared', 'python'))
+
+from batch_inference import BatchInferenceJob  # noqa: E402
+from s3_handler import S3Handler  # noqa: E402
+from ticket_classifier import TicketClassifier  # noqa: E402
+from fake_bedrock import FakeBedrockClient, label_for  # noqa: E402
+from local_batch_inference import LocalBatchInferenceClient  # noqa: E402
+from local_s3 import LocalS3Client  # noqa: E402
+
+BUCKET = 'local-bucket'
+
+
+def staged_csv(n):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=['Id', 'Key', 'Summary', 'Description', 'Labels'])
+    writer.writeheader()
+    for i in range(n):
+        writer.writerow({
+            'Id': str(i),
+            'Key': f"PROJ-{i}",
+            'Summary': f"Cannot access dashboard {i}",
+            'Description': f"User {i} gets a 403 on the reporting dashboard.\nStarted after the last deploy, \"urgent\".",
+            'Labels': "['generated']",
+        })
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickets', type=int, default=1000)
+    parser.add_argument('--fail-every', type=int, default=0, help='fail every Nth record in the fake job')
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='batch-inference-')
+    try:
+        s3 = LocalS3Client(root)
+        s3.put_object(Bucket=BUCKET, Key='staged/backfill.csv', Body=staged_csv(args.tickets))
+        s3_handler = S3Handler(BUCKET, s3_client=s3)
+        # The synchronous client is never called; any call would show up in its counters.
+        bedrock_runtime = FakeBedrockClient()
+        classifier = TicketClassifier(bedrock_client=bedrock_runtime)
+        job = BatchInferenceJob(s3_handler, classifier, role_arn='arn:aws:iam::000000000000:role/local',
+                                bedrock_client=LocalBatchInferenceClient(s3, fail_every=args.fail_every))
+
+        started = time.perf_counter()
+        manifest = job.submit('staged/backfill.csv')
+        submitted = time.perf_counter()
+        collected = job.collect(job.load_manifest(manifest['job_name']))
+        finished = time.perf_counter()
+
+        output_key = next(o['Key'] for o in s3.list_objects_v2(Bucket=BUCKET, Prefix='processed/')['Contents'])
+        rows = S3Handler(BUCKET, s3_client=s3).read_csv(output_key)
+        expected_missing = args.tickets // args.fail_every if args.fail_every else 0
+        wrong = sum(1 for row in rows if row['Model Answer'] is not None and row['Model Answer'] != ''
+                    and row['Model Answer'] != label_for(classifier._create_chat_payload(row)[0]['content'][0]['text']))
+        unanswered = sum(1 for row in rows if not row['Model Answer'])
+        leftovers = s3.list_objects_v2(Bucket=BUCKET, Prefix=job.prefix + '/')['KeyCount']
+        result = {
+            'tickets': args.tickets,
+            'rows_written': len(rows),
+            'collected': collected,
+            'unanswered': unanswered,
+            'expected_unanswered': expected_missing,
+            'wrong_answers': wrong,
+            'synchronous_calls': bedrock_runtime.calls,
+            'leftover_job_objects': leftovers,
+            'submit_seconds': round(submitted - started, 3),
+            'collect_seconds': round(finished - submitted, 3),
+        }
+        print(json.dumps(result, indent=2))
+        ok = (collected and len(rows) == args.tickets and wrong == 0 and unanswered == expected_missing
+              and bedrock_runtime.calls == 0 and leftovers == 0)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
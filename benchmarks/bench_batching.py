@@ -0,0 +1,61 @@
+"""Tokens, requests and wall time per 1,000 tickets for single vs. batched prompts.
+
+    python benchmarks/bench_batching.py --tickets 1000 --batch-sizes 1 5 10 20
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'lambda', 'classify-tickets'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'shared', 'python'))
+
+from bedrock_dispatcher import AdaptiveDispatcher  # noqa: E402
+from ticket_classifier import TicketClassifier  # noqa: E402
+from fake_bedrock import FakeBedrockClient  # noqa: E402
+
+
+def make_tickets(n):
+    return [{
+        'Key': f"PROJ-{i}",
+        'Summary': f"Cannot access dashboard {i}",
+        'Description': f"User {i} gets a 403 when opening the reporting dashboard after the last deploy.",
+    } for i in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickets', type=int, default=1000)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 5, 10, 20])
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--output-token-latency', type=float, default=0.002)
+    parser.add_argument('--concurrency', type=int, default=10)
+    args = parser.parse_args()
+
+    tickets = make_tickets(args.tickets)
+    scale = 1000 / args.tickets
+    results = []
+    for batch_size in args.batch_sizes:
+        client = FakeBedrockClient(latency=args.latency, output_token_latency=args.output_token_latency,
+                                   capacity=10 ** 6)
+        dispatcher = AdaptiveDispatcher(initial_concurrency=args.concurrency, max_concurrency=args.concurrency)
+        classifier = TicketClassifier(bedrock_client=client, dispatcher=dispatcher, batch_size=batch_size)
+        started = time.perf_counter()
+        classified = classifier.classify_tickets(tickets)
+        elapsed = time.perf_counter() - started
+        results.append({
+            'batch_size': batch_size,
+            'requests_per_1000': round(client.calls * scale),
+            'input_tokens_per_1000': round(client.input_tokens * scale),
+            'output_tokens_per_1000': round(client.output_tokens * scale),
+            'seconds_per_1000': round(elapsed * scale, 3),
+            'unanswered': sum(1 for t in classified if t['Model Answer'] is None),
+        })
+    print(json.dumps(results, indent=2))
+    if any(r['unanswered'] for r in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""Per-tier counts, model calls and wall time for the keyword -> Haiku -> Sonnet cascade.
+
+A share of the generated tickets are obvious (automated alerts, access requests) and
+the fake Haiku returns an unparseable or unknown label for a configurable fraction of
+what it sees, which should be escalated to Sonnet.
+
+    python benchmarks/bench_cascade.py --tickets 1000 --obvious-share 0.4 --haiku-bad-rate 0.05
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'lambda', 'classify-tickets'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'shared', 'python'))
+
+from bedrock_dispatcher import AdaptiveDispatcher  # noqa: E402
+from keyword_classifier import KeywordClassifier  # noqa: E402
+from prompts import CLASSIFICATIONS  # noqa: E402
+from ticket_classifier import TicketClassifier  # noqa: E402
+from fake_bedrock import FakeBedrockClient, default_responder  # noqa: E402
+
+OBVIOUS = [
+    ("[ALERT] CPU utilization above 90% on host-{n}",
+     "This ticket was automatically created by the monitoring system. Alarm triggered at 02:13 UTC."),
+    ("Please grant access to the billing dashboard",
+     "I need access to the billing dashboard for the Q{n} review. Currently I get 403 forbidden."),
+    ("Alarm firing: api-{n} health check failed",
+     "Automated alert: health check failed 3 times in a row for api-{n}."),
+]
+AMBIGUOUS = [
+    ("Reporting job slow since Tuesday",
+     "The nightly job {n} takes twice as long. Not sure whether data volume or the new index is to blame."),
+    ("Clean up old feature flags",
+     "We have around {n} stale flags in the service config that should be removed and tracked going forward."),
+    ("Move service {n} to the new cluster",
+     "Standard migration for service {n}, same as the others done last sprint."),
+]
+
+
+def make_tickets(n, obvious_share, seed):
+    rng = random.Random(seed)
+    tickets = []
+    for i in range(n):
+        summary, description = rng.choice(OBVIOUS if rng.random() < obvious_share else AMBIGUOUS)
+        tickets.append({'Key': f"PROJ-{i}", 'Summary': summary.format(n=i), 'Description': description.format(n=i)})
+    return tickets
+
+
+def make_responder(bad_rate, seed):
+    rng = random.Random(seed)
+    lock = threading.Lock()
+    calls = {}
+
+    def responder(model_id, messages, system):
+        with lock:
+            calls[model_id] = calls.get(model_id, 0) + 1
+            bad = model_id == TicketClassifier.HAIKU_ID and rng.random() < bad_rate
+        if bad:
+            return rng.choice(["<thinking>Unclear.</thinking>\n<answer>UNKNOWN_CATEGORY</answer>",
+                               "I think this is probably a bug."])
+        return default_responder(model_id, messages, system)
+
+    return responder, calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickets', type=int, default=1000)
+    parser.add_argument('--obvious-share', type=float, default=0.4)
+    parser.add_argument('--haiku-bad-rate', type=float, default=0.05)
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    tickets = make_tickets(args.tickets, args.obvious_share, args.seed)
+    configs = [
+        ('haiku only', dict(escalate=False)),
+        ('haiku + sonnet escalation', dict(escalate=True)),
+        ('keyword + haiku + sonnet', dict(escalate=True, keyword_classifier=KeywordClassifier())),
+    ]
+    results = []
+    for name, options in configs:
+        responder, calls = make_responder(args.haiku_bad_rate, args.seed)
+        client = FakeBedrockClient(latency=args.latency, capacity=10 ** 6, responder=responder, seed=args.seed)
+        classifier = TicketClassifier(
+            bedrock_client=client,
+            dispatcher=AdaptiveDispatcher(initial_concurrency=args.concurrency, max_concurrency=args.concurrency),
+            escalation_dispatcher=AdaptiveDispatcher(initial_concurrency=args.concurrency,
+                                                     max_concurrency=args.concurrency),
+            **options
+        )
+        started = time.perf_counter()
+        classified = classifier.classify_tickets(tickets)
+        elapsed = time.perf_counter() - started
+        results.append({
+            'config': name,
+            'haiku_calls': calls.get(TicketClassifier.HAIKU_ID, 0),
+            'sonnet_calls': calls.get(TicketClassifier.SONNET_ID, 0),
+            'invalid_answers': sum(1 for t in classified if t['Model Answer'] not in CLASSIFICATIONS),
+            'seconds': round(elapsed, 3),
+            'tiers': classifier.tier_summary(),
+        })
+    print(json.dumps(results, indent=2))
+    # Haiku alone keeps its bad answers; with escalation every answer must be an allowed label.
+    if any(r['invalid_answers'] for r in results if r['config'] != 'haiku only'):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Lambda init time and per-invocation client setup, for comparing two trees.
+
+init: wall time of `import main` for each Lambda, each sample in a fresh interpreter so
+      nothing is already imported (the interpreter's own start-up is excluded).
+invocation: time to build what the classify handler builds on every invocation
+      (S3Handler and TicketClassifier with their default AWS clients) in a warm process.
+
+No AWS calls are made; clients are only constructed.
+
+    python benchmarks/bench_cold_start.py
+    git worktree add /tmp/before HEAD~1 && python benchmarks/bench_cold_start.py --src /tmp/before
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+LAMBDAS = ['classify-tickets', 'fetch-jira-issues', 'start-glue-job']
+
+INIT_PROBE = """
+import sys, time
+sys.path[:0] = [{path!r}, {shared!r}]
+started = time.perf_counter()
+import main
+print(time.perf_counter() - started)
+"""
+
+INVOCATION_PROBE = """
+import sys, time
+sys.path[:0] = [{path!r}, {shared!r}]
+import main
+from s3_handler import S3Handler
+from ticket_classifier import TicketClassifier
+samples = []
+for _ in range({invocations}):
+    started = time.perf_counter()
+    S3Handler('bench-bucket')
+    TicketClassifier()
+    samples.append(time.perf_counter() - started)
+print(' '.join(map(str, samples)))
+"""
+
+
+def run_probe(source, env):
+    result = subprocess.run([sys.executable, '-c', source], env=env, capture_output=True, text=True, check=True)
+    # Lambda modules print at import; the measurement is always the last line.
+    return [float(v) for v in result.stdout.strip().splitlines()[-1].split()]
+
+
+def summarize(seconds):
+    ms = sorted(s * 1000 for s in seconds)
+    return {'samples': len(ms), 'median_ms': round(statistics.median(ms), 2),
+            'p95_ms': round(ms[max(0, int(len(ms) * 0.95) - 1)], 2), 'min_ms': round(ms[0], 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--src', default=os.path.join(os.path.dirname(__file__), '..'),
+                        help='root of the tree to measure (default: this one)')
+    parser.add_argument('--repeat', type=int, default=15, help='fresh interpreters per Lambda')
+    parser.add_argument('--invocations', type=int, default=50)
+    args = parser.parse_args()
+
+    env = {**os.environ, 'AWS_DEFAULT_REGION': os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'),
+           'PYTHONDONTWRITEBYTECODE': '1'}
+    root = os.path.abspath(os.path.join(args.src, 'src', 'lambda'))
+    # The shared layer; trees from before it existed carry their own copies and ignore it.
+    shared = os.path.abspath(os.path.join(args.src, 'src', 'shared', 'python'))
+    results = {'src': os.path.abspath(args.src), 'init': {}}
+    for name in LAMBDAS:
+        path = os.path.join(root, name)
+        # One discarded run so every measured sample reads .pyc files from a warm page cache.
+        run_probe(INIT_PROBE.format(path=path, shared=shared), env)
+        samples = [run_probe(INIT_PROBE.format(path=path, shared=shared), env)[0] for _ in range(args.repeat)]
+        results['init'][name] = summarize(samples)
+
+    samples = run_probe(INVOCATION_PROBE.format(path=os.path.join(root, 'classify-tickets'), shared=shared,
+                                                invocations=args.invocations), env)
+    results['invocation'] = {'first': round(samples[0] * 1000, 2), 'warm': summarize(samples[1:])}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
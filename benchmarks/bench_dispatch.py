@@ -0,0 +1,86 @@
+"""Compare the old fixed 5-worker pool against the adaptive dispatcher on a fake Bedrock.
+
+    python benchmarks/bench_dispatch.py --requests 500 --capacity 24 --throttle-rate 0.01
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'lambda', 'classify-tickets'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'shared', 'python'))
+
+from bedrock_dispatcher import AdaptiveDispatcher  # noqa: E402
+from fake_bedrock import FakeBedrockClient  # noqa: E402
+
+
+def fixed_pool(requests, function, max_workers=5):
+    """The original TicketClassifier._call_threaded: no retry, failures become None."""
+    future_to_position = {}
+    responses = [None] * len(requests)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for i, request in enumerate(requests):
+            future_to_position[executor.submit(function, request)] = i
+        for future in as_completed(future_to_position):
+            try:
+                responses[future_to_position[future]] = future.result()
+            except Exception:
+                pass
+    return responses
+
+
+def make_requests(n):
+    return [[{"role": "user", "content": [{"text": f"Ticket {i}: service is failing"}]}] for i in range(n)]
+
+
+def run(name, dispatch, client, requests):
+    def call(messages):
+        return client.converse(modelId='fake', messages=messages)['output']['message']['content'][0]['text']
+
+    started = time.perf_counter()
+    responses = dispatch(requests, call)
+    elapsed = time.perf_counter() - started
+    dropped = sum(1 for r in responses if r is None)
+    return {
+        'strategy': name,
+        'requests': len(requests),
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput_per_second': round(len(requests) / elapsed, 2),
+        'dropped': dropped,
+        'service_calls': client.calls,
+        'throttled': client.throttled,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--capacity', type=int, default=24)
+    parser.add_argument('--throttle-rate', type=float, default=0.01)
+    parser.add_argument('--max-concurrency', type=int, default=32)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    requests = make_requests(args.requests)
+
+    def client():
+        return FakeBedrockClient(latency=args.latency, capacity=args.capacity,
+                                 throttle_rate=args.throttle_rate, seed=args.seed)
+
+    dispatcher = AdaptiveDispatcher(max_concurrency=args.max_concurrency, base_delay=0.05, max_delay=1.0)
+    results = [
+        run('fixed_pool_5', fixed_pool, client(), requests),
+        run('adaptive', dispatcher.run, client(), requests),
+    ]
+    results[1]['dispatcher'] = dispatcher.stats
+    print(json.dumps(results, indent=2))
+    # The fixed pool is the baseline that drops throttled requests; the adaptive dispatcher retries them.
+    if any(r['dropped'] for r in results if r['strategy'] == 'adaptive'):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
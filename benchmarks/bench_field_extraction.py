@@ -0,0 +1,85 @@
+"""Issues per second turned into rows: parse_json_with_map vs. the compiled FieldExtractor.
+
+  parse_json_with_map   the original per-issue path parsing, first ADF text node only
+  compiled, same paths  FieldExtractor on the same mapping; rows are checked to be identical
+  compiled + ADF        FieldExtractor on jira_mappings with adf_to_text on the description
+
+Issues come from synthetic_data.py with several ADF paragraphs each, so the description
+length columns show how much of each description the first-text-node path dropped.
+Extraction is timed on its own and together with create_csv, page by page.
+
+    python benchmarks/bench_field_extraction.py --issues 20000 --paragraphs 4
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'lambda', 'fetch-jira-issues'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'shared', 'python'))
+
+from csv_utils import create_csv  # noqa: E402
+from jira_utils import adf_to_text, FieldExtractor, jira_mappings, parse_json_with_map  # noqa: E402
+from synthetic_data import SyntheticIssues  # noqa: E402
+
+FIRST_TEXT_NODE_MAPPINGS = {**jira_mappings, 'Description': ['fields.description.content.0.content.0.text']}
+
+
+def best_of(repeat, run):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def measure(name, extract, issues, repeat, page_size):
+    pages = [issues[start:start + page_size] for start in range(0, len(issues), page_size)]
+    extract_only = best_of(repeat, lambda: [list(extract(page)) for page in pages])
+    with_csv = best_of(repeat, lambda: [create_csv(extract(page), fieldnames=list(jira_mappings)) for page in pages])
+    rows = list(extract(issues))
+    lengths = [len(r.get('Description') or '') for r in rows]
+    return rows, {
+        'strategy': name,
+        'extract_issues_per_second': round(len(issues) / extract_only),
+        'extract_and_csv_issues_per_second': round(len(issues) / with_csv),
+        'mean_description_chars': round(sum(lengths) / len(lengths), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--issues', type=int, default=20000)
+    parser.add_argument('--paragraphs', type=int, default=4)
+    parser.add_argument('--description-words', type=int, default=60)
+    parser.add_argument('--page-size', type=int, default=100, help='issues per Jira page')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    shape = SyntheticIssues(description_words=args.description_words, paragraphs=args.paragraphs)
+    issues = [shape('BENCH', n) for n in range(args.issues)]
+    compiled_same = FieldExtractor(FIRST_TEXT_NODE_MAPPINGS)
+    compiled_adf = FieldExtractor(jira_mappings, transforms={'Description': adf_to_text})
+
+    results = []
+    baseline_rows, result = measure('parse_json_with_map',
+                                    lambda page: [parse_json_with_map(i, FIRST_TEXT_NODE_MAPPINGS) for i in page],
+                                    issues, args.repeat, args.page_size)
+    results.append(result)
+    rows, result = measure('compiled, same paths', compiled_same.rows, issues, args.repeat, args.page_size)
+    result['identical_rows'] = rows == baseline_rows
+    results.append(result)
+    _, result = measure('compiled + ADF', compiled_adf.rows, issues, args.repeat, args.page_size)
+    results.append(result)
+    for result in results[1:]:
+        result['extract_speedup'] = round(result['extract_issues_per_second'] /
+                                          results[0]['extract_issues_per_second'], 2)
+    print(json.dumps(results, indent=2))
+    if any(r.get('identical_rows') is False for r in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
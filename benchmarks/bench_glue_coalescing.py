@@ -0,0 +1,172 @@
+"""Glue runs for a burst of uploads with one run per file vs. coalesced batches.
+
+fetch-jira-issues writes one CSV per project, so a daily fetch lands as a burst of S3
+events; some events carry several records. The burst is delivered to the start-glue-job
+handler from concurrent threads, once with GLUE_TRIGGER_MODE=immediate and once with
+coalesce, after which the scheduled flush is invoked until nothing is pending.
+
+The Glue stand-in behaves like a job with the default of one concurrent run: a start
+while a run is in progress fails with ConcurrentRunsExceededException. The results report
+runs started, files handed to a run, files lost to rejected starts, and the spin-up time
+paid, which is runs x --startup-seconds (an assumed per-run overhead, not a measurement).
+The script exits 1 unless coalescing hands every file to exactly one run and leaves
+nothing pending.
+
+    python benchmarks/bench_glue_coalescing.py --projects 40 --max-files 50
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'lambda', 'start-glue-job'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'shared', 'python'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+from runtime import runtime  # noqa: E402
+from local_s3 import LocalS3Client  # noqa: E402
+
+BUCKET = 'bench-bucket'
+START_GLUE_MAIN = os.path.join(os.path.dirname(__file__), '..', 'src', 'lambda', 'start-glue-job', 'main.py')
+
+
+class SingleSlotGlueClient:
+    """start_job_run that admits one run at a time, each lasting run_seconds."""
+
+    def __init__(self, s3, run_seconds):
+        self.s3 = s3
+        self.run_seconds = run_seconds
+        self._lock = threading.Lock()
+        self.busy_until = 0.0
+        self.runs = []
+        self.rejected = 0
+
+    def start_job_run(self, JobName, Arguments, **kwargs):
+        with self._lock:
+            now = time.monotonic()
+            if now < self.busy_until:
+                self.rejected += 1
+                raise ClientError({'Error': {'Code': 'ConcurrentRunsExceededException',
+                                             'Message': 'Concurrent runs exceeded'}}, 'StartJobRun')
+            self.busy_until = now + self.run_seconds
+            self.runs.append(self.input_keys(Arguments))
+            return {'JobRunId': f"jr_{len(self.runs):04d}"}
+
+    def input_keys(self, arguments):
+        if '--INPUT_MANIFEST' in arguments:
+            body = self.s3.get_object(Bucket=BUCKET, Key=arguments['--INPUT_MANIFEST'])['Body'].read()
+            return [f['key'] for f in json.loads(body)['files']]
+        return [arguments['--NEW_CSV_FILE']]
+
+
+def load_handler():
+    spec = importlib.util.spec_from_file_location('start_glue_main', START_GLUE_MAIN)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.handler
+
+
+def burst_events(s3, projects, records_per_event):
+    keys = [f"unprocessed/jira_issues_PROJ{p:03d}.csv" for p in range(projects)]
+    for key in keys:
+        s3.put_object(Bucket=BUCKET, Key=key, Body=f"Id,Key\n1,{key}\n")
+    events = []
+    for start in range(0, len(keys), records_per_event):
+        events.append({'Records': [
+            {'s3': {'bucket': {'name': BUCKET}, 'object': {'key': key}}} for key in keys[start:start + records_per_event]
+        ]})
+    return keys, events
+
+
+def pending_files(s3):
+    try:
+        return json.loads(s3.get_object(Bucket=BUCKET, Key='glue-batches/pending.json')['Body'].read())['files']
+    except ClientError:
+        return []
+
+
+def run(mode, root, args):
+    s3 = LocalS3Client(os.path.join(root, mode))
+    runtime.set_client('s3', s3)
+    glue = SingleSlotGlueClient(s3, args.run_seconds)
+    runtime.set_client('glue', glue)
+    os.environ['GLUE_TRIGGER_MODE'] = mode
+    handler = load_handler()
+    keys, events = burst_events(s3, args.projects, args.records_per_event)
+
+    failed_events = 0
+
+    def deliver(event):
+        nonlocal failed_events
+        try:
+            handler(event, None)
+        except ClientError:
+            failed_events += 1
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(deliver, events))
+        # The schedule keeps firing until the window has passed and the run slot is free.
+        while mode == 'coalesce' and pending_files(s3):
+            time.sleep(args.flush_interval)
+            handler({'source': 'aws.events'}, None)
+    elapsed = time.perf_counter() - started
+
+    handed = [key for run_keys in glue.runs for key in run_keys]
+    result = {
+        'mode': mode,
+        'files': len(keys),
+        'events': len(events),
+        'glue_runs': len(glue.runs),
+        'files_per_run': round(len(handed) / max(len(glue.runs), 1), 1),
+        'files_handed_to_glue': len(set(handed)),
+        'files_lost': len(set(keys) - set(handed)),
+        'failed_events': failed_events,
+        'rejected_starts': glue.rejected,
+        'assumed_spin_up_seconds': len(glue.runs) * args.startup_seconds,
+        'seconds': round(elapsed, 3),
+    }
+    # Immediate mode is the baseline that loses files to rejected starts; coalescing must hand each over once.
+    result['correct'] = (None if mode != 'coalesce' else
+                         sorted(handed) == sorted(keys) and failed_events == 0 and not pending_files(s3))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--projects', type=int, default=40)
+    parser.add_argument('--records-per-event', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--window-seconds', type=int, default=1)
+    parser.add_argument('--max-files', type=int, default=50)
+    parser.add_argument('--run-seconds', type=float, default=0.2, help='how long the stand-in holds its one run slot')
+    parser.add_argument('--flush-interval', type=float, default=0.1, help='stands in for the one-minute schedule')
+    parser.add_argument('--startup-seconds', type=float, default=60.0, help='assumed Glue spin-up per run')
+    args = parser.parse_args()
+
+    os.environ.update(BUCKET_NAME=BUCKET, GLUE_JOB_NAME='bench-etl', IDEMPOTENCY_LEDGER='s3',
+                      GLUE_BATCH_WINDOW_SECONDS=str(args.window_seconds), GLUE_BATCH_MAX_FILES=str(args.max_files))
+    root = tempfile.mkdtemp(prefix='bench-glue-coalescing-')
+    try:
+        results = [run(mode, root, args) for mode in ('immediate', 'coalesce')]
+        print(json.dumps(results, indent=2))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+        runtime.reset()
+    if any(r['correct'] is False for r in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
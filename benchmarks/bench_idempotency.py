@@ -0,0 +1,179 @@
+"""Duplicate S3 events against the classify and start-glue-job handlers, with and without the idempotency ledger.
+
+Each staged file's event is delivered --duplicates times at once, as S3's at-least-once
+delivery and Lambda's async retries can, and then once more after the first pass has
+finished. Finally one file is re-uploaded with new content, which is new work and must
+be processed again. S3 is local_s3.py, Bedrock is fake_bedrock.py and Glue is a
+counting stand-in, wired in through runtime.set_client.
+
+For each ledger backend the results report model calls, outputs written to processed/
+and Glue job runs. With a ledger every input should be classified and staged once, and
+every output key should be derived from the input it came from. The script exits 1 if
+any backend misses those checks (without a ledger only the output keys are checked).
+
+    python benchmarks/bench_idempotency.py --files 8 --tickets 50 --duplicates 4
+"""
+import argparse
+import contextlib
+import csv
+import importlib.util
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'lambda', 'classify-tickets'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'shared', 'python'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+import main  # noqa: E402
+from metrics import metrics  # noqa: E402
+from runtime import runtime  # noqa: E402
+from fake_bedrock import FakeBedrockClient  # noqa: E402
+from local_s3 import LocalS3Client  # noqa: E402
+from synthetic_data import SyntheticIssues  # noqa: E402
+
+BUCKET = 'bench-bucket'
+START_GLUE_MAIN = os.path.join(os.path.dirname(__file__), '..', 'src', 'lambda', 'start-glue-job', 'main.py')
+
+
+class LocalContext:
+    invoked_function_arn = 'arn:aws:lambda:us-east-1:000000000000:function:classify-tickets-local'
+
+    def get_remaining_time_in_millis(self):
+        return 15 * 60 * 1000
+
+
+class CountingGlueClient:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs = []
+
+    def start_job_run(self, JobName, Arguments, **kwargs):
+        with self._lock:
+            self.runs.append(Arguments)
+            return {'JobRunId': f"jr_{len(self.runs):04d}"}
+
+
+def load_start_glue_handler():
+    # Both Lambdas call their module main, so this one is loaded under another name.
+    spec = importlib.util.spec_from_file_location('start_glue_main', START_GLUE_MAIN)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.handler
+
+
+def staged_csv(issues, file_index, tickets):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=['Id', 'Key', 'Summary', 'Description', 'Labels'])
+    writer.writeheader()
+    for i in range(tickets):
+        summary, description = issues.content(f"F{file_index}", i)
+        writer.writerow({'Id': str(i), 'Key': f"F{file_index}-{i}", 'Summary': summary,
+                         'Description': description, 'Labels': '[]'})
+    return buffer.getvalue()
+
+
+def s3_event(s3, key):
+    etag = s3.head_object(Bucket=BUCKET, Key=key)['ETag']
+    return {'Records': [{'s3': {'bucket': {'name': BUCKET}, 'object': {'key': key, 'eTag': etag.strip('"')}}}]}
+
+
+def deliver(handler, events, duplicates):
+    """Every event duplicates times, all at once. Returns the number of responses that skipped."""
+    context = LocalContext()
+    with ThreadPoolExecutor(max_workers=len(events) * duplicates) as pool:
+        responses = list(pool.map(lambda e: handler(e, context), [e for e in events for _ in range(duplicates)]))
+    return sum(1 for r in responses if 'already' in r['body'])
+
+
+def run(backend, root, args):
+    s3 = LocalS3Client(os.path.join(root, backend))
+    runtime.set_client('s3', s3)
+    bedrock = FakeBedrockClient(latency=args.latency, capacity=10 ** 6)
+    runtime.set_client('bedrock-runtime', bedrock)
+    glue = CountingGlueClient()
+    runtime.set_client('glue', glue)
+    os.environ['IDEMPOTENCY_LEDGER'] = backend
+    os.environ['IDEMPOTENCY_DB_PATH'] = os.path.join(root, f"{backend}-ledger.sqlite3")
+    start_glue = load_start_glue_handler()
+
+    issues = SyntheticIssues(seed=args.seed)
+    keys = []
+    for f in range(args.files):
+        keys.append(f"staged/staged_bench_{f:03d}.csv")
+        s3.put_object(Bucket=BUCKET, Key=keys[-1], Body=staged_csv(issues, f, args.tickets))
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        events = [s3_event(s3, key) for key in keys]
+        skipped = deliver(main.handler, events, args.duplicates)
+        skipped += deliver(main.handler, events, 1)
+        glue_skipped = deliver(start_glue, events, args.duplicates) + deliver(start_glue, events, 1)
+        calls_before_reupload = bedrock.calls
+        processed_before_reupload = len(s3.list_objects_v2(Bucket=BUCKET, Prefix='processed/').get('Contents', []))
+        s3.put_object(Bucket=BUCKET, Key=keys[0], Body=staged_csv(issues, args.files, args.tickets))
+        reupload = s3_event(s3, keys[0])
+        deliver(main.handler, [reupload], args.duplicates)
+    elapsed = time.perf_counter() - started
+
+    processed = [o['Key'] for o in s3.list_objects_v2(Bucket=BUCKET, Prefix='processed/').get('Contents', [])]
+    staged_names = [run['--OUTPUT_NAME'] for run in glue.runs]
+    stems = tuple(key.rsplit('/', 1)[-1][:-len('.csv')] for key in keys)
+    result = {
+        'ledger': backend,
+        'events': len(keys) * (args.duplicates + 1),
+        'skipped_as_duplicate': skipped,
+        'model_calls': calls_before_reupload,
+        'model_calls_per_ticket': round(calls_before_reupload / (args.files * args.tickets), 2),
+        'processed_files': processed_before_reupload,
+        'reupload_outputs': len(processed) - processed_before_reupload,
+        'output_keys_from_input': sum(1 for k in processed if k.rsplit('/', 1)[-1].startswith(
+            tuple(f"processed_{stem}_" for stem in stems))),
+        'glue_job_runs': len(glue.runs),
+        'glue_skipped_as_duplicate': glue_skipped,
+        'distinct_staged_names': len(set(staged_names)),
+        'seconds': round(elapsed, 3),
+    }
+    # Output keys come from the input with or without a ledger; only a ledger stops the repeated work.
+    correct = (processed_before_reupload == len(keys) and result['reupload_outputs'] == 1
+               and result['output_keys_from_input'] == len(processed) and len(set(staged_names)) == len(keys))
+    if backend != 'none':
+        correct = (correct and calls_before_reupload == args.files * args.tickets and len(glue.runs) == len(keys)
+                   and skipped == result['events'] - len(keys) and glue_skipped == result['events'] - len(keys))
+    result['correct'] = correct
+    return result
+
+
+def cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=8)
+    parser.add_argument('--tickets', type=int, default=50)
+    parser.add_argument('--duplicates', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.01)
+    parser.add_argument('--ledgers', nargs='+', default=['none', 's3', 'sqlite'])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ.update(BUCKET_NAME=BUCKET, CACHE_BACKEND='none', CLASSIFY_MODE='batch', GLUE_JOB_NAME='bench-etl',
+                      CLASSIFY_NEAR_DUPLICATES='false', CLASSIFY_ESCALATE='false',
+                      BEDROCK_INITIAL_CONCURRENCY='8', BEDROCK_MAX_CONCURRENCY='8')
+    metrics.emit = lambda line: None
+    root = tempfile.mkdtemp(prefix='bench-idempotency-')
+    try:
+        results = [run(backend, root, args) for backend in args.ledgers]
+        print(json.dumps(results, indent=2))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+        runtime.reset()
+    if not all(r['correct'] for r in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    cli()
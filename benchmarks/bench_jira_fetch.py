@@ -0,0 +1,71 @@
+"""Wall-clock time to fetch N projects x M pages from a local fake Jira.
+
+Compares the serial fetch (one project and one page at a time, no connection reuse)
+with concurrent projects and parallel pages over a shared pooled session.
+
+    python benchmarks/bench_jira_fetch.py --projects 6 --pages 8 --latency 0.05
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'lambda', 'fetch-jira-issues'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'shared', 'python'))
+
+from jira_utils import fetch_jira_issues, create_session, HostLimiter  # noqa: E402
+from fake_jira import FakeJira  # noqa: E402
+
+
+def run(name, jira, projects, project_workers, page_workers, session, limiter):
+    requests_before = jira.requests
+    connections_before = len(jira.connections)
+    started = time.perf_counter()
+
+    def fetch(project):
+        return fetch_jira_issues(jira.url, project, 'bench@example.com', 'token',
+                                 session=session, limiter=limiter, page_workers=page_workers)
+
+    with ThreadPoolExecutor(max_workers=project_workers) as executor:
+        issues = sum(len(i) for i in executor.map(fetch, projects))
+    elapsed = time.perf_counter() - started
+    return {
+        'strategy': name,
+        'projects': len(projects),
+        'issues': issues,
+        'elapsed_seconds': round(elapsed, 3),
+        'http_requests': jira.requests - requests_before,
+        'tcp_connections': len(jira.connections) - connections_before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--projects', type=int, default=4)
+    parser.add_argument('--pages', type=int, default=6)
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--max-per-host', type=int, default=8)
+    parser.add_argument('--rate-limit-every', type=int, default=0)
+    args = parser.parse_args()
+
+    projects = [f"P{i}" for i in range(args.projects)]
+    with FakeJira(issues_per_project=args.pages * args.page_size, page_size=args.page_size,
+                  latency=args.latency, rate_limit_every=args.rate_limit_every) as jira:
+        results = [
+            # The requests module itself stands in for a session: a new connection per call.
+            run('serial', jira, projects, 1, 1, requests, HostLimiter(1)),
+            run('concurrent_pooled', jira, projects, args.projects, args.max_per_host,
+                create_session(args.max_per_host), HostLimiter(args.max_per_host)),
+        ]
+    print(json.dumps(results, indent=2))
+    if any(r['issues'] != args.projects * args.pages * args.page_size for r in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Model calls with and without near-duplicate clustering on a simulated alert storm.
+
+Storm tickets come from a few alert templates that differ only in timestamps, hosts,
+IPs and UUIDs; the rest are distinct tickets. Cluster purity checks that no cluster
+mixes tickets from different sources, and clusters per template shows how well each
+storm collapsed.
+
+    python benchmarks/bench_near_duplicates.py --tickets 2000 --storm-share 0.9
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'lambda', 'classify-tickets'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'shared', 'python'))
+
+from bedrock_dispatcher import AdaptiveDispatcher  # noqa: E402
+from near_duplicates import NearDuplicateClusterer  # noqa: E402
+from ticket_classifier import TicketClassifier  # noqa: E402
+from fake_bedrock import FakeBedrockClient  # noqa: E402
+
+ALERTS = [
+    ("[ALERT] High CPU on {host} at {ts}",
+     "CloudWatch alarm cpu-high-{n} entered ALARM state at {ts}. Instance {host} ({ip}) above 90% for 15 minutes. "
+     "Request id {uuid}. Runbook: check the top consumers and scale the group if needed."),
+    ("Disk usage above threshold on {host}",
+     "Automated alert generated {ts}. Volume /dev/xvda{n} on {host} is 95% full. Alert id {uuid}."),
+    ("5xx rate elevated for checkout-service ({ts})",
+     "Error rate for checkout-service exceeded 5% between {ts} and {ts}. Affected pod {host}, trace {uuid}."),
+]
+WORDS = ("deploy pipeline report dashboard access migrate index schema cache billing invoice export "
+         "latency queue worker login partner vendor contract sprint backlog refactor upgrade").split()
+
+
+def make_tickets(n, storm_share, seed):
+    rng = random.Random(seed)
+    tickets, sources = [], []
+    for i in range(n):
+        if rng.random() < storm_share:
+            template = rng.randrange(len(ALERTS))
+            summary, description = ALERTS[template]
+            fields = {
+                'host': f"ip-10-0-{rng.randrange(256)}-{rng.randrange(256)}.ec2.internal",
+                'ip': f"10.0.{rng.randrange(256)}.{rng.randrange(256)}",
+                'ts': f"2024-05-{rng.randrange(1, 29):02d}T{rng.randrange(24):02d}:{rng.randrange(60):02d}:00Z",
+                'uuid': str(uuid.UUID(int=rng.getrandbits(128))),
+                'n': rng.randrange(10),
+            }
+            tickets.append({'Key': f"PROJ-{i}", 'Summary': summary.format(**fields),
+                            'Description': description.format(**fields)})
+            sources.append(f"alert-{template}")
+        else:
+            words = rng.sample(WORDS, 12)
+            tickets.append({'Key': f"PROJ-{i}", 'Summary': ' '.join(words[:4]), 'Description': ' '.join(words)})
+            sources.append(f"unique-{i}")
+    return tickets, sources
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickets', type=int, default=2000)
+    parser.add_argument('--storm-share', type=float, default=0.9)
+    parser.add_argument('--window-size', type=int, default=100)
+    parser.add_argument('--threshold', type=float, default=0.8)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=3)
+    args = parser.parse_args()
+
+    tickets, sources = make_tickets(args.tickets, args.storm_share, args.seed)
+    results = []
+    for name, deduplicator in [('no clustering', None),
+                               ('minhash clustering', NearDuplicateClusterer(threshold=args.threshold))]:
+        client = FakeBedrockClient(latency=args.latency, capacity=10 ** 6, seed=args.seed)
+        classifier = TicketClassifier(bedrock_client=client, deduplicator=deduplicator,
+                                      dispatcher=AdaptiveDispatcher(initial_concurrency=10, max_concurrency=10))
+        started = time.perf_counter()
+        classified = list(classifier.classify_stream(tickets, args.window_size))
+        elapsed = time.perf_counter() - started
+
+        result = {'config': name, 'model_calls': client.calls, 'seconds': round(elapsed, 3),
+                  'unanswered': sum(1 for t in classified if t['Model Answer'] is None)}
+        if deduplicator is not None:
+            members = {}
+            for row, source in zip(classified, sources):
+                members.setdefault(row['Cluster Id'], set()).add(source)
+            clusters_per_template = {}
+            for cluster_sources in members.values():
+                for source in cluster_sources:
+                    if source.startswith('alert-'):
+                        clusters_per_template[source] = clusters_per_template.get(source, 0) + 1
+            result.update({
+                'clusters': len(members),
+                'impure_clusters': sum(1 for s in members.values() if len(s) > 1),
+                'clusters_per_template': dict(sorted(clusters_per_template.items())),
+                'clustering_seconds': classifier.tier_summary()['near_duplicate']['seconds'],
+            })
+        results.append(result)
+    # Clustering may only save calls: every ticket is still answered, and no cluster mixes templates.
+    failed = any(r['unanswered'] or r.get('impure_clusters') for r in results)
+    results.append({'call_reduction': round(results[0]['model_calls'] / max(results[1]['model_calls'], 1), 1)})
+    print(json.dumps(results, indent=2))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
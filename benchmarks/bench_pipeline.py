@@ -0,0 +1,212 @@
+"""End-to-end pipeline benchmark on synthetic data, with JSON output for regression gates.
+
+Stages, each against a local stand-in:
+  fetch     fetch_jira_issues for every project against fake_jira.py
+  export    FieldExtractor + create_csv, uploaded to local_s3.py as the staged file
+  classify  S3Handler.iter_csv -> TicketClassifier.classify_stream -> upload_csv_stream,
+            with fake_bedrock.py as the model
+
+Per stage it reports wall time, throughput, p50/p95/p99 of the spans recorded by
+metrics.py, call counts and the process peak RSS reached by the end of the stage.
+
+    python benchmarks/bench_pipeline.py --tickets 5000 --output run.json
+    python benchmarks/bench_pipeline.py --tickets 5000 --baseline run.json --max-regression 0.2
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.join(os.path.dirname(__file__), '..', 'src', 'lambda')
+sys.path.insert(0, os.path.join(ROOT, 'fetch-jira-issues'))
+sys.path.insert(0, os.path.join(ROOT, 'classify-tickets'))
+sys.path.insert(0, os.path.join(ROOT, '..', 'shared', 'python'))
+
+from bedrock_dispatcher import AdaptiveDispatcher  # noqa: E402
+from csv_utils import create_csv  # noqa: E402
+from jira_utils import adf_to_text, create_session, fetch_jira_issues, FieldExtractor, HostLimiter, jira_mappings  # noqa: E402
+from metrics import metrics  # noqa: E402
+from near_duplicates import NearDuplicateClusterer  # noqa: E402
+from s3_handler import S3Handler  # noqa: E402
+from ticket_classifier import TicketClassifier  # noqa: E402
+from fake_bedrock import FakeBedrockClient  # noqa: E402
+from fake_jira import FakeJira  # noqa: E402
+from local_s3 import LocalS3Client  # noqa: E402
+from synthetic_data import SyntheticIssues  # noqa: E402
+
+BUCKET = 'bench-bucket'
+STAGED_KEY = 'staged/bench.csv'
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def percentiles(summary, name):
+    matches = [s for label, s in summary.items() if label == name or label.startswith(name + '[')]
+    if not matches:
+        return None
+    # Several dimension sets (e.g. per model): report the slowest.
+    worst = max(matches, key=lambda s: s['p99'])
+    return {'count': sum(s['count'] for s in matches), 'p50': worst['p50'], 'p95': worst['p95'], 'p99': worst['p99']}
+
+
+@contextlib.contextmanager
+def stage(results, name, items, verbose):
+    """Time a stage, collect its metric spans and keep its chatter off stdout."""
+    metrics.flush()
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    record = {}
+    started = time.perf_counter()
+    with output:
+        yield record
+    elapsed = time.perf_counter() - started
+    count = items() if callable(items) else items
+    results[name] = {
+        'seconds': round(elapsed, 3),
+        'items': count,
+        'items_per_second': round(count / elapsed, 1) if elapsed else None,
+        'peak_rss_mb': peak_rss_mb(),
+        **record,
+        'spans': metrics.flush(),
+    }
+
+
+def run(args):
+    emit, metrics.emit = metrics.emit, (lambda line: None)
+    results = {'config': vars(args).copy()}
+    results['config'].pop('baseline', None)
+    results['config'].pop('output', None)
+    results['config'].pop('verbose', None)
+    stages = results['stages'] = {}
+    issues_per_project = args.tickets // args.projects
+    projects = [f"P{n}" for n in range(args.projects)]
+    shape = SyntheticIssues(description_words=args.description_words, long_share=args.long_share,
+                            multiline_share=args.multiline_share, duplicate_share=args.duplicate_share,
+                            alert_share=args.alert_share, seed=args.seed)
+    root = tempfile.mkdtemp(prefix='bench-pipeline-')
+    try:
+        s3 = LocalS3Client(root)
+        fetched = []
+        with FakeJira(issues_per_project=issues_per_project, page_size=args.page_size, latency=args.jira_latency,
+                      rate_limit_every=args.jira_rate_limit_every, issue_factory=shape) as jira:
+            with stage(stages, 'fetch', lambda: len(fetched), args.verbose) as record:
+                session = create_session(pool_size=args.jira_concurrency)
+                limiter = HostLimiter(max_per_host=args.jira_concurrency)
+                with ThreadPoolExecutor(max_workers=len(projects)) as executor:
+                    for issues in executor.map(lambda p: fetch_jira_issues(
+                            jira.url, p, 'bench@example.com', 'token', session=session, limiter=limiter,
+                            page_workers=args.jira_concurrency), projects):
+                        fetched.extend(issues)
+                record['calls'] = {'jira_requests': jira.requests, 'jira_rate_limited': jira.rate_limited,
+                                   'tcp_connections': len(jira.connections)}
+                record['latency_ms'] = {'page': percentiles(metrics.summary(), 'JiraPageTime')}
+
+        with stage(stages, 'export', len(fetched), args.verbose) as record:
+            extractor = FieldExtractor(jira_mappings, transforms={'Description': adf_to_text})
+            body = create_csv(extractor.rows(fetched), fieldnames=extractor.fieldnames)
+            s3.put_object(Bucket=BUCKET, Key=STAGED_KEY, Body=body)
+            record['bytes'] = len(body.encode('utf-8'))
+        del fetched, body
+
+        bedrock = FakeBedrockClient(latency=args.bedrock_latency, capacity=args.bedrock_capacity,
+                                    throttle_rate=args.throttle_rate, seed=args.seed)
+        s3.calls.clear()
+        classifier = TicketClassifier(
+            bedrock_client=bedrock,
+            dispatcher=AdaptiveDispatcher(initial_concurrency=args.concurrency, max_concurrency=args.max_concurrency),
+            batch_size=args.batch_size,
+            deduplicator=NearDuplicateClusterer() if args.near_duplicates else None,
+        )
+        written = []
+        with stage(stages, 'classify', lambda: written[0], args.verbose) as record:
+            s3_handler = S3Handler(BUCKET, s3_client=s3)
+            classified = classifier.classify_stream(s3_handler.iter_csv(STAGED_KEY), args.window_size)
+            written.append(s3_handler.upload_csv_stream(classified))
+            summary = metrics.summary()
+            record['calls'] = {'bedrock_calls': bedrock.calls, 'bedrock_throttled': bedrock.throttled,
+                               'bedrock_input_tokens': bedrock.input_tokens,
+                               'bedrock_output_tokens': bedrock.output_tokens, 's3': dict(s3.calls)}
+            record['latency_ms'] = {'bedrock_service': percentiles(summary, 'BedrockServiceTime'),
+                                    'bedrock_queue_wait': percentiles(summary, 'BedrockQueueWait')}
+            record['tiers'] = classifier.tier_summary()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+        metrics.emit = emit
+    return results
+
+
+def regressions(results, baseline, max_regression, min_stage_seconds):
+    """Stages whose throughput dropped or peak RSS grew by more than max_regression.
+
+    Throughput of stages shorter than min_stage_seconds in the baseline is too noisy to gate on.
+    """
+    found = []
+    for name, current in results['stages'].items():
+        previous = baseline.get('stages', {}).get(name)
+        if not previous:
+            continue
+        timed = previous['items_per_second'] and previous['seconds'] >= min_stage_seconds
+        if timed and current['items_per_second'] < previous['items_per_second'] * (1 - max_regression):
+            found.append(f"{name}: {current['items_per_second']} items/s vs {previous['items_per_second']}")
+        if current['peak_rss_mb'] > previous['peak_rss_mb'] * (1 + max_regression):
+            found.append(f"{name}: peak RSS {current['peak_rss_mb']} MB vs {previous['peak_rss_mb']}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    shape = parser.add_argument_group('data shape')
+    shape.add_argument('--tickets', type=int, default=2000)
+    shape.add_argument('--projects', type=int, default=4)
+    shape.add_argument('--description-words', type=int, default=60)
+    shape.add_argument('--long-share', type=float, default=0.05)
+    shape.add_argument('--multiline-share', type=float, default=0.3)
+    shape.add_argument('--duplicate-share', type=float, default=0.05)
+    shape.add_argument('--alert-share', type=float, default=0.0)
+    shape.add_argument('--seed', type=int, default=0)
+    jira = parser.add_argument_group('fake Jira')
+    jira.add_argument('--page-size', type=int, default=100)
+    jira.add_argument('--jira-latency', type=float, default=0.02)
+    jira.add_argument('--jira-rate-limit-every', type=int, default=0)
+    jira.add_argument('--jira-concurrency', type=int, default=8)
+    bedrock = parser.add_argument_group('fake Bedrock and classifier')
+    bedrock.add_argument('--bedrock-latency', type=float, default=0.05)
+    bedrock.add_argument('--bedrock-capacity', type=int, default=16)
+    bedrock.add_argument('--throttle-rate', type=float, default=0.0)
+    bedrock.add_argument('--concurrency', type=int, default=5)
+    bedrock.add_argument('--max-concurrency', type=int, default=32)
+    bedrock.add_argument('--window-size', type=int, default=100)
+    bedrock.add_argument('--batch-size', type=int, default=1)
+    bedrock.add_argument('--near-duplicates', action='store_true')
+    parser.add_argument('--output', help='also write the JSON results to this file')
+    parser.add_argument('--baseline', help='results of an earlier run to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.2)
+    parser.add_argument('--min-stage-seconds', type=float, default=0.5)
+    parser.add_argument('--verbose', action='store_true', help="keep the pipeline's own log lines")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            results['regressions'] = regressions(results, json.load(f), args.max_regression,
+                                                 args.min_stage_seconds)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if results.get('regressions'):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
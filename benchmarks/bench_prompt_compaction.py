@@ -0,0 +1,112 @@
+"""Input tokens and lost answers with and without prompt compaction on tickets with pasted logs.
+
+A share of the tickets carry a Java or Python stack trace and a dump of repeated log
+lines, some of them larger than the fake model's context window (--max-input-tokens).
+Without compaction those come back unanswered; with it every prompt fits the budget.
+"final error kept" counts compacted descriptions that still end with the trace's
+exception line, which is usually the most useful line of a log dump.
+
+    python benchmarks/bench_prompt_compaction.py --tickets 500 --log-share 0.3
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'lambda', 'classify-tickets'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'shared', 'python'))
+
+from bedrock_dispatcher import AdaptiveDispatcher  # noqa: E402
+from prompt_compaction import PromptCompactor  # noqa: E402
+from ticket_classifier import TicketClassifier  # noqa: E402
+from fake_bedrock import FakeBedrockClient  # noqa: E402
+from synthetic_data import SyntheticIssues  # noqa: E402
+
+
+def java_trace(rng, frames):
+    lines = [f"java.lang.IllegalStateException: worker {rng.randrange(64)} lost its lease"]
+    lines += [f"\tat com.example.pipeline.Stage{rng.randrange(40)}.run(Stage.java:{rng.randrange(900)})"
+              for _ in range(frames)]
+    return lines + [f"\t... {rng.randrange(5, 50)} more", "Caused by: java.net.SocketTimeoutException: Read timed out"]
+
+
+def python_trace(rng, frames):
+    lines = ["Traceback (most recent call last):"]
+    for _ in range(frames):
+        lines += [f'  File "/app/pipeline/stage_{rng.randrange(40)}.py", line {rng.randrange(900)}, in run',
+                  f"    result = handler.process(batch_{rng.randrange(10)})"]
+    return lines + ["KeyError: 'partition_key'"]
+
+
+def make_tickets(n, log_share, seed):
+    rng = random.Random(seed)
+    issues = SyntheticIssues(description_words=80, seed=seed)
+    tickets, final_lines = [], []
+    for i in range(n):
+        summary, description = issues.content('BENCH', i)
+        final = None
+        if rng.random() < log_share:
+            scale = rng.choice([1, 4, 40])
+            logs = [f"2024-05-{rng.randrange(1, 29):02d} 10:{rng.randrange(60):02d}:{rng.randrange(60):02d} WARN "
+                    f"request {rng.getrandbits(64):016x} retrying connection to 10.0.{rng.randrange(256)}.1"
+                    for _ in range(20 * scale)]
+            trace = (java_trace if rng.random() < 0.5 else python_trace)(rng, 15 * scale)
+            final = trace[-1]
+            description = '\n'.join([description, 'Logs:'] + logs + trace)
+        tickets.append({'Key': f"BENCH-{i}", 'Summary': summary, 'Description': description})
+        final_lines.append(final)
+    return tickets, final_lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickets', type=int, default=500)
+    parser.add_argument('--log-share', type=float, default=0.3)
+    parser.add_argument('--token-budget', type=int, default=6000)
+    parser.add_argument('--max-input-tokens', type=int, default=20000)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    tickets, final_lines = make_tickets(args.tickets, args.log_share, args.seed)
+    results = []
+    for name, compactor in [('raw descriptions', None),
+                            ('compacted', PromptCompactor(token_budget=args.token_budget))]:
+        client = FakeBedrockClient(latency=args.latency, capacity=10 ** 6, max_input_tokens=args.max_input_tokens)
+        classifier = TicketClassifier(bedrock_client=client, compactor=compactor, escalate=False,
+                                      dispatcher=AdaptiveDispatcher(initial_concurrency=16, max_concurrency=16))
+        started = time.perf_counter()
+        classified = classifier.classify_tickets(tickets)
+        elapsed = time.perf_counter() - started
+
+        prompt_tokens = [row['Prompt Tokens'] for row in classified]
+        result = {
+            'config': name,
+            # Estimated for every prompt; the fake model only bills the ones it accepted.
+            'prompt_tokens': sum(prompt_tokens),
+            'billed_input_tokens': client.input_tokens,
+            'max_prompt_tokens': max(prompt_tokens),
+            'rejected_too_long': client.rejected,
+            'unanswered': sum(1 for row in classified if row['Model Answer'] is None),
+            'truncated': sum(1 for row in classified if row['Prompt Truncated']),
+            'seconds': round(elapsed, 3),
+        }
+        if compactor is not None:
+            started = time.perf_counter()
+            compacted = [classifier._compact_ticket(t)[0]['Description'] for t in tickets]
+            result['compaction_ms_per_ticket'] = round(1000 * (time.perf_counter() - started) / len(tickets), 3)
+            with_logs = [(text, final) for text, final in zip(compacted, final_lines) if final]
+            result['final_error_kept'] = f"{sum(1 for text, final in with_logs if final in text)}/{len(with_logs)}"
+        results.append(result)
+    compacted = results[1]
+    results.append({'prompt_token_reduction': round(1 - results[1]['prompt_tokens'] / results[0]['prompt_tokens'], 3)})
+    print(json.dumps(results, indent=2))
+    # The raw run is expected to lose answers; the compacted one must not.
+    if compacted['unanswered'] or compacted['rejected_too_long']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""Throughput of the sharded classify mode against the shard count, fully in process.
+
+The staged CSV holds synthetic tickets, many with quoted multiline descriptions. For
+each shard count the classify handler fans the file out, an InProcessContinuation runs
+every shard event through the same handler on local threads (one per shard, as Lambda
+would run them side by side), and the last shard merges the outputs into processed/.
+S3 is local_s3.py and Bedrock is fake_bedrock.py, wired in through runtime.set_client.
+
+Every run checks that the merged file has each input row exactly once with its
+description intact, and that the shard scratch objects were cleaned up; the script
+exits 1 if any run fails those checks.
+
+--lambda-seconds gives every invocation that much time, as a function timeout would;
+with a short budget shards checkpoint and hand off to continuations, and each row must
+still come back answered.
+
+    python benchmarks/bench_sharding.py --tickets 2000 --shards 1 2 4 8
+    python benchmarks/bench_sharding.py --shards 2 --lambda-seconds 14
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'lambda', 'classify-tickets'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'shared', 'python'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+import main  # noqa: E402
+from continuation import InProcessContinuation  # noqa: E402
+from metrics import metrics  # noqa: E402
+from runtime import runtime  # noqa: E402
+from fake_bedrock import FakeBedrockClient  # noqa: E402
+from local_s3 import LocalS3Client  # noqa: E402
+from synthetic_data import SyntheticIssues  # noqa: E402
+
+BUCKET = 'bench-bucket'
+
+
+class LocalContext:
+    """Remaining time of whichever invocation is running on the calling thread."""
+    invoked_function_arn = 'arn:aws:lambda:us-east-1:000000000000:function:classify-tickets-local'
+
+    def __init__(self, budget_seconds):
+        self.budget_seconds = budget_seconds
+        self._local = threading.local()
+        self.invocations = 0
+
+    def invoke(self, event, context):
+        self._local.started = time.monotonic()
+        self.invocations += 1
+        return main.handler(event, context)
+
+    def get_remaining_time_in_millis(self):
+        started = getattr(self._local, 'started', time.monotonic())
+        return int(1000 * (self.budget_seconds - (time.monotonic() - started)))
+
+
+def staged_csv(n, seed):
+    issues = SyntheticIssues(multiline_share=0.6, seed=seed)
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=['Id', 'Key', 'Summary', 'Description', 'Labels'])
+    writer.writeheader()
+    for i in range(n):
+        summary, description = issues.content('BENCH', i)
+        writer.writerow({'Id': str(i), 'Key': f"BENCH-{i}", 'Summary': summary,
+                         'Description': f'{description}\n"quoted, with a comma"', 'Labels': '[]'})
+    return buffer.getvalue()
+
+
+def run(s3, shards, body, latency, lambda_seconds):
+    key = f"staged/bench-{shards}.csv"
+    s3.put_object(Bucket=BUCKET, Key=key, Body=body)
+    size = len(body.encode('utf-8'))
+    # Just over size / shards, so the file splits into the requested number of shards.
+    os.environ['CLASSIFY_SHARD_BYTES'] = str(size // shards + 1)
+    runtime.set_client('bedrock-runtime', FakeBedrockClient(latency=latency, capacity=10 ** 6))
+    event = {'mode': 'sharded', 'Records': [{'s3': {'bucket': {'name': BUCKET}, 'object': {'key': key}}}]}
+    context = LocalContext(lambda_seconds)
+    sender = InProcessContinuation(context.invoke, context, max_workers=shards)
+    # Continuations handed off by a shard run in process too.
+    main.build_continuation = lambda _: sender
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if not main.fan_out(main.S3Handler(BUCKET), key, sender):
+            context.invoke(event, context)
+        sender.wait()
+    elapsed = time.perf_counter() - started
+    sender.shutdown()
+
+    listing = [o['Key'] for o in s3.list_objects_v2(Bucket=BUCKET).get('Contents', [])]
+    processed = [k for k in listing if k.startswith('processed/')]
+    output = next(k for k in processed if k.endswith('.csv'))
+    rows = list(csv.DictReader(io.StringIO(s3.get_object(Bucket=BUCKET, Key=output)['Body'].read().decode())))
+    expected = {r['Key']: r['Description'] for r in csv.DictReader(io.StringIO(body))}
+    manifests = [k for k in processed if k.endswith('.manifest.json')]
+    for k in processed:
+        s3.delete_object(Bucket=BUCKET, Key=k)
+    result = {
+        'shards': shards,
+        'seconds': round(elapsed, 3),
+        'tickets_per_second': round(len(rows) / elapsed, 1),
+        'invocations': context.invocations,
+        'rows_out': len(rows),
+        'merge_manifests': len(manifests),
+        'rows_intact': sum(1 for r in rows if expected.get(r['Key']) == r['Description']),
+        'unanswered': sum(1 for r in rows if not r['Model Answer']),
+        'scratch_left': sum(1 for k in listing if any(p in k for p in ('/output/', '/done/', '/checkpoints/'))),
+    }
+    result['correct'] = (len(rows) == len({r['Key'] for r in rows}) == len(expected)
+                         and result['rows_intact'] == len(expected) and result['unanswered'] == 0
+                         and result['scratch_left'] == 0 and len(manifests) <= 1)
+    return result
+
+
+def cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickets', type=int, default=2000)
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--concurrency', type=int, default=5, help='Bedrock concurrency of each shard')
+    parser.add_argument('--lambda-seconds', type=float, default=15 * 60, help='time each invocation gets')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ.update(BUCKET_NAME=BUCKET, CACHE_BACKEND='none', CLASSIFY_NEAR_DUPLICATES='false',
+                      BEDROCK_INITIAL_CONCURRENCY=str(args.concurrency),
+                      BEDROCK_MAX_CONCURRENCY=str(args.concurrency))
+    # Just over the dispatcher's own 10 s safety margin, so a short --lambda-seconds leaves time to work.
+    os.environ.setdefault('CONTINUATION_MARGIN_MS', '11000')
+    metrics.emit = lambda line: None
+    root = tempfile.mkdtemp(prefix='bench-sharding-')
+    try:
+        s3 = LocalS3Client(root)
+        runtime.set_client('s3', s3)
+        body = staged_csv(args.tickets, args.seed)
+        results = [run(s3, shards, body, args.latency, args.lambda_seconds) for shards in args.shards]
+        for result in results:
+            result['speedup'] = round(result['tickets_per_second'] / results[0]['tickets_per_second'], 2)
+        print(json.dumps(results, indent=2))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+        runtime.reset()
+    if not all(r['correct'] for r in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,118 @@
+"""Local stand-in for the bedrock-runtime client used by TicketClassifier.
+
+Simulates service latency and a concurrency-based throttling quota so dispatch
+behaviour can be measured without calling AWS.
+"""
+import random
+import re
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+LABELS = [
+    'ACCESS_PERMISSIONS_REQUEST',
+    'BUG_FIXING',
+    'CREATING_UPDATING_OR_DEPRECATING_DOCUMENTATION',
+    'MINOR_REQUEST',
+    'REQUEST_FROM_MENU_OF_SERVICES',
+    'SUPPORT_TROUBLESHOOTING',
+    'TEAM_LEVEL_CONTINIOUS_IMPROVEMENT',
+]
+
+
+BATCH_TICKET = re.compile(r'<ticket id="([^"]+)">(.*?)</ticket>', re.DOTALL)
+
+
+def label_for(text):
+    return LABELS[sum(map(ord, text)) % len(LABELS)]
+
+
+def default_responder(model_id, messages, system):
+    """Deterministic answer per ticket text; answers every ticket of a batched prompt."""
+    text = messages[-1]['content'][0]['text']
+    tickets = BATCH_TICKET.findall(text)
+    if tickets:
+        return "\n".join(
+            f'<ticket id="{ticket_id}">\n<thinking>Fake reasoning from {model_id}.</thinking>\n'
+            f'<answer>{label_for(body)}</answer>\n</ticket>'
+            for ticket_id, body in tickets
+        )
+    return f"<thinking>Fake reasoning from {model_id}.</thinking>\n<answer>{label_for(text)}</answer>"
+
+
+class FakeBedrockClient:
+    def __init__(self, latency=0.05, latency_jitter=0.02, capacity=16, throttle_rate=0.0,
+                 overload_latency=0.0, output_token_latency=0.0, seed=None, responder=default_responder,
+                 max_input_tokens=None):
+        """
+        latency: base service time per call in seconds.
+        capacity: concurrent calls accepted before every extra call is throttled.
+        throttle_rate: probability that an otherwise accepted call is throttled anyway.
+        overload_latency: extra seconds added per in-flight call above capacity / 2,
+            modelling a service that slows down before it starts rejecting.
+        output_token_latency: extra seconds per generated token, since generation time
+            grows with the length of the answer.
+        max_input_tokens: prompts above it are rejected with a ValidationException, like
+            a prompt that does not fit the model's context window.
+        """
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.capacity = capacity
+        self.throttle_rate = throttle_rate
+        self.overload_latency = overload_latency
+        self.output_token_latency = output_token_latency
+        self.responder = responder
+        self.max_input_tokens = max_input_tokens
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.calls = 0
+        self.throttled = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.rejected = 0
+
+    def converse(self, modelId, messages, system=None, inferenceConfig=None, **kwargs):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            in_flight = self.in_flight
+            throttle = in_flight > self.capacity or self._random.random() < self.throttle_rate
+            delay = self.latency + self._random.uniform(-self.latency_jitter, self.latency_jitter)
+            delay += max(0, in_flight - self.capacity // 2) * self.overload_latency
+        try:
+            if throttle:
+                with self._lock:
+                    self.throttled += 1
+                time.sleep(delay / 10)
+                raise ClientError(
+                    {'Error': {'Code': 'ThrottlingException', 'Message': 'Too many requests, please wait before trying again.'}},
+                    'Converse',
+                )
+            prompt_chars = sum(len(c.get('text', '')) for m in messages for c in m['content'])
+            prompt_chars += sum(len(s.get('text', '')) for s in system or [])
+            if self.max_input_tokens is not None and prompt_chars // 4 > self.max_input_tokens:
+                with self._lock:
+                    self.rejected += 1
+                raise ClientError(
+                    {'Error': {'Code': 'ValidationException', 'Message': 'Input is too long for requested model.'}},
+                    'Converse',
+                )
+            text = self.responder(modelId, messages, system)
+            delay += len(text) // 4 * self.output_token_latency
+            time.sleep(max(delay, 0))
+            usage = {'inputTokens': prompt_chars // 4, 'outputTokens': len(text) // 4}
+            usage['totalTokens'] = usage['inputTokens'] + usage['outputTokens']
+            with self._lock:
+                self.input_tokens += usage['inputTokens']
+                self.output_tokens += usage['outputTokens']
+            return {
+                'output': {'message': {'role': 'assistant', 'content': [{'text': text}]}},
+                'stopReason': 'end_turn',
+                'usage': usage,
+                'metrics': {'latencyMs': int(delay * 1000)},
+            }
+        finally:
+            with self._lock:
+                self.in_flight -= 1
@@ -0,0 +1,136 @@
+"""Local fake of the Jira Cloud search endpoint (GET /rest/api/3/search), and of
+GET /rest/api/3/myself for the API user's time zone.
+
+Serves a fixed number of generated issues per project, with configurable per-request
+latency and an optional rate limit that answers 429 with a Retry-After header.
+
+    with FakeJira(issues_per_project=500, latency=0.05) as jira:
+        fetch_jira_issues(jira.url, 'PROJ', 'me@example.com', 'token')
+"""
+import json
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+PROJECT_PATTERN = re.compile(r'project\s*=\s*"?([\w-]+)"?')
+
+
+def make_issue(project, number, description_words=40):
+    text = ' '.join(f"word{(number * 7 + i) % 97}" for i in range(description_words))
+    return {
+        'id': str(zlib.crc32(f"{project}-{number}".encode('utf-8'))),
+        'key': f"{project}-{number}",
+        'fields': {
+            'summary': f"{project} issue {number}: service returns errors",
+            'labels': ['generated'],
+            'created': '2024-01-01T00:00:00.000+0000',
+            'updated': f"2024-01-01T00:{number // 60 % 60:02d}:{number % 60:02d}.000+0000",
+            'description': {
+                'type': 'doc',
+                'version': 1,
+                'content': [{'type': 'paragraph', 'content': [{'type': 'text', 'text': text}]}],
+            },
+        },
+    }
+
+
+class FakeJira:
+    def __init__(self, issues_per_project=200, page_size=50, latency=0.02, rate_limit_every=0,
+                 retry_after=0.1, description_words=40, issue_factory=None):
+        """
+        rate_limit_every: answer every Nth request with 429 (0 disables rate limiting).
+        issue_factory: (project, number) -> issue dict, e.g. synthetic_data.SyntheticIssues;
+            defaults to make_issue with description_words.
+        """
+        self.issues_per_project = issues_per_project
+        self.page_size = page_size
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.description_words = description_words
+        self.issue_factory = issue_factory or (lambda project, number: make_issue(project, number, description_words))
+        self.requests = 0
+        self.rate_limited = 0
+        self.connections = set()
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                fake._handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handle(self, request):
+        with self._lock:
+            self.requests += 1
+            self.connections.add(request.client_address)
+            limited = self.rate_limit_every and self.requests % self.rate_limit_every == 0
+            if limited:
+                self.rate_limited += 1
+        if limited:
+            self._send(request, 429, {'errorMessages': ['Rate limit exceeded']},
+                       {'Retry-After': str(self.retry_after)})
+            return
+
+        if urlsplit(request.path).path.endswith('/myself'):
+            self._send(request, 200, {'accountId': 'fake', 'timeZone': 'UTC'})
+            return
+
+        query = parse_qs(urlsplit(request.path).query)
+        match = PROJECT_PATTERN.search(query.get('jql', [''])[0])
+        project = match.group(1) if match else 'UNKNOWN'
+        start_at = int(query.get('startAt', ['0'])[0])
+        max_results = min(int(query.get('maxResults', [str(self.page_size)])[0]), self.page_size)
+
+        time.sleep(self.latency)
+        end = min(start_at + max_results, self.issues_per_project)
+        issues = [self.issue_factory(project, n) for n in range(start_at, end)]
+        self._send(request, 200, {
+            'startAt': start_at,
+            'maxResults': max_results,
+            'total': self.issues_per_project,
+            'issues': issues,
+        })
+
+    @staticmethod
+    def _send(request, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        request.send_response(status)
+        request.send_header('Content-Type', 'application/json')
+        request.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            request.send_header(name, value)
+        request.end_headers()
+        request.wfile.write(body)
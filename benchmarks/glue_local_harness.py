@@ -0,0 +1,101 @@
+"""Run the Glue Key index dedup in local-mode PySpark against a temporary directory.
+
+Each batch overlaps the previous one by half, so roughly half of every batch should
+be dropped as already staged. Per-batch timings show whether runtime follows the
+batch size rather than the accumulated history. Each batch ends with the Key index
+compaction, so the files per index partition stay at most --max-index-files.
+
+    pip install pyspark==3.3.* boto3   # needs a local JDK
+    python benchmarks/glue_local_harness.py --batches 10 --batch-size 5000
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'glue'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'shared', 'python'))
+
+from pyspark.sql import SparkSession  # noqa: E402
+
+spark = SparkSession.builder.master('local[2]').appName('KeyIndexHarness') \
+    .config('spark.sql.shuffle.partitions', '4').getOrCreate()
+
+import etl_script  # noqa: E402  (reuses the session created above)
+
+
+def write_batch(path, first_key, size):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=['Id', 'Key', 'Parent', 'Summary', 'Description', 'Labels'])
+        writer.writeheader()
+        for n in range(first_key, first_key + size):
+            writer.writerow({
+                'Id': str(n),
+                'Key': f"PROJ-{n}",
+                'Parent': '',
+                'Summary': f"Issue {n}",
+                'Description': f"Line one of {n}\nline two, with a comma",
+                'Labels': "['generated']",
+            })
+
+
+def max_files_per_partition(index_path):
+    root = index_path[len('file://'):]
+    return max((sum(1 for name in os.listdir(os.path.join(root, d)) if name.endswith('.parquet'))
+                for d in os.listdir(root) if d.startswith('key_bucket=')), default=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batches', type=int, default=6)
+    parser.add_argument('--batch-size', type=int, default=2000)
+    parser.add_argument('--buckets', type=int, default=16)
+    parser.add_argument('--max-index-files', type=int, default=4, help='files per Key index partition before compaction')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='key-index-')
+    index_path = f"file://{workdir}/index/keys/"
+    etl_script.enable_bloom_filter_prefilter()
+
+    results = []
+    staged_keys = set()
+    for batch in range(args.batches):
+        first_key = batch * args.batch_size // 2
+        batch_path = os.path.join(workdir, f"batch_{batch}.csv")
+        write_batch(batch_path, first_key, args.batch_size)
+        batch_keys = {f"PROJ-{n}" for n in range(first_key, first_key + args.batch_size)}
+
+        started = time.perf_counter()
+        batch_df = spark.read.option('header', 'true').option('multiline', 'true') \
+            .option('escape', '"').csv(f"file://{batch_path}")
+        new_records = etl_script.filter_new_records(batch_df, index_path, args.buckets).cache()
+        new_keys = {row.Key for row in new_records.select('Key').collect()}
+        etl_script.update_key_index(new_records, index_path, args.buckets)
+        compacted = etl_script.compact_key_index(index_path, args.max_index_files)
+        elapsed = time.perf_counter() - started
+        new_records.unpersist()
+
+        expected = batch_keys - staged_keys
+        staged_keys |= new_keys
+        results.append({
+            'batch': batch,
+            'history_keys': len(staged_keys),
+            'new_records': len(new_keys),
+            'compacted_partitions': compacted,
+            'max_files_per_partition': max_files_per_partition(index_path),
+            'correct': new_keys == expected,
+            'elapsed_seconds': round(elapsed, 3),
+        })
+
+    print(json.dumps(results, indent=2))
+    spark.stop()
+    if not all(r['correct'] for r in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""Run the Glue job's process_data end to end in local-mode PySpark, from input manifests.
+
+Batches are queued and taken with the start-glue-job UploadCoalescer, so each round is
+driven by the same --INPUT_MANIFEST a coalesced Glue run gets. The bucket is a temporary
+directory: local_s3.py serves the boto3 calls and Spark reads and writes the same files
+through etl_script.STORAGE_ROOT.
+
+  round 1  two files in one manifest that share half their Keys; the later file's rows win
+  round 2  a new file overlapping round 1, after a failed attempt left a part file in the
+           run's tmp prefix; only the unseen Keys are staged, and nothing stale is copied
+
+Each round checks the staged rows against what it should have written.
+
+    pip install pyspark==3.3.* boto3   # needs a local JDK
+    python benchmarks/glue_process_data_harness.py --file-size 2000 --output-mode distributed
+"""
+import argparse
+import csv
+import glob
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'glue'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'lambda', 'start-glue-job'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'shared', 'python'))
+
+from pyspark.sql import SparkSession  # noqa: E402
+
+spark = SparkSession.builder.master('local[2]').appName('ProcessDataHarness') \
+    .config('spark.sql.shuffle.partitions', '4').getOrCreate()
+
+import etl_script  # noqa: E402  (reuses the session created above)
+from coalescer import UploadCoalescer  # noqa: E402
+from idempotency import input_id  # noqa: E402
+from local_s3 import LocalS3Client  # noqa: E402
+
+BUCKET = 'harness-bucket'
+FIELDS = ['Id', 'Key', 'Parent', 'Summary', 'Description', 'Labels']
+
+
+def upload_csv(s3, key, first_key, size, version):
+    rows = [{'Id': str(n), 'Key': f"PROJ-{n}", 'Parent': '', 'Summary': f"Issue {n} {version}",
+             'Description': f"Line one of {n}\nline two, with a comma and \"quotes\"", 'Labels': "['generated']"}
+            for n in range(first_key, first_key + size)]
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=FIELDS)
+    writer.writeheader()
+    writer.writerows(rows)
+    s3.put_object(Bucket=BUCKET, Key=key, Body=buffer.getvalue().encode('utf-8'))
+    head = s3.head_object(Bucket=BUCKET, Key=key)
+    return {'key': key, 'etag': head['ETag'].strip('"'), 'size': head['ContentLength'],
+            'input_id': input_id(BUCKET, key, head['ETag'])}
+
+
+def staged_rows(root, output_name):
+    rows = {}
+    for path in sorted(glob.glob(os.path.join(root, BUCKET, 'staged', f"{output_name}*.csv"))):
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                if row['Key'] in rows:
+                    raise AssertionError(f"{row['Key']} staged twice in {output_name}")
+                rows[row['Key']] = row
+    return rows
+
+
+def take_batch(coalescer, files):
+    coalescer.add(files)
+    return coalescer.take(force=True)
+
+
+def run_batch(batch, args):
+    """process_data as the Glue job runs it for --INPUT_MANIFEST and --OUTPUT_NAME. Returns seconds."""
+    keys = etl_script.load_input_manifest(BUCKET, batch['manifest_key'])
+    started = time.perf_counter()
+    etl_script.process_data(BUCKET, keys, num_buckets=args.buckets, staged_format=args.staged_format,
+                            output_mode=args.output_mode, target_file_mb=1, output_name=batch['output_name'],
+                            max_index_files=args.max_index_files)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--file-size', type=int, default=2000)
+    parser.add_argument('--buckets', type=int, default=16)
+    parser.add_argument('--output-mode', choices=['distributed', 'single'], default='distributed')
+    parser.add_argument('--staged-format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--max-index-files', type=int, default=4)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='process-data-')
+    s3 = LocalS3Client(root)
+    etl_script.s3 = s3
+    etl_script.STORAGE_ROOT = f"file://{root}/"
+    coalescer = UploadCoalescer(s3, BUCKET, max_files=10)
+    size = args.file_size
+    results = []
+    try:
+        first = upload_csv(s3, 'unprocessed/jira_issues_A.csv', 0, size, 'v1')
+        second = upload_csv(s3, 'unprocessed/jira_issues_B.csv', size // 2, size, 'v2')
+        batch = take_batch(coalescer, [first, second])
+        seconds = run_batch(batch, args)
+        rows = staged_rows(root, batch['output_name'])
+        expected = {f"PROJ-{n}" for n in range(0, size + size // 2)}
+        later_wins = sum(1 for n in range(size // 2, size) if rows.get(f"PROJ-{n}", {}).get('Summary', '').endswith('v2'))
+        results.append({
+            'round': 1, 'files': 2, 'seconds': round(seconds, 2), 'rows_staged': len(rows),
+            'expected_rows': len(expected), 'later_file_wins': later_wins, 'overlapping_keys': size - size // 2,
+            'correct': set(rows) == expected and later_wins == size - size // 2,
+        })
+
+        third = upload_csv(s3, 'unprocessed/jira_issues_C.csv', size, size, 'v3')
+        batch = take_batch(coalescer, [third])
+        # What a failed attempt of this batch would have left behind in its tmp prefix.
+        s3.put_object(Bucket=BUCKET, Key=f"tmp/glue/{batch['output_name']}/part-00000-stale.csv",
+                      Body=b'"Id","Key","Parent","Summary","Description","Labels"\n"x","STALE-1","","","",""\n')
+        seconds = run_batch(batch, args)
+        rows = staged_rows(root, batch['output_name'])
+        expected = {f"PROJ-{n}" for n in range(size + size // 2, 2 * size)}
+        leftovers = s3.list_objects_v2(Bucket=BUCKET, Prefix='tmp/glue/').get('KeyCount', 0)
+        results.append({
+            'round': 2, 'files': 1, 'seconds': round(seconds, 2), 'rows_staged': len(rows),
+            'expected_rows': len(expected), 'stale_rows': sum(1 for key in rows if key.startswith('STALE')),
+            'tmp_objects_left': leftovers,
+            'correct': set(rows) == expected and (leftovers == 0 or args.output_mode == 'single'),
+        })
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+        spark.stop()
+
+    print(json.dumps(results, indent=2))
+    if not all(r['correct'] for r in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
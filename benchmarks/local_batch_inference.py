@@ -0,0 +1,93 @@
+"""Local stand-in for the Bedrock batch inference API (create/get_model_invocation_job).
+
+Reads the job's JSONL input through an S3-like client (see local_s3.py), answers each
+record with a fake_bedrock responder and writes <output uri>/<job id>/<input>.out in
+the same record layout Bedrock uses. The job runs on the first status poll after
+submission, so callers see it move from Submitted to a terminal state.
+"""
+import json
+import uuid
+
+from botocore.exceptions import ClientError
+
+from fake_bedrock import default_responder
+
+
+def parse_s3_uri(uri):
+    bucket, _, key = uri[len('s3://'):].partition('/')
+    return bucket, key
+
+
+class LocalBatchInferenceClient:
+    def __init__(self, s3_client, responder=default_responder, fail_every=0, min_records=100):
+        """
+        fail_every: answer every Nth record with an error instead of a model output.
+        min_records: jobs with fewer records fail validation, as they do on Bedrock.
+        """
+        self.s3 = s3_client
+        self.responder = responder
+        self.fail_every = fail_every
+        self.min_records = min_records
+        self.jobs = {}
+
+    def create_model_invocation_job(self, jobName, roleArn, modelId, inputDataConfig, outputDataConfig, **kwargs):
+        if any(job['jobName'] == jobName for job in self.jobs.values()):
+            raise ClientError({'Error': {'Code': 'ConflictException', 'Message': f"Job {jobName} already exists"}},
+                              'CreateModelInvocationJob')
+        job_id = uuid.uuid4().hex[:12]
+        job_arn = f"arn:aws:bedrock:us-east-1:000000000000:model-invocation-job/{job_id}"
+        self.jobs[job_arn] = {
+            'jobArn': job_arn,
+            'jobName': jobName,
+            'modelId': modelId,
+            'roleArn': roleArn,
+            'status': 'Submitted',
+            'inputDataConfig': inputDataConfig,
+            'outputDataConfig': outputDataConfig,
+        }
+        return {'jobArn': job_arn}
+
+    def get_model_invocation_job(self, jobIdentifier):
+        job = self.jobs[jobIdentifier]
+        if job['status'] == 'Submitted':
+            self._run(job)
+        return dict(job)
+
+    def _run(self, job):
+        in_bucket, in_key = parse_s3_uri(job['inputDataConfig']['s3InputDataConfig']['s3Uri'])
+        out_bucket, out_prefix = parse_s3_uri(job['outputDataConfig']['s3OutputDataConfig']['s3Uri'])
+        body = self.s3.get_object(Bucket=in_bucket, Key=in_key)['Body']
+        records = [json.loads(line) for line in body.iter_lines() if line.strip()]
+        if len(records) < self.min_records:
+            job['status'] = 'Failed'
+            job['message'] = f"Job has {len(records)} records, at least {self.min_records} are required"
+            return
+
+        lines = []
+        for n, record in enumerate(records, start=1):
+            if self.fail_every and n % self.fail_every == 0:
+                output = {'recordId': record['recordId'], 'modelInput': record['modelInput'],
+                          'error': {'errorCode': 400, 'errorMessage': 'Simulated record failure'}}
+            else:
+                model_input = record['modelInput']
+                text = self.responder(job['modelId'], model_input['messages'], model_input.get('system'))
+                output = {'recordId': record['recordId'], 'modelInput': model_input, 'modelOutput': {
+                    'type': 'message',
+                    'role': 'assistant',
+                    'content': [{'type': 'text', 'text': text}],
+                    'stop_reason': 'end_turn',
+                }}
+            lines.append(json.dumps(output))
+
+        job_id = job['jobArn'].rsplit('/', 1)[-1]
+        file_name = in_key.rsplit('/', 1)[-1]
+        prefix = f"{out_prefix.rstrip('/')}/{job_id}/"
+        self.s3.put_object(Bucket=out_bucket, Key=f"{prefix}{file_name}.out", Body="\n".join(lines) + "\n")
+        errors = sum(1 for line in lines if '"modelOutput"' not in line)
+        self.s3.put_object(Bucket=out_bucket, Key=f"{prefix}manifest.json.out", Body=json.dumps({
+            'totalRecordCount': len(records),
+            'processedRecordCount': len(records),
+            'successRecordCount': len(records) - errors,
+            'errorRecordCount': errors,
+        }))
+        job['status'] = 'PartiallyCompleted' if errors else 'Completed'
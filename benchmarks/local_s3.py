@@ -0,0 +1,209 @@
+"""Directory-backed stand-in for the subset of the boto3 S3 client the pipeline uses.
+
+Objects live at <root>/<bucket>/<key>. ETags are content MD5s, ranged GETs and
+conditional puts (IfMatch / IfNoneMatch) are honoured, and missing keys raise the same ClientError
+codes as S3, so code written against boto3 runs unchanged:
+
+    s3 = LocalS3Client('/tmp/s3')
+    S3Handler('my-bucket', s3_client=s3).read_csv('staged/file.csv')
+"""
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+
+from botocore.exceptions import ClientError
+
+
+def _error(code, message, operation):
+    return ClientError({'Error': {'Code': code, 'Message': message}}, operation)
+
+
+class LocalBody:
+    """The parts of botocore's StreamingBody that callers rely on."""
+
+    def __init__(self, path, byte_range=None):
+        """byte_range: inclusive (first, last) offsets, as in a Range: bytes=first-last header."""
+        self._file = open(path, 'rb')
+        if byte_range is not None:
+            with self._file:
+                self._file.seek(byte_range[0])
+                self._file = io.BytesIO(self._file.read(byte_range[1] - byte_range[0] + 1))
+
+    def read(self, amt=None):
+        if self._file.closed:
+            return b''
+        data = self._file.read() if amt is None else self._file.read(amt)
+        if not data:
+            self._file.close()
+        return data
+
+    def iter_lines(self, chunk_size=1024, keepends=False):
+        with self._file:
+            for line in self._file:
+                yield line if keepends else line.rstrip(b'\r\n')
+
+    def close(self):
+        self._file.close()
+
+
+class LocalPaginator:
+    def __init__(self, method):
+        self._method = method
+
+    def paginate(self, **kwargs):
+        while True:
+            page = self._method(**kwargs)
+            yield page
+            if not page.get('IsTruncated'):
+                return
+            kwargs['ContinuationToken'] = page['NextContinuationToken']
+
+
+class LocalS3Client:
+    def __init__(self, root, page_size=1000):
+        self.root = root
+        self.page_size = page_size
+        self.calls = {}
+        self._uploads = {}
+        self._lock = threading.Lock()
+
+    def _path(self, bucket, key):
+        return os.path.join(self.root, bucket, *key.split('/'))
+
+    def _count(self, operation):
+        with self._lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+
+    @staticmethod
+    def _etag(path):
+        md5 = hashlib.md5()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                md5.update(chunk)
+        return f'"{md5.hexdigest()}"'
+
+    def _write(self, path, chunks):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+        os.replace(tmp_path, path)
+
+    def get_object(self, Bucket, Key, Range=None, **kwargs):
+        self._count('GetObject')
+        path = self._path(Bucket, Key)
+        if not os.path.isfile(path):
+            raise _error('NoSuchKey', 'The specified key does not exist.', 'GetObject')
+        size = os.path.getsize(path)
+        byte_range = None
+        if Range is not None:
+            first, last = Range[len('bytes='):].split('-')
+            byte_range = (int(first), min(int(last), size - 1))
+            size = byte_range[1] - byte_range[0] + 1
+        return {'Body': LocalBody(path, byte_range), 'ETag': self._etag(path), 'ContentLength': size}
+
+    def head_object(self, Bucket, Key, **kwargs):
+        self._count('HeadObject')
+        path = self._path(Bucket, Key)
+        if not os.path.isfile(path):
+            raise _error('404', 'Not Found', 'HeadObject')
+        return {'ETag': self._etag(path), 'ContentLength': os.path.getsize(path)}
+
+    def put_object(self, Bucket, Key, Body=b'', IfMatch=None, IfNoneMatch=None, **kwargs):
+        self._count('PutObject')
+        path = self._path(Bucket, Key)
+        with self._lock:
+            exists = os.path.isfile(path)
+            if IfNoneMatch == '*' and exists:
+                raise _error('PreconditionFailed', 'At least one of the pre-conditions you specified did not hold',
+                             'PutObject')
+            if IfMatch is not None and (not exists or self._etag(path) != IfMatch):
+                raise _error('PreconditionFailed', 'At least one of the pre-conditions you specified did not hold',
+                             'PutObject')
+            self._write(path, [Body.read() if hasattr(Body, 'read') else Body])
+            return {'ETag': self._etag(path)}
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        self._count('DeleteObject')
+        try:
+            os.remove(self._path(Bucket, Key))
+        except FileNotFoundError:
+            pass
+        return {}
+
+    def delete_objects(self, Bucket, Delete, **kwargs):
+        for obj in Delete['Objects']:
+            self.delete_object(Bucket=Bucket, Key=obj['Key'])
+        return {'Deleted': [{'Key': obj['Key']} for obj in Delete['Objects']]}
+
+    def copy_object(self, Bucket, Key, CopySource, **kwargs):
+        self._count('CopyObject')
+        source = self._path(CopySource['Bucket'], CopySource['Key'])
+        if not os.path.isfile(source):
+            raise _error('NoSuchKey', 'The specified key does not exist.', 'CopyObject')
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(source, path)
+        return {'CopyObjectResult': {'ETag': self._etag(path)}}
+
+    def list_objects_v2(self, Bucket, Prefix='', ContinuationToken=None, MaxKeys=None, **kwargs):
+        self._count('ListObjectsV2')
+        bucket_root = os.path.join(self.root, Bucket)
+        keys = []
+        for directory, _, files in os.walk(bucket_root):
+            for name in files:
+                if name.endswith('.tmp'):
+                    continue
+                key = os.path.relpath(os.path.join(directory, name), bucket_root).replace(os.sep, '/')
+                if key.startswith(Prefix):
+                    keys.append(key)
+        keys.sort()
+        if ContinuationToken:
+            keys = [k for k in keys if k > ContinuationToken]
+        page_size = MaxKeys or self.page_size
+        page, rest = keys[:page_size], keys[page_size:]
+        response = {'KeyCount': len(page), 'IsTruncated': bool(rest)}
+        # Like S3, an empty listing has no Contents at all.
+        if page:
+            response['Contents'] = [{'Key': k, 'Size': os.path.getsize(self._path(Bucket, k))} for k in page]
+        if rest:
+            response['NextContinuationToken'] = page[-1]
+        return response
+
+    def get_paginator(self, operation_name):
+        if operation_name != 'list_objects_v2':
+            raise NotImplementedError(operation_name)
+        return LocalPaginator(self.list_objects_v2)
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        self._count('CreateMultipartUpload')
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self._uploads[upload_id] = {}
+        return {'UploadId': upload_id, 'Bucket': Bucket, 'Key': Key}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body, **kwargs):
+        self._count('UploadPart')
+        data = Body.read() if hasattr(Body, 'read') else Body
+        with self._lock:
+            self._uploads[UploadId][PartNumber] = data
+        return {'ETag': f'"{hashlib.md5(data).hexdigest()}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload, **kwargs):
+        self._count('CompleteMultipartUpload')
+        with self._lock:
+            parts = self._uploads.pop(UploadId)
+        path = self._path(Bucket, Key)
+        self._write(path, (parts[p['PartNumber']] for p in MultipartUpload['Parts']))
+        return {'ETag': self._etag(path), 'Bucket': Bucket, 'Key': Key}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId, **kwargs):
+        self._count('AbortMultipartUpload')
+        with self._lock:
+            self._uploads.pop(UploadId, None)
+        return {}
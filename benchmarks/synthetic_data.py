@@ -0,0 +1,94 @@
+"""Synthetic Jira issues of configurable size and shape.
+
+Every issue is a pure function of (seed, project, number), so fake_jira.FakeJira can
+serve the same issue on every page request:
+
+    issues = SyntheticIssues(description_words=80, long_share=0.05, multiline_share=0.3, duplicate_share=0.1)
+    with FakeJira(issues_per_project=1000, issue_factory=issues) as jira:
+        ...
+"""
+import random
+import zlib
+
+WORDS = ("access account alert api app auth backend billing bucket build cache certificate cluster config "
+         "connection cron dashboard database deploy disk dns docs endpoint error export feature gateway "
+         "index ingest invoice job kafka lambda latency login memory metric migration monitor network "
+         "node oauth outage partition permission pipeline pod queue quota rate release report request "
+         "role schema secret service shard sso storage subnet timeout token upgrade user vpc worker").split()
+ALERT_TEMPLATE = ("[ALERT] {metric} above threshold on ip-10-0-{a}-{b}.ec2.internal at 2024-05-{day:02d}T{hour:02d}:"
+                  "{minute:02d}:00Z", "Alarm {metric}-high entered ALARM state. Host 10.0.{a}.{b}, request id "
+                  "{uuid}. This ticket was automatically created by monitoring.")
+LOG_LINE = '{level} 2024-05-{day:02d} {hour:02d}:{minute:02d}:{second:02d} worker-{worker} "{word}" failed, retry {n}'
+
+
+class SyntheticIssues:
+    def __init__(self, description_words=60, long_share=0.05, long_factor=20, multiline_share=0.3,
+                 duplicate_share=0.05, alert_share=0.0, paragraphs=2, seed=0):
+        """
+        description_words: mean words in a description; individual issues vary around it.
+        long_share: fraction of issues whose description is long_factor times longer (pasted logs).
+        multiline_share: fraction of descriptions holding line breaks, quotes and commas.
+        duplicate_share: fraction of issues that copy an earlier issue's summary and description.
+        alert_share: fraction of issues that are near-identical automated alerts.
+        """
+        self.description_words = description_words
+        self.long_share = long_share
+        self.long_factor = long_factor
+        self.multiline_share = multiline_share
+        self.duplicate_share = duplicate_share
+        self.alert_share = alert_share
+        self.paragraphs = paragraphs
+        self.seed = seed
+
+    def __call__(self, project, number):
+        summary, description = self.content(project, number)
+        rng = self._rng(project, number, 'meta')
+        extra = [' '.join(rng.choice(WORDS) for _ in range(20)) for _ in range(self.paragraphs - 1)]
+        return {
+            'id': str(zlib.crc32(f"{project}-{number}".encode('utf-8'))),
+            'key': f"{project}-{number}",
+            'fields': {
+                'summary': summary,
+                'labels': rng.sample(['backend', 'frontend', 'infra', 'oncall', 'customer'], rng.randrange(3)),
+                'created': '2024-01-01T00:00:00.000+0000',
+                'updated': f"2024-01-01T{number // 3600 % 24:02d}:{number // 60 % 60:02d}:{number % 60:02d}.000+0000",
+                'parent': {'key': f"{project}-{number // 50}"} if number % 7 == 0 else None,
+                'description': {
+                    'type': 'doc',
+                    'version': 1,
+                    'content': [{'type': 'paragraph', 'content': [{'type': 'text', 'text': text}]}
+                                for text in [description] + extra],
+                },
+            },
+        }
+
+    def content(self, project, number):
+        """(summary, description) of an issue, following duplicates back to their original."""
+        rng = self._rng(project, number, 'content')
+        while number > 0 and rng.random() < self.duplicate_share:
+            number = rng.randrange(number)
+            rng = self._rng(project, number, 'content')
+
+        if rng.random() < self.alert_share:
+            fields = {'metric': rng.choice(['cpu', 'memory', 'disk']), 'a': rng.randrange(256),
+                      'b': rng.randrange(256), 'day': rng.randrange(1, 29), 'hour': rng.randrange(24),
+                      'minute': rng.randrange(60), 'uuid': '%032x' % rng.getrandbits(128)}
+            return ALERT_TEMPLATE[0].format(**fields), ALERT_TEMPLATE[1].format(**fields)
+
+        words = max(1, int(rng.gauss(self.description_words, self.description_words / 3)))
+        if rng.random() < self.long_share:
+            words *= self.long_factor
+        summary = ' '.join(rng.choice(WORDS) for _ in range(rng.randrange(4, 10))).capitalize()
+        if rng.random() < self.multiline_share:
+            lines = [' '.join(rng.choice(WORDS) for _ in range(10)) for _ in range(max(1, words // 20))]
+            logs = [LOG_LINE.format(level=rng.choice(['ERROR', 'WARN']), day=rng.randrange(1, 29),
+                                    hour=rng.randrange(24), minute=rng.randrange(60), second=rng.randrange(60),
+                                    worker=rng.randrange(8), word=rng.choice(WORDS), n=rng.randrange(5))
+                    for _ in range(max(1, words // 40))]
+            description = '\n'.join(lines[:len(lines) // 2] + logs + lines[len(lines) // 2:])
+        else:
+            description = ' '.join(rng.choice(WORDS) for _ in range(words))
+        return summary, description
+
+    def _rng(self, project, number, purpose):
+        return random.Random(f"{self.seed}/{project}/{number}/{purpose}")
@@ -55,6 +55,30 @@ resource "aws_iam_role_policy" "lambda_policy_start_glue" {
         Action = "s3:GetObject"
         Resource = "${aws_s3_bucket.bucket.arn}/*"
       },
+      {
+        # Idempotency ledger: conditional puts claim an input, a delete releases it for a retry
+        Effect = "Allow"
+        Action = [
+          "s3:PutObject",
+          "s3:DeleteObject"
+        ]
+        Resource = "${aws_s3_bucket.bucket.arn}/ledger/*"
+      },
+      {
+        # Pending uploads and the input manifests of coalesced Glue runs
+        Effect = "Allow"
+        Action = [
+          "s3:PutObject",
+          "s3:DeleteObject"
+        ]
+        Resource = "${aws_s3_bucket.bucket.arn}/glue-batches/*"
+      },
+      {
+        # Lets a read of a missing ledger record return NoSuchKey rather than AccessDenied
+        Effect = "Allow"
+        Action = "s3:ListBucket"
+        Resource = aws_s3_bucket.bucket.arn
+      },
       {
         Effect = "Allow"
         Action = [
@@ -111,19 +135,76 @@ resource "aws_iam_role_policy" "lambda_policy_classify_tickets" {
         Action = [
           "s3:GetObject",
           "s3:PutObject",
-          "s3:ListBucket"
+          "s3:ListBucket",
+          "s3:AbortMultipartUpload",
+          "s3:DeleteObject"
         ]
         Resource = [
           "${aws_s3_bucket.bucket.arn}",
           "${aws_s3_bucket.bucket.arn}/*"
         ]
       },
+      {
+        Effect = "Allow"
+        Action = "lambda:InvokeFunction"
+        Resource = "arn:aws:lambda:${data.aws_region.current.name}:${data.aws_caller_identity.current.account_id}:function:classify-tickets-lambda-${random_string.random_suffix.result}"
+      },
       {
         Effect = "Allow"
         Action = [
-          "bedrock:InvokeModel"
+          "bedrock:InvokeModel",
+          "bedrock:CreateModelInvocationJob",
+          "bedrock:GetModelInvocationJob"
         ]
         Resource = "*"
+      },
+      {
+        Effect = "Allow"
+        Action = "iam:PassRole"
+        Resource = aws_iam_role.bedrock_batch_inference_role.arn
+      }
+    ]
+  })
+}
+
+# IAM Role Bedrock assumes to read and write batch inference records
+resource "aws_iam_role" "bedrock_batch_inference_role" {
+  name = "bedrock_batch_inference_role_${random_string.random_suffix.result}"
+
+  assume_role_policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [{
+      Effect    = "Allow"
+      Principal = {
+        Service = "bedrock.amazonaws.com"
+      }
+      Action    = "sts:AssumeRole"
+      Condition = {
+        StringEquals = {
+          "aws:SourceAccount" = data.aws_caller_identity.current.account_id
+        }
+      }
+    }]
+  })
+}
+
+resource "aws_iam_role_policy" "bedrock_batch_inference_policy" {
+  role = aws_iam_role.bedrock_batch_inference_role.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect = "Allow"
+        Action = [
+          "s3:GetObject",
+          "s3:PutObject",
+          "s3:ListBucket"
+        ]
+        Resource = [
+          "${aws_s3_bucket.bucket.arn}",
+          "${aws_s3_bucket.bucket.arn}/batch-inference/*"
+        ]
       }
     ]
   })
@@ -169,6 +250,7 @@ resource "aws_iam_role_policy" "lambda_policy_fetch_jira_issues" {
       {
         Effect = "Allow"
         Action = [
+          "s3:GetObject",
           "s3:PutObject",
           "s3:ListBucket"
         ]
@@ -216,14 +298,35 @@ resource "aws_iam_role_policy" "glue_policy" {
         Effect = "Allow"
         Action = [
           "s3:GetObject",
-          "s3:PutObject"
+          "s3:PutObject",
+          "s3:DeleteObject",
+          "s3:AbortMultipartUpload"
         ]
         Resource = [
           "${aws_s3_bucket.bucket.arn}/unprocessed/*",
           "${aws_s3_bucket.bucket.arn}/staged/*",
+          "${aws_s3_bucket.bucket.arn}/index/*",
+          "${aws_s3_bucket.bucket.arn}/tmp/*",
           "${aws_s3_bucket.bucket.arn}/scripts/*"
         ]
       },
+      {
+        # Job metrics; Glue's log groups aren't read as Embedded Metric Format
+        Effect = "Allow"
+        Action = "cloudwatch:PutMetricData"
+        Resource = "*"
+        Condition = {
+          StringEquals = {
+            "cloudwatch:namespace" = "JiraTicketClassification"
+          }
+        }
+      },
+      {
+        # Input manifests of coalesced runs (--INPUT_MANIFEST), written by the start-glue-job Lambda
+        Effect = "Allow"
+        Action = "s3:GetObject"
+        Resource = "${aws_s3_bucket.bucket.arn}/glue-batches/*"
+      },
       {
         Effect = "Allow"
         Action = "s3:ListBucket"
@@ -233,7 +336,10 @@ resource "aws_iam_role_policy" "glue_policy" {
             "s3:prefix": [
               "unprocessed/*",
               "staged/*",
-              "scripts/*"
+              "index/*",
+              "tmp/*",
+              "scripts/*",
+              "glue-batches/*"
             ]
           }
         }
@@ -363,6 +469,22 @@ data "archive_file" "lambda_package_fetch_jira_issues" {
 
 }
 
+# Modules every Lambda imports (metrics, runtime, idempotency), packaged once as a layer.
+# The layer's python/ directory is on each function's import path.
+data "archive_file" "lambda_layer_shared" {
+  type        = "zip"
+  source_dir  = "${path.module}/../src/shared"
+  output_path = "${path.module}/lambda_layer_shared_payload.zip"
+  excludes    = ["python/__pycache__"]
+}
+
+resource "aws_lambda_layer_version" "shared" {
+  layer_name          = "jira-classification-shared-${random_string.random_suffix.result}"
+  filename            = data.archive_file.lambda_layer_shared.output_path
+  source_code_hash    = data.archive_file.lambda_layer_shared.output_base64sha256
+  compatible_runtimes = ["python3.12"]
+}
+
 
 #################################
 # Lambda
@@ -377,11 +499,16 @@ resource "aws_lambda_function" "start_glue_job_lambda" {
   runtime          = "python3.12"
   role             = aws_iam_role.lambda_role_start_glue.arn
   source_code_hash = data.archive_file.lambda_package_start_glue.output_base64sha256
+  layers           = [aws_lambda_layer_version.shared.arn]
 
   environment {
     variables = {
-      LOG_LEVEL     = "DEBUG"
-      GLUE_JOB_NAME = aws_glue_job.jira_etl_job.name
+      LOG_LEVEL                 = "DEBUG"
+      GLUE_JOB_NAME             = aws_glue_job.jira_etl_job.name
+      BUCKET_NAME               = aws_s3_bucket.bucket.id
+      GLUE_TRIGGER_MODE         = "coalesce"
+      GLUE_BATCH_WINDOW_SECONDS = "120"
+      GLUE_BATCH_MAX_FILES      = "50"
     }
   }
 
@@ -398,11 +525,16 @@ resource "aws_lambda_function" "classify_tickets_lambda" {
   runtime          = "python3.12"
   role             = aws_iam_role.lambda_role_classify_tickets.arn
   source_code_hash = data.archive_file.lambda_package_classify_tickets.output_base64sha256
+  layers           = [aws_lambda_layer_version.shared.arn]
 
   environment {
     variables = {
       LOG_LEVEL = "DEBUG"
       BUCKET_NAME = aws_s3_bucket.bucket.id
+      CACHE_BACKEND = "s3"
+      CLASSIFY_MODE = "checkpointed"
+      CLASSIFY_NEAR_DUPLICATES = "true"
+      BATCH_INFERENCE_ROLE_ARN = aws_iam_role.bedrock_batch_inference_role.arn
     }
   }
 
@@ -437,12 +569,14 @@ resource "aws_lambda_function" "fetch_jira_issues_lambda" {
   runtime          = "python3.12"
   role             = aws_iam_role.lambda_role_fetch_jira_issues.arn
   source_code_hash = data.archive_file.lambda_package_fetch_jira_issues.output_base64sha256
+  layers           = [aws_lambda_layer_version.shared.arn]
 
   environment {
     variables = {
       LOG_LEVEL                     = "DEBUG"
       BUCKET_NAME                   = aws_s3_bucket.bucket.id
       JIRA_CREDENTIALS_SECRET       = aws_secretsmanager_secret.jira_credentials.name
+      SECRET_TTL_SECONDS            = "300"
       S3_PREFIX                     = "unprocessed"
       PROJECT_IDS_COMMA_SEPARATED   = "TannerTest"
     }
@@ -470,6 +604,7 @@ resource "aws_s3_bucket_notification" "bucket_notification" {
     lambda_function_arn = aws_lambda_function.classify_tickets_lambda.arn
     events              = ["s3:ObjectCreated:*"]
     filter_prefix       = "staged/"
+    filter_suffix       = ".csv"
   }
 
   depends_on = [
@@ -501,7 +636,54 @@ resource "aws_lambda_permission" "allow_cloudwatch_to_call_fetch_jira_issues" {
   source_arn    = aws_cloudwatch_event_rule.daily_jira_fetch.arn
 }
 
+# Launches coalesced Glue runs whose window has passed without another upload
+resource "aws_cloudwatch_event_rule" "glue_batch_flush" {
+  name                = "glue-batch-flush-${random_string.random_suffix.result}"
+  description         = "Triggers the start-glue-job Lambda to launch pending upload batches that are due"
+  schedule_expression = "rate(1 minute)"
+}
 
+resource "aws_cloudwatch_event_target" "start_glue_job_flush_target" {
+  rule      = aws_cloudwatch_event_rule.glue_batch_flush.name
+  target_id = "StartGlueJobFlush"
+  arn       = aws_lambda_function.start_glue_job_lambda.arn
+}
+
+resource "aws_lambda_permission" "allow_cloudwatch_to_call_start_glue" {
+  statement_id  = "AllowExecutionFromCloudWatchGlueBatchFlush"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.start_glue_job_lambda.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.glue_batch_flush.arn
+}
+
+# Collects bedrock-batch classification jobs once Bedrock reports a final state
+resource "aws_cloudwatch_event_rule" "batch_inference_job_finished" {
+  name        = "classify-batch-inference-${random_string.random_suffix.result}"
+  description = "Triggers the classify-tickets Lambda when a classification batch inference job finishes"
+  event_pattern = jsonencode({
+    source      = ["aws.bedrock"]
+    detail-type = ["Batch Inference Job State Change"]
+    detail = {
+      batchJobName = [{ prefix = "classify-" }]
+      status       = ["Completed", "PartiallyCompleted", "Failed", "Stopped", "Expired"]
+    }
+  })
+}
+
+resource "aws_cloudwatch_event_target" "classify_tickets_batch_inference_target" {
+  rule      = aws_cloudwatch_event_rule.batch_inference_job_finished.name
+  target_id = "ClassifyTicketsBatchInference"
+  arn       = aws_lambda_function.classify_tickets_lambda.arn
+}
+
+resource "aws_lambda_permission" "allow_cloudwatch_to_call_classify_tickets" {
+  statement_id  = "AllowExecutionFromCloudWatchBatchInference"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.classify_tickets_lambda.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.batch_inference_job_finished.arn
+}
 
 #################################
 # AWS Glue
@@ -514,6 +696,13 @@ resource "aws_s3_object" "etl_script_upload" {
   source = "${path.module}/../src/glue/etl_script.py"
 }
 
+# Metrics helper imported by the ETL script (the same file as in the shared Lambda layer), shipped through --extra-py-files
+resource "aws_s3_object" "glue_metrics_upload" {
+  bucket = aws_s3_bucket.bucket.id
+  key    = "scripts/metrics.py"
+  source = "${path.module}/../src/shared/python/metrics.py"
+}
+
 
 # Glue ETL Job resource
 resource "aws_glue_job" "jira_etl_job" {
@@ -525,8 +714,12 @@ resource "aws_glue_job" "jira_etl_job" {
     python_version  = "3"
   }
   
+  # Add "--STAGED_FORMAT" = "parquet" to also keep the new rows in staged/parquet/. Classification
+  # always reads the staged CSV, so the copy only pays off when staged/ is queried with Athena or
+  # Spark, or when the Key index has to be rebuilt from a long staged history.
   default_arguments = {
     "--job-bookmark-option" = "job-bookmark-enable"
+    "--extra-py-files"      = "s3://${aws_s3_bucket.bucket.bucket}/scripts/metrics.py"
   }
   
   max_retries     = 0
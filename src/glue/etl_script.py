@@ -1,140 +1,431 @@
-from awsglue.utils import getResolvedOptions
 from pyspark.sql import SparkSession
-from pyspark.sql.functions import col, when
-from pyspark.sql.types import StructType, StringType
+from pyspark.sql import Window
+from pyspark.sql.functions import broadcast, col, expr, lit, row_number
+from pyspark.sql.types import StructType, StructField, StringType
 import sys
+import csv
 import datetime
+import io
+import json
 import logging
+import math
+import uuid
 import boto3
+from metrics import metrics
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+# Only the summary line is logged; Glue's log groups aren't read as EMF, so the metrics go to PutMetricData.
+metrics.emit = logger.info
 
 # Initialize Spark session
 spark = SparkSession.builder.appName("DataProcessingJob").getOrCreate()
 
 # Initialize S3 client
 s3 = boto3.client('s3')
+cloudwatch = boto3.client('cloudwatch')
+
+# Root of the paths Spark reads and writes; a local run points it at a file:// directory.
+STORAGE_ROOT = "s3://"
+
+# Declared schema of the Jira mapping fields written by the fetch-jira-issues Lambda
+JIRA_COLUMNS = ["Id", "Key", "Parent", "Summary", "Description", "Labels"]
+JIRA_SCHEMA = StructType([StructField(name, StringType(), True) for name in JIRA_COLUMNS])
+CSV_READ_SCHEMA = StructType(JIRA_SCHEMA.fields + [StructField("_corrupt_record", StringType(), True)])
+
+# Defaults for optional job arguments
+DEFAULT_OPTIONS = {
+    'KEY_INDEX_BUCKETS': '64',
+    'KEY_INDEX_BLOOM_FILTER': 'true',
+    'STAGED_FORMAT': 'csv',
+    'OUTPUT_MODE': 'distributed',
+    'TARGET_FILE_MB': '128',
+    'KEY_INDEX_MAX_FILES': '32',
+    # Set by the start-glue-job Lambda from the input's identity, so a retried run overwrites its own output.
+    'OUTPUT_NAME': '',
+    # Either a single uploaded file, or a JSON manifest listing a batch of them (start-glue-job coalesce mode).
+    'NEW_CSV_FILE': '',
+    'INPUT_MANIFEST': '',
+}
+
+def get_optional_args(argv, defaults):
+    """getResolvedOptions fails on missing arguments, so only resolve the ones that were passed."""
+    from awsglue.utils import getResolvedOptions
+    present = [name for name in defaults if f"--{name}" in argv]
+    resolved = getResolvedOptions(argv, present) if present else {}
+    return {name: resolved.get(name, default) for name, default in defaults.items()}
+
+def s3_path(bucket, key=""):
+    """Spark path of an object or prefix in the bucket."""
+    return f"{STORAGE_ROOT}{bucket}/{key}"
+
+def path_exists(path):
+    """Check a path or glob through the Hadoop filesystem so it works for s3:// and local paths alike."""
+    hadoop_path = spark._jvm.org.apache.hadoop.fs.Path(path)
+    fs = hadoop_path.getFileSystem(spark._jsc.hadoopConfiguration())
+    matches = fs.globStatus(hadoop_path)
+    return matches is not None and len(matches) > 0
 
 def check_s3_path_exists(bucket, prefix):
     """Check if a given S3 path exists."""
     response = s3.list_objects_v2(Bucket=bucket, Prefix=prefix, MaxKeys=1)
     return 'Contents' in response
 
+def csv_reader():
+    """CSV reader handling multi-line fields, commas, and nested quotes. No inferSchema: that costs a second scan."""
+    return spark.read \
+        .option("header", "true") \
+        .option("multiline", "true") \
+        .option("quote", '"') \
+        .option("escape", '"') \
+        .option("delimiter", ",") \
+        .option("mode", "PERMISSIVE") \
+        .option("columnNameOfCorruptRecord", "_corrupt_record") \
+        .option("encoding", "UTF-8")
+
+def empty_jira_df():
+    return spark.createDataFrame([], JIRA_SCHEMA)
+
+def conform_to_schema(df, schema=JIRA_SCHEMA):
+    """Select the declared columns by name, filling any the file doesn't have with nulls."""
+    return df.select([
+        (col(field.name) if field.name in df.columns else lit(None)).cast(field.dataType).alias(field.name)
+        for field in schema.fields
+    ])
+
 def read_csv_robust(path):
-    """Read a CSV file into a Spark DataFrame, handling multi-line fields, commas, and nested quotes."""
+    """Read Jira CSV into a DataFrame with the declared schema.
+
+    Files whose header matches JIRA_COLUMNS are read with the explicit schema. Older files
+    with a different layout go through a compatibility path that maps columns by name.
+    """
     try:
-        # Check if the path exists
-        bucket, key = path.replace("s3://", "").split("/", 1)
-        if not check_s3_path_exists(bucket, key):
+        if not path_exists(path):
             logger.warning(f"Path does not exist: {path}")
-            return spark.createDataFrame([], StructType([]))
-
-        # Read the CSV file into a DataFrame with robust options
-        df = spark.read \
-            .option("header", "true") \
-            .option("inferSchema", "true") \
-            .option("multiline", "true") \
-            .option("quote", '"') \
-            .option("escape", '"') \
-            .option("delimiter", ",") \
-            .option("mode", "PERMISSIVE") \
-            .option("columnNameOfCorruptRecord", "_corrupt_record") \
-            .option("encoding", "UTF-8") \
-            .csv(path)
-        
-        if df.rdd.isEmpty():
-            logger.warning(f"No data read from {path}")
-            return spark.createDataFrame([], StructType([]))
-
-        # Log the schema of the read data
-        logger.info(f"Schema of data read from {path}:")
-        df.printSchema()
-        
-        # Check for corrupt records
-        if "_corrupt_record" in df.columns:
-            corrupt_count = df.filter(col("_corrupt_record").isNotNull()).count()
-            if corrupt_count > 0:
-                logger.warning(f"Found {corrupt_count} corrupt records in {path}")
+            return empty_jira_df()
+
+        # Without a schema Spark only parses the header line here.
+        header = csv_reader().csv(path).columns
+        if header == JIRA_COLUMNS:
+            df = csv_reader().schema(CSV_READ_SCHEMA).csv(path)
             df = df.filter(col("_corrupt_record").isNull()).drop("_corrupt_record")
-        
-        # Filter out rows with null or empty 'Key' if 'Key' column exists
-        if "Key" in df.columns:
-            df = df.filter(col("Key").isNotNull() & (col("Key") != ""))
-            logger.info(f"Successfully read data from {path}. Count after filtering: {df.count()}")
         else:
-            logger.warning(f"'Key' column not found in {path}. No filtering applied.")
-        
-        return df
+            logger.info(f"Reading {path} with the legacy CSV layout {header}")
+            df = conform_to_schema(csv_reader().csv(path))
+
+        # Filter out rows with null or empty 'Key'
+        return df.filter(col("Key").isNotNull() & (col("Key") != ""))
     except Exception as e:
         logger.error(f"Failed to read from {path}: {str(e)}. Returning empty DataFrame.")
-        return spark.createDataFrame([], StructType([]))
+        return empty_jira_df()
+
+def read_input_files(s3_bucket, keys):
+    """Read a batch of input files as one DataFrame; where a Key is in several, the latest file's row wins.
+
+    Keys are in upload order, so a later file holds the more recent copy of a ticket. The
+    per-file reads are unioned lazily and scanned in the same job.
+    """
+    if len(keys) == 1:
+        return read_csv_robust(s3_path(s3_bucket, keys[0]))
+    batch = None
+    for order, key in enumerate(keys):
+        df = read_csv_robust(s3_path(s3_bucket, key)).withColumn("_input_order", lit(order))
+        batch = df if batch is None else batch.unionByName(df)
+    latest_first = Window.partitionBy("Key").orderBy(col("_input_order").desc())
+    return batch.withColumn("_rank", row_number().over(latest_first)) \
+        .filter(col("_rank") == 1) \
+        .drop("_rank", "_input_order")
+
+def load_input_manifest(s3_bucket, manifest_key):
+    """Input keys of a batch written by the start-glue-job Lambda, in upload order."""
+    manifest = json.loads(s3.get_object(Bucket=s3_bucket, Key=manifest_key)['Body'].read())
+    files = sorted(manifest['files'], key=lambda f: f.get('queued_at', 0))
+    return [f['key'] for f in files]
+
+def write_staged_parquet(df, path, ingest_date):
+    """Append records to the columnar staged store, partitioned by ingest date."""
+    df.withColumn("ingest_date", lit(ingest_date)) \
+        .write.mode("append") \
+        .partitionBy("ingest_date") \
+        .option("compression", "snappy") \
+        .parquet(path)
+
+def read_staged_history(s3_bucket):
+    """All staged records: the Parquet store plus any legacy CSV files."""
+    parquet_path = s3_path(s3_bucket, "staged/parquet/")
+    frames = []
+    if path_exists(parquet_path):
+        frames.append(spark.read.parquet(parquet_path).select(*JIRA_COLUMNS))
+    if check_s3_path_exists(s3_bucket, "staged/staged_"):
+        frames.append(read_csv_robust(s3_path(s3_bucket, "staged/*.csv")))
+    if not frames:
+        return empty_jira_df()
+    history = frames[0]
+    for frame in frames[1:]:
+        history = history.unionByName(frame)
+    return history
+
+def with_key_bucket(df, num_buckets):
+    """Add the hash partition column used to lay out the Key index."""
+    return df.withColumn("key_bucket", expr(f"pmod(xxhash64(Key), {int(num_buckets)})").cast("int"))
+
+def enable_bloom_filter_prefilter():
+    """Let Spark build a runtime Bloom filter from the small batch side and apply it to the index scan."""
+    spark.conf.set("spark.sql.optimizer.runtime.bloomFilter.enabled", "true")
+
+def load_key_index(index_path):
+    if not path_exists(index_path):
+        return None
+    return spark.read.parquet(index_path)
+
+def filter_new_records(batch_df, index_path, num_buckets):
+    """Drop rows whose Key is already in the index, touching only the index partitions the batch hashes to."""
+    batch_df = batch_df.dropDuplicates(["Key"])
+    index_df = load_key_index(index_path)
+    if index_df is None:
+        logger.warning(f"No Key index at {index_path}. Treating all unprocessed data as new.")
+        return batch_df
+
+    batch_keys = with_key_bucket(batch_df.select("Key"), num_buckets).cache()
+    buckets = [row.key_bucket for row in batch_keys.select("key_bucket").distinct().collect()]
+
+    # key_bucket is the partition column, so this filter prunes whole directories of the index.
+    existing_keys = index_df.filter(col("key_bucket").isin(buckets)) \
+        .join(broadcast(batch_keys), ["key_bucket", "Key"], "leftsemi") \
+        .select("Key")
+    new_records = batch_df.join(broadcast(existing_keys), "Key", "leftanti")
+    batch_keys.unpersist()
+    return new_records
+
+def update_key_index(new_records, index_path, num_buckets, bloom_filter=True):
+    """Append the keys of newly staged records to the index."""
+    writer = with_key_bucket(new_records.select("Key"), num_buckets) \
+        .repartition("key_bucket") \
+        .write.mode("append") \
+        .partitionBy("key_bucket")
+    if bloom_filter:
+        writer = writer.option("parquet.bloom.filter.enabled#Key", "true")
+    writer.parquet(index_path)
+
+def compact_key_index(index_path, max_files_per_bucket, bloom_filter=True):
+    """Rewrite every index partition holding more than max_files_per_bucket files as one file.
 
+    Each run appends a small file to every partition it touches, so without this a lookup
+    reads a number of files that grows with the number of past runs rather than the batch.
+    """
+    hadoop_fs = spark._jvm.org.apache.hadoop.fs
+    root = index_path.rstrip("/")
+    fs = hadoop_fs.Path(root).getFileSystem(spark._jsc.hadoopConfiguration())
+    files = {}
+    for status in fs.globStatus(hadoop_fs.Path(f"{root}/key_bucket=*/*.parquet")) or []:
+        path = status.getPath()
+        files.setdefault(path.getParent().getName(), []).append(path.toString())
+    crowded = {partition: paths for partition, paths in files.items() if len(paths) > max_files_per_bucket}
+    if not crowded:
+        return 0
 
-def process_data(s3_bucket, new_csv_file):
-    """Process unprocessed data and deduplicate against existing staged data."""
+    # Spark skips paths starting with "_", so lookups never see the half-written copy.
+    tmp = f"{root}/_compaction"
+    old_files = [path for paths in crowded.values() for path in paths]
+    writer = spark.read.option("basePath", root).parquet(*old_files) \
+        .select("Key", "key_bucket").distinct() \
+        .repartition("key_bucket") \
+        .write.mode("overwrite") \
+        .partitionBy("key_bucket")
+    if bloom_filter:
+        writer = writer.option("parquet.bloom.filter.enabled#Key", "true")
+    writer.parquet(tmp)
+
+    # Compacted files go in before the old ones go out: a failure in between leaves duplicate
+    # Keys, which the lookup join tolerates, rather than missing ones.
+    run_id = uuid.uuid4().hex[:8]
+    for partition, paths in crowded.items():
+        for status in fs.globStatus(hadoop_fs.Path(f"{tmp}/{partition}/*.parquet")) or []:
+            name = f"compacted-{run_id}-{status.getPath().getName()}"
+            fs.rename(status.getPath(), hadoop_fs.Path(f"{root}/{partition}/{name}"))
+        for path in paths:
+            fs.delete(hadoop_fs.Path(path), False)
+    fs.delete(hadoop_fs.Path(tmp), True)
+    logger.info(f"Compacted {len(old_files)} files in {len(crowded)} Key index partitions")
+    return len(crowded)
+
+def bootstrap_key_index(s3_bucket, index_path, num_buckets, bloom_filter=True):
+    """Build the index once from the existing staged data the first time the job runs without one."""
+    if path_exists(index_path) or not check_s3_path_exists(s3_bucket, "staged/"):
+        return
+    logger.info(f"Building Key index at {index_path} from existing staged data")
+    staged_keys = read_staged_history(s3_bucket).select("Key").distinct()
+    update_key_index(staged_keys, index_path, num_buckets, bloom_filter)
+
+def write_distributed(df, s3_bucket, output_name, num_files):
+    """Write CSV from the executors, then move the parts into staged/ with server-side copies.
+
+    Spark writes to a tmp/ prefix first because its _temporary files would otherwise
+    show up under staged/ and trigger classification. Returns (rows written, keys).
+    """
+    tmp_prefix = f"tmp/glue/{output_name}/"
+    # output_name is derived from the input, so a retried run finds what a failed attempt left here.
+    df.coalesce(num_files).write \
+        .mode("overwrite") \
+        .option("header", "true") \
+        .option("quoteAll", "true") \
+        .option("escape", '"') \
+        .option("encoding", "UTF-8") \
+        .csv(s3_path(s3_bucket, tmp_prefix))
+    # df is cached by the caller, so this counts the cached rows rather than re-running the lineage.
+    rows_written = df.count()
+
+    parts = []
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=s3_bucket, Prefix=tmp_prefix):
+        parts.extend(obj['Key'] for obj in page.get('Contents', []))
+    output_keys = []
+    for i, part_key in enumerate(sorted(k for k in parts if k.endswith(".csv"))):
+        output_key = f"staged/{output_name}_part{i:04d}.csv"
+        s3.copy_object(Bucket=s3_bucket, Key=output_key, CopySource={'Bucket': s3_bucket, 'Key': part_key})
+        output_keys.append(output_key)
+    for i in range(0, len(parts), 1000):
+        s3.delete_objects(Bucket=s3_bucket, Delete={'Objects': [{'Key': k} for k in parts[i:i + 1000]], 'Quiet': True})
+    return rows_written, output_keys
+
+def write_single_file(df, s3_bucket, output_key, part_size=16 * 1024 * 1024):
+    """Stream rows to the driver one partition at a time and into a multipart upload.
+
+    Peak driver memory is one partition plus one part, not the whole result. Returns the row count.
+    """
+    upload = s3.create_multipart_upload(Bucket=s3_bucket, Key=output_key, ContentType='text/csv')
+    parts = []
+    rows_written = 0
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_ALL)
+    writer.writerow(df.columns)
+
+    def upload_part():
+        response = s3.upload_part(
+            Bucket=s3_bucket, Key=output_key, UploadId=upload['UploadId'],
+            PartNumber=len(parts) + 1, Body=buffer.getvalue().encode('utf-8')
+        )
+        parts.append({'ETag': response['ETag'], 'PartNumber': len(parts) + 1})
+        buffer.seek(0)
+        buffer.truncate()
+
+    try:
+        for row in df.toLocalIterator():
+            writer.writerow(row)
+            rows_written += 1
+            if buffer.tell() >= part_size:
+                upload_part()
+        upload_part()
+        s3.complete_multipart_upload(
+            Bucket=s3_bucket, Key=output_key, UploadId=upload['UploadId'], MultipartUpload={'Parts': parts}
+        )
+    except Exception:
+        s3.abort_multipart_upload(Bucket=s3_bucket, Key=output_key, UploadId=upload['UploadId'])
+        raise
+    return rows_written
+
+def process_data(s3_bucket, new_csv_files, num_buckets=64, bloom_filter=True, staged_format="csv",
+                 output_mode="distributed", target_file_mb=128, output_name=None, max_index_files=32):
+    """Process unprocessed data and deduplicate against the Key index of already staged data.
+
+    new_csv_files is one key or a list of keys processed together in a single pass.
+    """
     # Construct S3 paths
-    unprocessed_path = f"s3://{s3_bucket}/{new_csv_file}"
-    staged_path = f"s3://{s3_bucket}/staged/"
+    input_keys = [new_csv_files] if isinstance(new_csv_files, str) else list(new_csv_files)
+    unprocessed_path = ", ".join(s3_path(s3_bucket, key) for key in input_keys)
+    index_path = s3_path(s3_bucket, "index/keys/")
+
+    if bloom_filter:
+        enable_bloom_filter_prefilter()
 
-    # Read unprocessed data
-    unprocessed_df = read_csv_robust(unprocessed_path)
+    # Spark is lazy, so each stage's time includes the upstream work its action triggers.
+    # Read unprocessed data. Cached because the dedup reads it twice (keys, then rows).
+    with metrics.span('GlueStageTime', Stage='ReadInput'):
+        unprocessed_df = read_input_files(s3_bucket, input_keys).cache()
+        has_input = bool(unprocessed_df.take(1))
     
-    if unprocessed_df.rdd.isEmpty():
+    if not has_input:
         logger.error(f"No valid data found in unprocessed data: {unprocessed_path}")
         return
     
-    # Read existing staged data if it exists
-    if check_s3_path_exists(s3_bucket, "staged/"):
-        staged_df = read_csv_robust(staged_path)
-        if staged_df.rdd.isEmpty():
-            logger.warning("No existing staged data found. Treating all unprocessed data as new.")
-            new_records = unprocessed_df
-        elif "Key" not in staged_df.columns:
-            logger.warning("'Key' column is missing from staged data. Treating all unprocessed data as new.")
-            new_records = unprocessed_df
-        else:
-            # Deduplicate unprocessed data against existing staged data based on "Key"
-            new_records = unprocessed_df.join(staged_df, "Key", "leftanti")
-    else:
-        logger.warning("Staged data path does not exist. Treating all unprocessed data as new.")
-        new_records = unprocessed_df
+    with metrics.span('GlueStageTime', Stage='BootstrapKeyIndex'):
+        bootstrap_key_index(s3_bucket, index_path, num_buckets, bloom_filter)
+    # Cached because it is written, counted and indexed.
+    with metrics.span('GlueStageTime', Stage='FilterNewRecords'):
+        new_records = filter_new_records(unprocessed_df, index_path, num_buckets).cache()
+        has_new_records = bool(new_records.take(1))
     
-    if new_records.rdd.isEmpty():
+    if not has_new_records:
         logger.info("No new records found. Exiting without writing output.")
         return
     
-    # Generate a timestamped output filename
-    current_time = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_filename = f"staged_{current_time}.csv"
-    
-    # Write to CSV in S3 directly using Spark, ensuring a single file output
-    output_path = f"s3://{s3_bucket}/staged/{output_filename}"
-    
-    # Convert DataFrame to Pandas and write using boto3
-    pandas_df = new_records.toPandas()
-    csv_buffer = pandas_df.to_csv(index=False, quoting=1, quotechar='"', escapechar='"', encoding='utf-8')
-        
-    # WRite the files to S3
-    s3_resource = boto3.resource('s3')
-    s3_resource.Object(s3_bucket, f"staged/{output_filename}").put(Body=csv_buffer)
+    # Fall back to a timestamped output name when the caller did not derive one from the input
+    now = datetime.datetime.now()
+    output_name = output_name or f"staged_{now.strftime('%Y%m%d_%H%M%S')}"
+
+    with metrics.span('GlueStageTime', Stage='WriteOutput'):
+        if output_mode == "single":
+            output_key = f"staged/{output_name}.csv"
+            rows_written = write_single_file(new_records, s3_bucket, output_key)
+            output_keys = [output_key]
+        else:
+            # New records are a subset of the input, so its size bounds the output size.
+            input_bytes = sum(s3.head_object(Bucket=s3_bucket, Key=key)['ContentLength'] for key in input_keys)
+            num_files = max(1, math.ceil(input_bytes / (target_file_mb * 1024 * 1024)))
+            rows_written, output_keys = write_distributed(new_records, s3_bucket, output_name, num_files)
+    metrics.count('GlueRowsWritten', rows_written)
     
-    logger.info(f"Wrote {new_records.count()} new records to {output_path}")
+    logger.info(f"Wrote {rows_written} new records to {len(output_keys)} files: {output_keys}")
+
+    # The CSV above is the hand-off to classification; the Parquet copy is an opt-in columnar history,
+    # read here only when the Key index is rebuilt, and otherwise for queries outside the pipeline.
+    if staged_format == "parquet":
+        with metrics.span('GlueStageTime', Stage='WriteParquet'):
+            write_staged_parquet(new_records, s3_path(s3_bucket, "staged/parquet/"), now.strftime("%Y-%m-%d"))
+
+    # Index after the output is written: a failure here re-stages rows rather than losing them.
+    with metrics.span('GlueStageTime', Stage='UpdateKeyIndex'):
+        update_key_index(new_records, index_path, num_buckets, bloom_filter)
+    with metrics.span('GlueStageTime', Stage='CompactKeyIndex'):
+        compact_key_index(index_path, max_index_files, bloom_filter)
+
+    new_records.unpersist()
+    unprocessed_df.unpersist()
 
 # Main execution
 if __name__ == "__main__":
-    args = getResolvedOptions(sys.argv, ['S3_BUCKET', 'NEW_CSV_FILE', 'JOB_NAME'])
+    from awsglue.utils import getResolvedOptions
+    args = getResolvedOptions(sys.argv, ['S3_BUCKET', 'JOB_NAME'])
+    options = get_optional_args(sys.argv, DEFAULT_OPTIONS)
 
     
     s3_bucket = args['S3_BUCKET']
-    new_csv_file = args['NEW_CSV_FILE']
+    if options['INPUT_MANIFEST']:
+        new_csv_files = load_input_manifest(s3_bucket, options['INPUT_MANIFEST'])
+    elif options['NEW_CSV_FILE']:
+        new_csv_files = [options['NEW_CSV_FILE']]
+    else:
+        raise ValueError("Either --NEW_CSV_FILE or --INPUT_MANIFEST must be passed")
     
-    logger.info(f"Processing file: {new_csv_file} in bucket: {s3_bucket}")
+    logger.info(f"Processing {len(new_csv_files)} files: {new_csv_files} in bucket: {s3_bucket}")
+    metrics.configure(service='glue-etl')
     
-    process_data(s3_bucket, new_csv_file)
+    with metrics.span('GlueJobTime'):
+        process_data(
+            s3_bucket,
+            new_csv_files,
+            num_buckets=int(options['KEY_INDEX_BUCKETS']),
+            bloom_filter=options['KEY_INDEX_BLOOM_FILTER'].lower() == 'true',
+            staged_format=options['STAGED_FORMAT'].lower(),
+            output_mode=options['OUTPUT_MODE'].lower(),
+            target_file_mb=int(options['TARGET_FILE_MB']),
+            output_name=options['OUTPUT_NAME'] or None,
+            max_index_files=int(options['KEY_INDEX_MAX_FILES'])
+        )
+    metrics.flush(cloudwatch=cloudwatch)
     
     logger.info(f"Job completed successfully")
 
-# Stop the Spark session
-spark.stop()
\ No newline at end of file
+    # Stop the Spark session
+    spark.stop()
@@ -0,0 +1,201 @@
+import json
+import time
+from typing import Dict, Optional
+
+from botocore.exceptions import ClientError
+
+from checkpoint import run_id_for
+from prompts import SYSTEM_PROMPT
+from runtime import runtime
+from s3_handler import S3MultipartWriter
+
+ANTHROPIC_VERSION = "bedrock-2023-05-31"
+MAX_TOKENS = 4096
+# Bedrock rejects batch inference jobs with fewer records than this.
+MIN_RECORDS = 100
+COLLECTABLE_STATUSES = ('Completed', 'PartiallyCompleted')
+FAILED_STATUSES = ('Failed', 'Stopped', 'Expired')
+
+
+class BatchInferenceFailed(RuntimeError):
+    """The job ended in one of FAILED_STATUSES and has no output to collect."""
+
+
+def record_id(index: int) -> str:
+    return f"R{index:010d}"
+
+
+def invoke_model_body(message_list: list, inference_config: dict) -> dict:
+    """Translate a Converse payload into the InvokeModel body Bedrock batch inference expects."""
+    body = {
+        "anthropic_version": ANTHROPIC_VERSION,
+        "max_tokens": inference_config.get("maxTokens", MAX_TOKENS),
+        "system": SYSTEM_PROMPT,
+        "messages": [
+            {"role": m["role"], "content": [{"type": "text", "text": c["text"]} for c in m["content"]]}
+            for m in message_list
+        ],
+    }
+    if "temperature" in inference_config:
+        body["temperature"] = inference_config["temperature"]
+    if "topP" in inference_config:
+        body["top_p"] = inference_config["topP"]
+    return body
+
+
+class BatchInferenceJob:
+    """Classifies a staged CSV with one asynchronous Bedrock batch inference job.
+
+    submit() writes one JSONL record per row, built from the same payloads the
+    synchronous path sends, and starts the job. collect() runs once the job has
+    finished: it parses the output JSONL with the classifier's own result parsing and
+    merges answers back into the rows by record id. Job state lives in a manifest
+    under <prefix>/<job name>/ so the two stages can run in separate invocations.
+    """
+
+    def __init__(self, s3_handler, classifier, role_arn: str, bedrock_client=None,
+                 prefix: str = 'batch-inference', min_records: int = MIN_RECORDS):
+        self.s3_handler = s3_handler
+        self.s3 = s3_handler.s3
+        self.bucket_name = s3_handler.bucket_name
+        self.classifier = classifier
+        self.role_arn = role_arn
+        self.bedrock = bedrock_client or runtime.client('bedrock')
+        self.prefix = prefix.rstrip('/')
+        self.min_records = min_records
+
+    def submit(self, s3_key: str) -> Optional[dict]:
+        """Start a job for s3_key. Returns its manifest, or None if the file is too small for a batch job."""
+        etag = self.s3_handler.etag(s3_key)
+        run_id = run_id_for(self.bucket_name, s3_key, etag)
+        job_name = f"classify-{run_id[:16]}-{time.strftime('%Y%m%d%H%M%S')}"
+        job_prefix = f"{self.prefix}/{job_name}"
+        records_key = f"{job_prefix}/input/records.jsonl"
+
+        with S3MultipartWriter(self.s3, self.bucket_name, records_key, content_type='application/jsonl') as writer:
+            count = 0
+            for i, row in enumerate(self.s3_handler.iter_csv(s3_key)):
+                payload = self.classifier._create_chat_payload(self.classifier._compact_ticket(row)[0])
+                record = {"recordId": record_id(i),
+                          "modelInput": invoke_model_body(payload, self.classifier.HYPER_PARAMS)}
+                writer.write(json.dumps(record) + "\n")
+                count += 1
+
+        if count < self.min_records:
+            self.s3.delete_object(Bucket=self.bucket_name, Key=records_key)
+            print(f"{s3_key} has {count} rows, fewer than the {self.min_records} a batch job needs")
+            return None
+
+        response = self.bedrock.create_model_invocation_job(
+            jobName=job_name,
+            roleArn=self.role_arn,
+            modelId=self.classifier.HAIKU_ID,
+            inputDataConfig={'s3InputDataConfig': {
+                's3Uri': f"s3://{self.bucket_name}/{records_key}",
+                's3InputFormat': 'JSONL'
+            }},
+            outputDataConfig={'s3OutputDataConfig': {
+                's3Uri': f"s3://{self.bucket_name}/{job_prefix}/output/"
+            }}
+        )
+        manifest = {
+            'job_name': job_name,
+            'job_arn': response['jobArn'],
+            'input_key': s3_key,
+            'input_id': run_id,
+            'input_etag': etag,
+            'records_key': records_key,
+            'output_prefix': f"{job_prefix}/output/",
+            'record_count': count,
+        }
+        self.s3.put_object(
+            Bucket=self.bucket_name,
+            Key=self.manifest_key(job_name),
+            Body=json.dumps(manifest, indent=2),
+            ContentType='application/json'
+        )
+        print(f"Submitted batch inference job {response['jobArn']} for {count} rows of {s3_key}")
+        return manifest
+
+    def manifest_key(self, job_name: str) -> str:
+        return f"{self.prefix}/{job_name}/manifest.json"
+
+    def load_manifest(self, job_name: str) -> Optional[dict]:
+        """The job's manifest, or None once it has been collected and cleaned up."""
+        try:
+            response = self.s3.get_object(Bucket=self.bucket_name, Key=self.manifest_key(job_name))
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None
+            raise
+        return json.loads(response['Body'].read())
+
+    def status(self, manifest: dict) -> str:
+        job = self.bedrock.get_model_invocation_job(jobIdentifier=manifest['job_arn'])
+        if job['status'] in FAILED_STATUSES:
+            raise BatchInferenceFailed(f"Batch inference job {manifest['job_name']} ended as {job['status']}: "
+                               f"{job.get('message', 'no message')}")
+        return job['status']
+
+    def collect(self, manifest: dict) -> bool:
+        """Merge the job output into a processed CSV. Returns False if the job has not finished yet."""
+        status = self.status(manifest)
+        if status not in COLLECTABLE_STATUSES:
+            print(f"Batch inference job {manifest['job_name']} is {status}")
+            return False
+
+        results = self._read_results(manifest)
+        missing = dict.fromkeys(self.classifier.RESULT_FIELDS)
+        # The prompt fields are recomputed; compaction is deterministic, so they match what was submitted.
+        rows = ({**row, **missing, **self.classifier._compact_ticket(row)[1], **results.get(record_id(i), {})}
+                for i, row in enumerate(self.s3_handler.iter_csv(manifest['input_key'])))
+        # Manifests written before input_id was recorded fall back to a timestamped output.
+        output_key = self.s3_handler.output_key(manifest['input_key'], manifest.get('input_id'))
+        written = self.s3_handler.upload_csv_stream(rows, output_key)
+        print(f"Batch inference job {manifest['job_name']} ({status}): "
+              f"{len(results)} of {written} rows answered")
+        self.discard(manifest)
+        return True
+
+    def _read_results(self, manifest: dict) -> Dict[str, dict]:
+        results = {}
+        paginator = self.s3.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=manifest['output_prefix']):
+            for obj in page.get('Contents', []):
+                if not obj['Key'].endswith('.jsonl.out'):
+                    continue
+                body = self.s3.get_object(Bucket=self.bucket_name, Key=obj['Key'])['Body']
+                for line in body.iter_lines():
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    text = self._output_text(record)
+                    if text is None:
+                        print(f"Record {record.get('recordId')} failed: {json.dumps(record.get('error'))}")
+                        continue
+                    results[record['recordId']] = self.classifier._format_results(text)
+        return results
+
+    @staticmethod
+    def _output_text(record: dict) -> Optional[str]:
+        output = record.get('modelOutput') or {}
+        texts = [c.get('text', '') for c in output.get('content', []) if c.get('type') == 'text']
+        return "".join(texts) if texts else None
+
+    def discard(self, manifest: dict) -> None:
+        """Delete the job's manifest, records and output."""
+        job_prefix = f"{self.prefix}/{manifest['job_name']}/"
+        paginator = self.s3.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=job_prefix):
+            keys = [{'Key': obj['Key']} for obj in page.get('Contents', [])]
+            if keys:
+                self.s3.delete_objects(Bucket=self.bucket_name, Delete={'Objects': keys})
+
+
+def job_name_from_event(event: dict, bedrock_client=None) -> str:
+    """Job name from a "Batch Inference Job State Change" EventBridge event."""
+    detail = event['detail']
+    if 'batchJobName' in detail:
+        return detail['batchJobName']
+    bedrock = bedrock_client or runtime.client('bedrock')
+    return bedrock.get_model_invocation_job(jobIdentifier=detail['batchJobArn'])['jobName']
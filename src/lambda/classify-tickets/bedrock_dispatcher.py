@@ -0,0 +1,186 @@
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from metrics import metrics
+
+THROTTLING_ERROR_CODES = {
+    'ThrottlingException',
+    'TooManyRequestsException',
+    'ServiceQuotaExceededException',
+}
+RETRYABLE_ERROR_CODES = THROTTLING_ERROR_CODES | {
+    'ServiceUnavailableException',
+    'InternalServerException',
+    'ModelNotReadyException',
+    'ModelTimeoutException',
+}
+
+
+def error_code(exc: Exception) -> Optional[str]:
+    """Return the AWS error code of a botocore ClientError, or None for anything else."""
+    response = getattr(exc, 'response', None)
+    if isinstance(response, dict):
+        return response.get('Error', {}).get('Code')
+    return None
+
+
+def deadline_from_context(context, safety_margin_ms: int = 10000) -> Optional[float]:
+    """Convert the Lambda remaining time into a time.monotonic() deadline."""
+    if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+        return None
+    remaining_ms = context.get_remaining_time_in_millis() - safety_margin_ms
+    return time.monotonic() + max(remaining_ms, 0) / 1000
+
+
+class AimdLimiter:
+    """Additive-increase / multiplicative-decrease limit on in-flight requests.
+
+    Starts in slow start (one extra slot per success) until the first throttle, then
+    grows by roughly one slot per window of successful calls while the smoothed latency
+    stays close to the best smoothed latency seen. Throttling multiplies the limit by
+    decrease_factor, at most once per window so a burst of throttles from requests that
+    were already in flight doesn't collapse the limit to the floor.
+    """
+
+    def __init__(self, initial: int = 5, minimum: int = 1, maximum: int = 32,
+                 latency_tolerance: float = 2.0, decrease_factor: float = 0.7,
+                 smoothing: float = 0.2):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_tolerance = latency_tolerance
+        self.decrease_factor = decrease_factor
+        self.smoothing = smoothing
+        self.in_flight = 0
+        self.smoothed_latency = None
+        self.baseline_latency = None
+        self.throttles = 0
+        self.peak_limit = int(self.limit)
+        self._slow_start = True
+        self._last_decrease = 0.0
+        self._condition = None
+
+    async def acquire(self) -> float:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        return time.monotonic()
+
+    async def release(self, started: float, latency: float, throttled: bool) -> None:
+        async with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                self.throttles += 1
+                self._slow_start = False
+                if started >= self._last_decrease:
+                    self.limit = max(self.minimum, self.limit * self.decrease_factor)
+                    self._last_decrease = time.monotonic()
+            else:
+                self._observe_latency(latency)
+                if self.smoothed_latency <= self.baseline_latency * self.latency_tolerance:
+                    self.limit += 1 if self._slow_start else 1 / self.limit
+                    self.limit = min(self.maximum, self.limit)
+                    self.peak_limit = max(self.peak_limit, int(self.limit))
+            self._condition.notify_all()
+
+    async def cancel(self) -> None:
+        """Give back a slot that was acquired but never used for a call."""
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def _observe_latency(self, latency: float) -> None:
+        if self.smoothed_latency is None:
+            self.smoothed_latency = latency
+        else:
+            self.smoothed_latency += self.smoothing * (latency - self.smoothed_latency)
+        if self.baseline_latency is None or self.smoothed_latency < self.baseline_latency:
+            self.baseline_latency = self.smoothed_latency
+
+
+class AdaptiveDispatcher:
+    """Runs blocking Bedrock calls through an asyncio facade over a thread pool.
+
+    Concurrency is governed by an AimdLimiter. Throttled and transient failures are
+    retried with full-jitter exponential backoff until max_attempts or the deadline is
+    reached, after which the result for that request is None.
+    """
+
+    def __init__(self, initial_concurrency: int = 5, max_concurrency: int = 32,
+                 max_attempts: int = 8, base_delay: float = 0.25, max_delay: float = 8.0,
+                 deadline: Optional[float] = None):
+        self.initial_concurrency = initial_concurrency
+        self.max_concurrency = max_concurrency
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.stats = {}
+        # Carried between run() calls so windowed callers don't restart from scratch.
+        self._learned_limit = None
+
+    def run(self, requests: list, function: Callable) -> List:
+        if not requests:
+            return []
+        return asyncio.run(self._run_all(requests, function))
+
+    async def _run_all(self, requests: list, function: Callable) -> List:
+        limiter = AimdLimiter(initial=self._learned_limit or self.initial_concurrency, maximum=self.max_concurrency)
+        self.stats = {'requests': len(requests), 'attempts': 0, 'retries': 0, 'failures': 0}
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            responses = await asyncio.gather(
+                *(self._call_with_retry(i, r, function, limiter, executor) for i, r in enumerate(requests))
+            )
+        self._learned_limit = int(limiter.limit)
+        self.stats.update({
+            'throttles': limiter.throttles,
+            'final_concurrency': int(limiter.limit),
+            'peak_concurrency': limiter.peak_limit,
+            'elapsed_seconds': round(time.monotonic() - started, 3),
+        })
+        print(f"Dispatch stats: {self.stats}")
+        for name in ('retries', 'throttles', 'failures'):
+            metrics.count(f"Bedrock{name.capitalize()}", self.stats[name])
+        return responses
+
+    async def _call_with_retry(self, position, request, function, limiter, executor):
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.max_attempts):
+            if self._past_deadline():
+                break
+            waiting = time.monotonic()
+            acquired = await limiter.acquire()
+            metrics.record('BedrockQueueWait', (acquired - waiting) * 1000)
+            # Requests queue for a slot from the start, so the deadline may have passed while this one waited.
+            if self._past_deadline():
+                await limiter.cancel()
+                break
+            self.stats['attempts'] += 1
+            try:
+                response = await loop.run_in_executor(executor, function, request)
+            except Exception as exc:
+                code = error_code(exc)
+                await limiter.release(acquired, time.monotonic() - acquired, code in THROTTLING_ERROR_CODES)
+                if code not in RETRYABLE_ERROR_CODES or attempt == self.max_attempts - 1:
+                    print(f"Request at position {position} generated an exception: {exc}")
+                    break
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                if self._past_deadline(delay):
+                    print(f"Request at position {position} abandoned at deadline after {attempt + 1} attempts: {exc}")
+                    break
+                self.stats['retries'] += 1
+                await asyncio.sleep(delay)
+            else:
+                await limiter.release(acquired, time.monotonic() - acquired, False)
+                return response
+        self.stats['failures'] += 1
+        return None
+
+    def _past_deadline(self, delay: float = 0.0) -> bool:
+        return self.deadline is not None and time.monotonic() + delay >= self.deadline
@@ -0,0 +1,78 @@
+import gzip
+import json
+import time
+from typing import Dict
+
+from idempotency import input_id
+
+
+def run_id_for(bucket: str, key: str, etag: str) -> str:
+    """Identify a classification run by the exact input object it is processing."""
+    return input_id(bucket, key, etag)
+
+
+def row_key(row: Dict[str, str], index: int) -> str:
+    return row.get('Key') or f"row-{index}"
+
+
+class CheckpointStore:
+    """Persists completed results for a run as gzipped JSON partial files in S3.
+
+    Each flush writes a new part under checkpoints/<run_id>/ holding only the results
+    recorded since the previous flush, so writes stay small and never overwrite each
+    other. load() merges every part back into a single row key -> result mapping.
+    """
+
+    def __init__(self, s3_client, bucket_name: str, run_id: str, prefix: str = 'checkpoints',
+                 flush_every_rows: int = 200, flush_every_seconds: float = 30.0):
+        self.s3 = s3_client
+        self.bucket_name = bucket_name
+        self.prefix = f"{prefix.rstrip('/')}/{run_id}"
+        self.flush_every_rows = flush_every_rows
+        self.flush_every_seconds = flush_every_seconds
+        self.completed = {}
+        self._pending = {}
+        self._part_number = 0
+        self._last_flush = time.monotonic()
+
+    def load(self) -> Dict[str, dict]:
+        for key in self._list_parts():
+            response = self.s3.get_object(Bucket=self.bucket_name, Key=key)
+            self.completed.update(json.loads(gzip.decompress(response['Body'].read())))
+            self._part_number = max(self._part_number, int(key.rsplit('-', 1)[1].split('.')[0]))
+        print(f"Loaded {len(self.completed)} checkpointed results from {self._part_number} parts")
+        return self.completed
+
+    def record(self, key: str, result: dict) -> None:
+        self.completed[key] = result
+        self._pending[key] = result
+
+    def maybe_flush(self) -> None:
+        if (len(self._pending) >= self.flush_every_rows
+                or time.monotonic() - self._last_flush >= self.flush_every_seconds):
+            self.flush()
+
+    def flush(self) -> None:
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+        self._part_number += 1
+        body = gzip.compress(json.dumps(self._pending, separators=(',', ':')).encode('utf-8'))
+        self.s3.put_object(Bucket=self.bucket_name, Key=f"{self.prefix}/part-{self._part_number:05d}.json.gz", Body=body)
+        print(f"Checkpointed {len(self._pending)} results to {self.prefix} (part {self._part_number})")
+        self._pending = {}
+
+    def clear(self) -> None:
+        keys = self._list_parts()
+        for i in range(0, len(keys), 1000):
+            self.s3.delete_objects(
+                Bucket=self.bucket_name,
+                Delete={'Objects': [{'Key': k} for k in keys[i:i + 1000]], 'Quiet': True}
+            )
+
+    def _list_parts(self) -> list:
+        keys = []
+        paginator = self.s3.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=f"{self.prefix}/"):
+            keys.extend(obj['Key'] for obj in page.get('Contents', []))
+        return sorted(keys)
@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Tuple
+
+
+def make_cache_key(model_id: str, system_prompt: str, messages: list, inference_config: dict) -> str:
+    """Content address for a single converse request."""
+    payload = json.dumps(
+        {
+            'model_id': model_id,
+            'system': system_prompt,
+            'messages': messages,
+            'inference_config': inference_config,
+        },
+        sort_keys=True,
+        separators=(',', ':'),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ClassificationCache(ABC):
+    """Base class for model response caches. Values are the raw model response text.
+
+    Backends implement _get and _put.
+
+    io_workers > 1 runs get_many and put_many lookups concurrently, for backends where
+    each lookup is a network round trip.
+    """
+
+    def __init__(self, io_workers: int = 1):
+        self.io_workers = io_workers
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._get(key)
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def put(self, key: str, value: str) -> None:
+        if value is not None:
+            self._put(key, value)
+
+    def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        return self._map(self.get, keys)
+
+    def put_many(self, items: Iterable[Tuple[str, str]]) -> None:
+        items = [(k, v) for k, v in items if v is not None]
+        self._map(lambda item: self.put(*item), items)
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses}
+
+    def _map(self, fn, items: list) -> list:
+        if self.io_workers <= 1 or len(items) <= 1:
+            return [fn(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(self.io_workers, len(items))) as pool:
+            return list(pool.map(fn, items))
+
+    @abstractmethod
+    def _get(self, key: str) -> Optional[str]:
+        """The cached value, or None on a miss."""
+
+    @abstractmethod
+    def _put(self, key: str, value: str) -> None:
+        """Store value under key."""
+
+
+class InMemoryLRUCache(ClassificationCache):
+    """LRU cache bounded by the total size in bytes of the cached responses."""
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def _put(self, key: str, value: str) -> None:
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= len(self._entries.pop(key).encode('utf-8'))
+            self._entries[key] = value
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= len(evicted.encode('utf-8'))
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class S3Cache(ClassificationCache):
+    """Persistent cache stored as one small object per key under a prefix of the bucket."""
+
+    def __init__(self, s3_client, bucket_name: str, prefix: str = 'cache/classifications', io_workers: int = 10):
+        # The default matches runtime's S3 connection pool, so lookups don't queue for a connection.
+        super().__init__(io_workers)
+        self.s3 = s3_client
+        self.bucket_name = bucket_name
+        self.prefix = prefix.rstrip('/')
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}/{key[:2]}/{key}.txt"
+
+    def _get(self, key: str) -> Optional[str]:
+        try:
+            response = self.s3.get_object(Bucket=self.bucket_name, Key=self._object_key(key))
+            return response['Body'].read().decode('utf-8')
+        except Exception as e:
+            # A cache that can't be read is a miss, not a failed run.
+            if getattr(e, 'response', {}).get('Error', {}).get('Code') != 'NoSuchKey':
+                print(f"Failed to read cache entry {key}: {str(e)}")
+            return None
+
+    def _put(self, key: str, value: str) -> None:
+        try:
+            self.s3.put_object(Bucket=self.bucket_name, Key=self._object_key(key), Body=value.encode('utf-8'))
+        except Exception as e:
+            print(f"Failed to write cache entry {key}: {str(e)}")
+
+
+class LocalDirectoryCache(ClassificationCache):
+    """Persistent cache backed by a local directory. Mirrors the S3 layout."""
+
+    def __init__(self, directory: str):
+        super().__init__()
+        self.directory = directory
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.txt")
+
+    def _get(self, key: str) -> Optional[str]:
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _put(self, key: str, value: str) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(value)
+        os.replace(tmp_path, path)
+
+
+class TieredCache(ClassificationCache):
+    """Checks a fast cache before a persistent one, promoting persistent hits."""
+
+    def __init__(self, fast: ClassificationCache, persistent: ClassificationCache):
+        super().__init__()
+        self.fast = fast
+        self.persistent = persistent
+
+    def _get(self, key: str) -> Optional[str]:
+        value = self.fast.get(key)
+        if value is None:
+            value = self.persistent.get(key)
+            if value is not None:
+                self.fast.put(key, value)
+        return value
+
+    def _put(self, key: str, value: str) -> None:
+        self.fast.put(key, value)
+        self.persistent.put(key, value)
+
+    def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        """Fast lookups first, then the persistent misses all at once."""
+        values = [self.fast.get(k) for k in keys]
+        misses = [i for i, v in enumerate(values) if v is None]
+        for i, value in zip(misses, self.persistent.get_many([keys[i] for i in misses])):
+            if value is not None:
+                self.fast.put(keys[i], value)
+                values[i] = value
+        with self._stats_lock:
+            self.hits += sum(1 for v in values if v is not None)
+            self.misses += sum(1 for v in values if v is None)
+        return values
+
+    def put_many(self, items: Iterable[Tuple[str, str]]) -> None:
+        items = [(k, v) for k, v in items if v is not None]
+        for key, value in items:
+            self.fast.put(key, value)
+        self.persistent.put_many(items)
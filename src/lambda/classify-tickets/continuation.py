@@ -0,0 +1,79 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from runtime import runtime
+
+
+class LambdaContinuation:
+    """Hands remaining work to a fresh asynchronous invocation of this function."""
+
+    def __init__(self, function_name: str, lambda_client=None):
+        self.function_name = function_name
+        self.lambda_client = lambda_client or runtime.client('lambda')
+
+    def send(self, event: dict) -> None:
+        self.lambda_client.invoke(
+            FunctionName=self.function_name,
+            InvocationType='Event',
+            Payload=json.dumps(event).encode('utf-8')
+        )
+        print(f"Continuation handed to {self.function_name}")
+
+
+class QueueContinuation:
+    """Hands remaining work to an SQS queue that triggers this function."""
+
+    def __init__(self, queue_url: str, sqs_client=None):
+        self.queue_url = queue_url
+        self.sqs = sqs_client or runtime.client('sqs')
+
+    def send(self, event: dict) -> None:
+        self.sqs.send_message(QueueUrl=self.queue_url, MessageBody=json.dumps(event))
+        print(f"Continuation queued on {self.queue_url}")
+
+
+def build_continuation(context):
+    queue_url = os.environ.get('CONTINUATION_QUEUE_URL')
+    if queue_url:
+        return QueueContinuation(queue_url)
+    return LambdaContinuation(context.invoked_function_arn)
+
+
+def continuation_event(event: dict) -> dict:
+    """Copy of event with its continuation counter incremented."""
+    attempt = event.get('continuation', {}).get('attempt', 0) + 1
+    return {**event, 'continuation': {'attempt': attempt}}
+
+
+def sqs_messages(event: dict) -> list:
+    """(messageId, event) for every message of an SQS batch, or [] for any other event.
+
+    The queue behind QueueContinuation can deliver several messages to one invocation;
+    each is a whole event of its own.
+    """
+    records = event.get('Records') or []
+    return [(record['messageId'], json.loads(record['body']))
+            for record in records if record.get('eventSource') == 'aws:sqs']
+
+
+class InProcessContinuation:
+    """Runs each event through handler on a local thread pool; stands in for Lambda in tests and benchmarks."""
+
+    def __init__(self, handler, context=None, max_workers: int = 8):
+        self.handler = handler
+        self.context = context
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._futures = []
+
+    def send(self, event: dict) -> None:
+        self._futures.append(self._executor.submit(self.handler, event, self.context))
+
+    def wait(self) -> list:
+        """Handler results of every event sent so far, re-raising the first failure."""
+        results = [future.result() for future in self._futures]
+        self._futures = []
+        return results
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,59 @@
+import re
+from typing import List, Optional, Tuple
+
+# (label, pattern, weight). Patterns are matched case-insensitively against
+# "<summary>\n<description>", so \A anchors to the start of the summary.
+DEFAULT_RULES: List[Tuple[str, str, float]] = [
+    ('ACCESS_PERMISSIONS_REQUEST', r'\b(grant|need|request(ing)?|give|provide)\b.{0,40}\baccess\b', 3.0),
+    ('ACCESS_PERMISSIONS_REQUEST', r'\baccess (request|to the)\b', 1.5),
+    ('ACCESS_PERMISSIONS_REQUEST', r'\bpermission(s)? denied\b|\baccess denied\b', 2.0),
+    ('ACCESS_PERMISSIONS_REQUEST', r'\b(403|forbidden|unauthori[sz]ed)\b', 1.5),
+    ('ACCESS_PERMISSIONS_REQUEST', r"\b(can(no|')?t|unable to) (log ?in|sign ?in|authenticate)\b", 2.0),
+    ('ACCESS_PERMISSIONS_REQUEST', r'\badd (me|us|\w+) to\b.{0,30}\b(group|role|team|repo(sitory)?)\b', 2.0),
+    ('ACCESS_PERMISSIONS_REQUEST', r'\biam (role|polic(y|ies)|credentials?|user)\b', 1.5),
+    ('SUPPORT_TROUBLESHOOTING', r'\A\W*(alert|alarm|firing|pagerduty|opsgenie|datadog|triggered)\b', 3.0),
+    ('SUPPORT_TROUBLESHOOTING', r'\b(automated|automatically (created|generated)|auto-generated) (ticket|alert|message|issue)\b', 3.0),
+    ('SUPPORT_TROUBLESHOOTING', r'\bin alarm state\b|\balarm (triggered|fired)\b|\bis firing\b', 2.0),
+    ('SUPPORT_TROUBLESHOOTING', r'\b(threshold|breached|cpu utili[sz]ation|health ?check failed)\b', 1.0),
+    ('CREATING_UPDATING_OR_DEPRECATING_DOCUMENTATION',
+     r'\b(update|outdated|out of date|deprecate|write|add|fix)\b.{0,30}\b(docs?|documentation|readme|runbook|wiki)\b', 3.0),
+    ('CREATING_UPDATING_OR_DEPRECATING_DOCUMENTATION', r'\b(documentation|readme|runbook|confluence page)\b', 1.5),
+    ('BUG_FIXING', r'\b(traceback|stack ?trace|exception|null ?pointer|segfault|panic:)\b', 1.5),
+    ('BUG_FIXING', r'\bbug\b|\bregression\b', 1.5),
+]
+
+
+class KeywordClassifier:
+    """Answers obvious tickets locally from weighted keyword rules, without a model call.
+
+    A ticket is answered only when its best label scores at least min_score and beats
+    the runner-up by min_margin; everything else returns None and goes to the model.
+    Answers come back in the model's <thinking>/<answer> format so they are parsed and
+    written exactly like model responses.
+    """
+
+    def __init__(self, rules: List[Tuple[str, str, float]] = None, min_score: float = 3.0, min_margin: float = 2.0):
+        self.rules = [(label, re.compile(pattern, re.IGNORECASE), weight)
+                      for label, pattern, weight in (rules or DEFAULT_RULES)]
+        self.min_score = min_score
+        self.min_margin = min_margin
+
+    def classify(self, ticket: dict) -> Optional[str]:
+        text = f"{ticket.get('Summary') or ''}\n{ticket.get('Description') or ''}"
+        scores, matched = {}, {}
+        for label, pattern, weight in self.rules:
+            match = pattern.search(text)
+            if match:
+                scores[label] = scores.get(label, 0.0) + weight
+                matched.setdefault(label, []).append(match.group(0).strip())
+        if not scores:
+            return None
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        label, score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        if score < self.min_score or score - runner_up < self.min_margin:
+            return None
+        evidence = ", ".join(f'"{m}"' for m in matched[label])
+        return (f"<thinking>Keyword rules matched {evidence} (score {score:g}, runner-up {runner_up:g}).</thinking>\n"
+                f"<answer>{label}</answer>")
@@ -1,10 +1,310 @@
 import json
+import os
+from itertools import islice
 from ticket_classifier import TicketClassifier
 from s3_handler import S3Handler
+from classification_cache import InMemoryLRUCache, S3Cache, LocalDirectoryCache, TieredCache
+from bedrock_dispatcher import AdaptiveDispatcher, deadline_from_context
+from checkpoint import CheckpointStore, run_id_for, row_key
+from idempotency import build_ledger, input_id, invocation_lease
+from continuation import build_continuation, continuation_event, sqs_messages
+from sharding import ShardedRun
+from metrics import metrics
+from runtime import runtime
+
+metrics.configure(service='classify-tickets')
+
+LEDGER_SCOPE = 'classify'
+# A batch inference job can sit in Bedrock's queue for up to a day before it is collected.
+BATCH_LEASE_SECONDS = 24 * 60 * 60
+
+# Survives across warm invocations of the same Lambda container.
+memory_cache = InMemoryLRUCache(max_bytes=int(os.environ.get('CACHE_MEMORY_MAX_BYTES', 32 * 1024 * 1024)))
+
+def build_cache(s3_handler):
+    backend = os.environ.get('CACHE_BACKEND', 's3').lower()
+    if backend == 'none':
+        return None
+    if backend == 'memory':
+        return memory_cache
+    if backend == 'local':
+        return TieredCache(memory_cache, LocalDirectoryCache(os.environ['CACHE_DIRECTORY']))
+    if backend == 's3':
+        prefix = os.environ.get('CACHE_PREFIX', 'cache/classifications')
+        return TieredCache(memory_cache, S3Cache(s3_handler.s3, s3_handler.bucket_name, prefix))
+    raise ValueError(f"Unknown CACHE_BACKEND '{backend}'")
+
+def hand_off(event, context, run_id, unprocessed=None):
+    """Send the rest of the run to a continuation of event.
+
+    Past MAX_CONTINUATIONS the run fails instead, leaving its rows unclassified. unprocessed
+    counts them for the log line and the RowsPastContinuationCap metric.
+    """
+    max_continuations = int(os.environ.get('MAX_CONTINUATIONS', 20))
+    next_event = continuation_event(event)
+    if next_event['continuation']['attempt'] > max_continuations:
+        rows = unprocessed() if unprocessed else None
+        if rows is not None:
+            metrics.count('RowsPastContinuationCap', rows)
+        print(f"Run {run_id} used all {max_continuations} continuations with {rows} rows unclassified. "
+              f"Its checkpoint is kept: sending the original event again, without 'continuation', resumes it, "
+              f"and a higher MAX_CONTINUATIONS or CLASSIFY_MODE=sharded suits files this size.")
+        raise RuntimeError(f"Run {run_id} exceeded {max_continuations} continuations")
+    build_continuation(context).send(next_event)
+
+def classify_remaining(event, context, classifier, store, rows, run_id):
+    """Classify the rows store has no result for yet, checkpointing answered rows as it goes.
+
+    Returns False if the deadline came first and the rest was handed to a continuation.
+    """
+    window_size = int(os.environ.get('CLASSIFY_WINDOW_SIZE', 100))
+    margin_ms = int(os.environ.get('CONTINUATION_MARGIN_MS', 30000))
+
+    remaining = ((row_key(row, i), row) for i, row in enumerate(rows) if row_key(row, i) not in store.completed)
+    unanswered = 0
+    while True:
+        window = list(islice(remaining, window_size))
+        if not window:
+            break
+        if context.get_remaining_time_in_millis() < margin_ms:
+            store.flush()
+            hand_off(event, context, run_id, unprocessed=lambda: len(window) + sum(1 for _ in remaining))
+            return False
+        for (key, row), result in zip(window, classifier.classify_tickets([r for _, r in window])):
+            # Failed calls are left out so a continuation or retry picks them up again.
+            if result.get('Model Answer') is not None:
+                store.record(key, {k: v for k, v in result.items() if k not in row})
+            else:
+                unanswered += 1
+        store.maybe_flush()
+    store.flush()
+
+    # Calls the dispatcher abandoned at its deadline are not failures; the continuation asks again.
+    if unanswered and context.get_remaining_time_in_millis() < margin_ms:
+        print(f"{unanswered} rows of run {run_id} were cut off by the deadline")
+        hand_off(event, context, run_id, unprocessed=lambda: unanswered)
+        return False
+    return True
+
+def classify_checkpointed(event, context, s3_handler, classifier, s3_key, output_key=None):
+    """Classify with periodic checkpoints, handing off to a continuation before the deadline.
+
+    Returns False if the run was handed off and True once the output has been written.
+    """
+    run_id = run_id_for(s3_handler.bucket_name, s3_key, s3_handler.etag(s3_key))
+    store = CheckpointStore(s3_handler.s3, s3_handler.bucket_name, run_id)
+    completed = store.load()
+    if not classify_remaining(event, context, classifier, store, s3_handler.iter_csv(s3_key), run_id):
+        return False
+
+    missing = dict.fromkeys(classifier.RESULT_FIELDS)
+    rows = ({**row, **completed.get(row_key(row, i), missing)}
+            for i, row in enumerate(s3_handler.iter_csv(s3_key)))
+    s3_handler.upload_csv_stream(rows, output_key)
+    store.clear()
+    return True
+
+def build_sharded_run(s3_handler, prefix=None):
+    return ShardedRun(s3_handler.s3, s3_handler.bucket_name, prefix or os.environ.get('SHARD_PREFIX', 'shards'))
+
+def fan_out(s3_handler, s3_key, sender):
+    """Plan byte-range shards for s3_key and send one event per shard.
+
+    Returns False, without planning, if the file fits in one shard and is better
+    classified right here.
+    """
+    shard_bytes = int(os.environ.get('CLASSIFY_SHARD_BYTES', 4 * 1024 * 1024))
+    if s3_handler.s3.head_object(Bucket=s3_handler.bucket_name, Key=s3_key)['ContentLength'] <= shard_bytes:
+        return False
+    run = build_sharded_run(s3_handler)
+    manifest = run.plan(s3_key, shard_bytes, max_shards=int(os.environ.get('CLASSIFY_MAX_SHARDS', 100)))
+    if manifest is None:
+        return True
+    for index in range(len(manifest['shards'])):
+        sender.send(run.shard_event(manifest, index))
+    return True
+
+def classify_shard(event, context):
+    """Classify one shard of a fanned-out file; the last shard to finish merges the outputs.
+
+    The shard is checkpointed like the checkpointed mode and handed to a continuation
+    before the deadline, so it is only marked done once every row has had its chance. A retry
+    of a shard that is done already, e.g. after its merge failed, goes straight to the merge.
+    """
+    shard = event['shard']
+    s3_handler = S3Handler(shard['bucket'])
+    run = build_sharded_run(s3_handler, shard['prefix'])
+    manifest = run.load_manifest(shard['run_id'])
+    if not run.shard_done(manifest, shard['index']):
+        classifier, _ = build_classifier(s3_handler, context)
+        store = run.checkpoint_store(manifest, shard['index'])
+        completed = store.load()
+        if not classify_remaining(event, context, classifier, store, run.iter_shard(manifest, shard['index']),
+                                  f"{manifest['run_id']} shard {shard['index']}"):
+            return {
+                'statusCode': 202,
+                'body': json.dumps(f"Deadline reached, rest of shard {shard['index']} handed to a continuation")
+            }
+
+        missing = dict.fromkeys(classifier.RESULT_FIELDS)
+        run.run_shard(manifest, shard['index'],
+                      lambda rows: ({**row, **completed.get(row_key(row, i), missing)} for i, row in enumerate(rows)))
+        store.clear()
+    output_key = run.merge_if_complete(manifest, lease_seconds=invocation_lease(context),
+                                       owner=getattr(context, 'aws_request_id', None))
+    if output_key is not None:
+        ledger = build_ledger(s3_handler.s3, s3_handler.bucket_name)
+        if ledger is not None:
+            ledger.complete(LEDGER_SCOPE, manifest['run_id'], output_key=output_key)
+    return {
+        'statusCode': 200,
+        'body': json.dumps(f"Shard {shard['index']} classified" + (f", merged into {output_key}" if output_key else ''))
+    }
+
+def build_keyword_classifier():
+    if os.environ.get('CLASSIFY_KEYWORD_TIER', 'false').lower() != 'true':
+        return None
+    from keyword_classifier import KeywordClassifier
+    return KeywordClassifier(
+        min_score=float(os.environ.get('CLASSIFY_KEYWORD_MIN_SCORE', 3.0)),
+        min_margin=float(os.environ.get('CLASSIFY_KEYWORD_MIN_MARGIN', 2.0)),
+    )
+
+def build_deduplicator():
+    if os.environ.get('CLASSIFY_NEAR_DUPLICATES', 'false').lower() != 'true':
+        return None
+    from near_duplicates import NearDuplicateClusterer
+    return NearDuplicateClusterer(threshold=float(os.environ.get('CLASSIFY_NEAR_DUPLICATE_THRESHOLD', 0.8)))
+
+def build_compactor():
+    budget = int(os.environ.get('CLASSIFY_PROMPT_TOKEN_BUDGET', 6000))
+    if budget <= 0:
+        return None
+    from prompt_compaction import PromptCompactor
+    return PromptCompactor(token_budget=budget)
+
+def build_classifier(s3_handler, context):
+    cache = build_cache(s3_handler)
+    max_concurrency = int(os.environ.get('BEDROCK_MAX_CONCURRENCY', 32))
+    dispatcher = AdaptiveDispatcher(
+        initial_concurrency=int(os.environ.get('BEDROCK_INITIAL_CONCURRENCY', 5)),
+        max_concurrency=max_concurrency,
+        deadline=deadline_from_context(context),
+    )
+    classifier = TicketClassifier(
+        # Reused across warm invocations, with a connection per concurrent call.
+        bedrock_client=runtime.client('bedrock-runtime', max_pool_connections=max_concurrency),
+        cache=cache,
+        dispatcher=dispatcher,
+        batch_size=int(os.environ.get('CLASSIFY_BATCH_SIZE', 1)),
+        batch_token_budget=int(os.environ.get('CLASSIFY_BATCH_TOKEN_BUDGET', 8000)),
+        keyword_classifier=build_keyword_classifier(),
+        escalate=os.environ.get('CLASSIFY_ESCALATE', 'true').lower() == 'true',
+        deduplicator=build_deduplicator(),
+        compactor=build_compactor(),
+    )
+    return classifier, cache
+
+def build_batch_inference_job(s3_handler, classifier):
+    # Imported here: only the bedrock-batch mode needs it.
+    from batch_inference import BatchInferenceJob
+    return BatchInferenceJob(
+        s3_handler,
+        classifier,
+        role_arn=os.environ['BATCH_INFERENCE_ROLE_ARN'],
+        prefix=os.environ.get('BATCH_INFERENCE_PREFIX', 'batch-inference'),
+    )
+
+def fall_back_from_batch_inference(job, manifest, context, error):
+    """Hand the input of a failed batch inference job to the checkpointed mode.
+
+    The handed-off event resumes the job's ledger claim, so the input is neither stranded
+    behind it until the lease lapses nor classified twice.
+    """
+    print(f"{error}; classifying {manifest['input_key']} in checkpointed mode instead")
+    fallback = {'mode': 'checkpointed', 'Records': [{'s3': {
+        'bucket': {'name': job.bucket_name},
+        'object': {'key': manifest['input_key'], 'eTag': manifest.get('input_etag')}
+    }}]}
+    build_continuation(context).send(continuation_event(fallback))
+    # Only once the hand-off is sent: a retry of this event still finds the manifest.
+    job.discard(manifest)
+    metrics.count('BatchInferenceFallbacks')
+
+def collect_batch_inference(event, context):
+    """Second stage of the bedrock-batch mode, triggered when a batch inference job changes state."""
+    s3_handler = S3Handler(os.environ['BUCKET_NAME'])
+    from batch_inference import BatchInferenceFailed, job_name_from_event
+    # The collected rows report the same prompt fields as the prompts that were submitted.
+    job = build_batch_inference_job(s3_handler, TicketClassifier(compactor=build_compactor()))
+    job_name = job_name_from_event(event, job.bedrock)
+    manifest = job.load_manifest(job_name)
+    if manifest is None:
+        print(f"Batch inference job {job_name} has no manifest, it was already collected")
+        return {
+            'statusCode': 200,
+            'body': json.dumps('CSV processed successfully')
+        }
+    try:
+        collected = job.collect(manifest)
+    except BatchInferenceFailed as e:
+        fall_back_from_batch_inference(job, manifest, context, e)
+        return {
+            'statusCode': 202,
+            'body': json.dumps(f"Batch inference job {job_name} failed, handed to the checkpointed mode")
+        }
+    if not collected:
+        return {
+            'statusCode': 202,
+            'body': json.dumps(f"Batch inference job {job_name} has not finished")
+        }
+    if manifest.get('input_id'):
+        ledger = build_ledger(s3_handler.s3, s3_handler.bucket_name)
+        if ledger is not None:
+            ledger.complete(LEDGER_SCOPE, manifest['input_id'],
+                            output_key=s3_handler.output_key(manifest['input_key'], manifest['input_id']))
+    return {
+        'statusCode': 200,
+        'body': json.dumps('CSV processed successfully')
+    }
 
 def handler(event, context):
+    try:
+        with metrics.span('HandlerTime'):
+            messages = sqs_messages(event)
+            if messages:
+                return classify_messages(messages, context)
+            return classify(event, context)
+    finally:
+        metrics.flush()
+
+def classify_messages(messages, context):
+    """Classify every event of an SQS batch and report the messages to deliver again.
+
+    The event source mapping needs ReportBatchItemFailures, or one failure sends the whole batch
+    back. Messages reached within CONTINUATION_MARGIN_MS of the deadline are left for redelivery.
+    """
+    margin_ms = int(os.environ.get('CONTINUATION_MARGIN_MS', 30000))
+    failures = []
+    for message_id, event in messages:
+        if context.get_remaining_time_in_millis() < margin_ms:
+            failures.append({'itemIdentifier': message_id})
+            continue
+        try:
+            classify(event, context)
+        except Exception as e:
+            print(f"Message {message_id} failed: {str(e)}")
+            failures.append({'itemIdentifier': message_id})
+    return {'batchItemFailures': failures}
+
+def classify(event, context):
     print(f"Received event: {json.dumps(event)}")
 
+    if event.get('source') == 'aws.bedrock':
+        return collect_batch_inference(event, context)
+    if 'shard' in event:
+        return classify_shard(event, context)
+
     try:
         s3_event = event['Records'][0]['s3']
         s3_bucket = s3_event['bucket']['name']
@@ -16,12 +316,85 @@ def handler(event, context):
     print(f"Reading CSV from S3 - Bucket: {s3_bucket}, Key: {s3_key}")
 
     s3_handler = S3Handler(s3_bucket)
-    tickets = s3_handler.read_csv(s3_key)
+    # Events usually carry the ETag; a manual invocation may not.
+    identity = input_id(s3_bucket, s3_key, s3_event['object'].get('eTag') or s3_handler.etag(s3_key))
+
+    # A manual invocation can pick the mode, e.g. {"mode": "bedrock-batch", "Records": [...]} for a backfill.
+    mode = (event.get('mode') or os.environ.get('CLASSIFY_MODE', 'batch')).lower()
+
+    ledger = build_ledger(s3_handler.s3, s3_bucket)
+    if ledger is not None:
+        claim = ledger.claim(
+            LEDGER_SCOPE, identity, {'bucket': s3_bucket, 'key': s3_key, 'mode': mode},
+            # A batch job may wait a day in Bedrock's queue; any other claim lapses soon after a timeout,
+            # so the async retry of this event can take it.
+            lease_seconds=BATCH_LEASE_SECONDS if mode == 'bedrock-batch' else invocation_lease(context),
+            # A continuation carries on under the claim of the invocation that handed off.
+            resume='continuation' in event,
+        )
+        if claim is None:
+            metrics.count('DuplicateEventsSkipped')
+            return {
+                'statusCode': 200,
+                'body': json.dumps(f"{s3_key} was already classified or is being classified")
+            }
+
+    output_key = s3_handler.output_key(s3_key, identity)
+    try:
+        response = classify_object(event, context, s3_handler, s3_key, mode, output_key)
+    except Exception:
+        # Let the retry of this event claim the input again.
+        if ledger is not None:
+            ledger.release(LEDGER_SCOPE, identity)
+        raise
+    # A 202 leaves the claim in progress; the continuation, last shard or collect step completes it.
+    if ledger is not None and response['statusCode'] == 200:
+        ledger.complete(LEDGER_SCOPE, identity, output_key=output_key)
+    return response
+
+def classify_object(event, context, s3_handler, s3_key, mode, output_key):
+    if mode == 'sharded':
+        if fan_out(s3_handler, s3_key, build_continuation(context)):
+            return {
+                'statusCode': 202,
+                'body': json.dumps(f"{s3_key} fanned out to shards")
+            }
+        mode = 'checkpointed'
+
+    classifier, cache = build_classifier(s3_handler, context)
+
+    if mode == 'bedrock-batch':
+        manifest = build_batch_inference_job(s3_handler, classifier).submit(s3_key)
+        if manifest is not None:
+            return {
+                'statusCode': 202,
+                'body': json.dumps(f"Submitted batch inference job {manifest['job_arn']}")
+            }
+        mode = 'stream'
 
-    classifier = TicketClassifier()
-    classified_tickets = classifier.classify_tickets(tickets)
+    if mode == 'checkpointed':
+        if not classify_checkpointed(event, context, s3_handler, classifier, s3_key, output_key):
+            return {
+                'statusCode': 202,
+                'body': json.dumps('Deadline reached, remaining rows handed to a continuation')
+            }
+    elif mode == 'stream':
+        window_size = int(os.environ.get('CLASSIFY_WINDOW_SIZE', 100))
+        tickets = s3_handler.iter_csv(s3_key)
+        s3_handler.upload_csv_stream(classifier.classify_stream(tickets, window_size), output_key)
+    elif mode == 'batch':
+        tickets = s3_handler.read_csv(s3_key)
+        classified_tickets = classifier.classify_tickets(tickets)
+        s3_handler.upload_csv(classified_tickets, output_key)
+    else:
+        raise ValueError(f"Unknown CLASSIFY_MODE '{mode}'")
 
-    s3_handler.upload_csv(classified_tickets)
+    if cache is not None:
+        print(f"Cache stats: {json.dumps(cache.stats())}")
+    print(f"Tier stats: {json.dumps(classifier.tier_summary())}")
+    for tier, stats in classifier.tier_summary().items():
+        metrics.count('TierTickets', stats['tickets'], Tier=tier)
+        metrics.count('TierAnswered', stats['answered'], Tier=tier)
 
     return {
         'statusCode': 200,
@@ -0,0 +1,94 @@
+import random
+import re
+import zlib
+from typing import Dict, List
+
+UUID_PATTERN = re.compile(r'\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b')
+IP_PATTERN = re.compile(r'\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b')
+HOSTNAME_PATTERN = re.compile(r'\b(?=[a-z0-9.-]*[a-z])[a-z0-9-]+(?:\.[a-z0-9-]+){2,}\b')
+HEX_PATTERN = re.compile(r'\b(?=[0-9a-f]*\d)[0-9a-f]{12,}\b')
+NUMBER_PATTERN = re.compile(r'\d+')
+TOKEN_PATTERN = re.compile(r'[a-z0-9<>]+')
+
+# Mersenne prime for the universal hash family used to simulate permutations.
+PRIME = (1 << 61) - 1
+
+
+def normalize(text: str) -> str:
+    """Lowercase and replace the parts that vary between copies of the same alert."""
+    text = (text or '').lower()
+    text = UUID_PATTERN.sub(' <uuid> ', text)
+    text = IP_PATTERN.sub(' <host> ', text)
+    text = HOSTNAME_PATTERN.sub(' <host> ', text)
+    text = HEX_PATTERN.sub(' <hex> ', text)
+    text = NUMBER_PATTERN.sub('0', text)
+    return ' '.join(TOKEN_PATTERN.findall(text))
+
+
+def shingles(text: str, size: int = 3) -> set:
+    tokens = text.split()
+    if len(tokens) <= size:
+        return {zlib.crc32(text.encode('utf-8'))}
+    return {zlib.crc32(' '.join(tokens[i:i + size]).encode('utf-8')) for i in range(len(tokens) - size + 1)}
+
+
+class NearDuplicateClusterer:
+    """Groups tickets whose normalised Summary/Description are near-identical.
+
+    Each ticket gets a MinHash signature that is split into LSH bands; a ticket joins
+    the first existing cluster sharing a band whose representative's estimated Jaccard
+    similarity is at least threshold, otherwise it starts a new cluster. Members are only
+    ever compared with the representative, so clusters can't drift through chains of
+    slightly different tickets. The index is kept between calls, so tickets in later
+    windows of the same file still join earlier clusters.
+    """
+
+    def __init__(self, num_perm: int = 32, bands: int = 4, threshold: float = 0.8, max_text_chars: int = 4000,
+                 max_clusters: int = 10000, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        rng = random.Random(seed)
+        self.perms = [(rng.randrange(1, PRIME), rng.randrange(0, PRIME)) for _ in range(num_perm)]
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.max_text_chars = max_text_chars
+        self.max_clusters = max_clusters
+        self._buckets: Dict[tuple, List[str]] = {}
+        self._signatures: Dict[str, tuple] = {}
+        self._exact: Dict[str, str] = {}
+        self._next_id = 0
+
+    def assign(self, ticket: dict) -> str:
+        """Return the cluster id for ticket, creating a new cluster if nothing is close enough."""
+        text = normalize(f"{ticket.get('Summary') or ''}\n{ticket.get('Description') or ''}")[:self.max_text_chars]
+        if text in self._exact:
+            return self._exact[text]
+
+        signature = self._signature(text)
+        bands = [(b, signature[b * self.rows:(b + 1) * self.rows]) for b in range(self.bands)]
+        for band in bands:
+            for cluster_id in self._buckets.get(band, ()):
+                if self._similarity(signature, self._signatures[cluster_id]) >= self.threshold:
+                    return cluster_id
+
+        # Clusters are named after their representative, unless that name is already taken.
+        cluster_id = ticket.get('Key')
+        if not cluster_id or cluster_id in self._signatures or len(self._signatures) >= self.max_clusters:
+            cluster_id = f"{cluster_id or 'cluster'}-{self._next_id}"
+        self._next_id += 1
+        # Past max_clusters new tickets still get an id but are no longer indexed.
+        if len(self._signatures) < self.max_clusters:
+            self._signatures[cluster_id] = signature
+            self._exact[text] = cluster_id
+            for band in bands:
+                self._buckets.setdefault(band, []).append(cluster_id)
+        return cluster_id
+
+    def _signature(self, text: str) -> tuple:
+        hashes = shingles(text)
+        return tuple(min((a * h + b) % PRIME for h in hashes) for a, b in self.perms)
+
+    @staticmethod
+    def _similarity(left: tuple, right: tuple) -> float:
+        return sum(1 for x, y in zip(left, right) if x == y) / len(left)
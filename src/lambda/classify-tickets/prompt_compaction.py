@@ -0,0 +1,117 @@
+import re
+from typing import List, Tuple
+
+from tokens import CHARS_PER_TOKEN, estimate_tokens
+
+# Java/JavaScript "at ..." frames, Java "... 12 more" and Python 'File "...", line N' frames.
+FRAME_PATTERN = re.compile(r'^\s+(?:at\s+\S|\.\.\.\s+\d+\s+more\b|File ".*", line \d+)')
+PYTHON_FRAME_PATTERN = re.compile(r'^\s+File ".*", line \d+')
+# Numbers, timestamps, IPs, hex ids and UUIDs: the parts that differ between repeats of a log line.
+# Cheaper than near_duplicates.normalize, which matters at thousands of lines per ticket.
+VARIABLE_PATTERN = re.compile(r'[0-9a-f]*\d[0-9a-f]*')
+# Shorter lines (braces, separators, blank table cells) repeat legitimately.
+MIN_REPEATED_LINE_CHARS = 20
+
+
+def collapse_stack_traces(lines: List[str], head_lines: int, tail_lines: int) -> List[str]:
+    """Keep the first head_lines and last tail_lines of every longer run of stack frame lines."""
+    collapsed, run = [], []
+
+    def end_run():
+        if not run:
+            return
+        if len(run) > head_lines + tail_lines:
+            collapsed.extend(run[:head_lines])
+            collapsed.append(f"[... {len(run) - head_lines - tail_lines} stack frame lines omitted ...]")
+            collapsed.extend(run[len(run) - tail_lines:])
+        else:
+            collapsed.extend(run)
+        run.clear()
+
+    after_python_frame = False
+    for line in lines:
+        # A Python frame is followed by an indented line of source, which belongs to the frame.
+        if FRAME_PATTERN.match(line) or (after_python_frame and line[:1] in (' ', '\t') and line.strip()):
+            run.append(line)
+            after_python_frame = PYTHON_FRAME_PATTERN.match(line) is not None
+        else:
+            end_run()
+            collapsed.append(line)
+            after_python_frame = False
+    end_run()
+    return collapsed
+
+
+def drop_repeated_lines(lines: List[str]) -> List[str]:
+    """Drop lines that repeat an earlier line apart from timestamps, ids, hosts and numbers."""
+    kept, seen, omitted = [], set(), 0
+    for line in lines:
+        stripped = line.strip()
+        key = VARIABLE_PATTERN.sub('0', stripped.lower()) if len(stripped) >= MIN_REPEATED_LINE_CHARS else None
+        if key and key in seen:
+            omitted += 1
+            continue
+        if omitted:
+            kept.append(f"[... {omitted} repeated lines omitted ...]")
+            omitted = 0
+        if key:
+            seen.add(key)
+        kept.append(line)
+    if omitted:
+        kept.append(f"[... {omitted} repeated lines omitted ...]")
+    return kept
+
+
+def truncate_middle(text: str, max_chars: int) -> str:
+    """Keep the head and tail of text, cut at line breaks where one is close.
+
+    The head usually states the problem and the tail holds the final error, so the
+    middle is what goes.
+    """
+    if len(text) <= max_chars:
+        return text
+    room = max(max_chars - 50, 0)
+    head_chars = room * 2 // 3
+    tail_chars = room - head_chars
+    head = text[:head_chars]
+    cut = head.rfind('\n')
+    if cut > head_chars // 2:
+        head = head[:cut]
+    tail = text[len(text) - tail_chars:] if tail_chars else ''
+    cut = tail.find('\n')
+    if 0 <= cut < tail_chars // 2:
+        tail = tail[cut + 1:]
+    return f"{head}\n[... {len(text) - len(head) - len(tail)} characters omitted ...]\n{tail}"
+
+
+class PromptCompactor:
+    """Shrinks ticket descriptions that would push a prompt over a token budget.
+
+    Descriptions that fit are returned unchanged. Larger ones have long stack traces cut
+    to their head and tail frames, then repeated log lines dropped, and whatever is still
+    over budget loses the middle of its text.
+    """
+
+    def __init__(self, token_budget: int = 6000, min_description_tokens: int = 256, trace_head_lines: int = 8,
+                 trace_tail_lines: int = 8):
+        """
+        token_budget: estimated input tokens for the whole prompt, system prompt included.
+        min_description_tokens: kept even when the rest of the prompt uses up the budget.
+        """
+        self.token_budget = token_budget
+        self.min_description_tokens = min_description_tokens
+        self.trace_head_lines = trace_head_lines
+        self.trace_tail_lines = trace_tail_lines
+
+    def compact(self, text: str, reserved_tokens: int = 0) -> Tuple[str, bool]:
+        """(description, whether it was changed) for a prompt whose other parts take reserved_tokens."""
+        budget = max(self.token_budget - reserved_tokens, self.min_description_tokens)
+        if not text or estimate_tokens(text) <= budget:
+            return text, False
+        lines = text.split('\n')
+        lines = collapse_stack_traces(lines, self.trace_head_lines, self.trace_tail_lines)
+        lines = drop_repeated_lines(lines)
+        compacted = '\n'.join(lines)
+        if estimate_tokens(compacted) > budget:
+            compacted = truncate_middle(compacted, (budget - 1) * CHARS_PER_TOKEN)
+        return compacted, True
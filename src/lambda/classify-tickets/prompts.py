@@ -1,3 +1,14 @@
+# Labels a classification may take; must match the <classifications> list in SYSTEM_PROMPT.
+CLASSIFICATIONS = [
+    'ACCESS_PERMISSIONS_REQUEST',
+    'BUG_FIXING',
+    'CREATING_UPDATING_OR_DEPRECATING_DOCUMENTATION',
+    'MINOR_REQUEST',
+    'REQUEST_FROM_MENU_OF_SERVICES',
+    'SUPPORT_TROUBLESHOOTING',
+    'TEAM_LEVEL_CONTINIOUS_IMPROVEMENT',
+]
+
 SYSTEM_PROMPT = '''You are a support ticket assistant. You are given fields of a Jira ticket and your task is to classify the ticket based on those fields
 
 Below is the list of potential classifications along with descriptions of those classifications.
@@ -36,4 +47,26 @@ USER_PROMPT = '''Using only the ticket fields below:
 
 Classify the ticket using ONLY 1 of the classifications listed in the system prompt. Remember to think step-by-step before classifying the ticket and place your thoughts in <thinking></thinking> tags.
 When you are finished thinking, classify the ticket and place your answer in <answer></answer> tags. ONLY place the classifaction in the answer tags. Nothing else.
-'''
\ No newline at end of file
+'''
+
+BATCH_USER_PROMPT = '''Using only the ticket fields below, classify each of the {count} tickets independently:
+
+{tickets}
+
+Classify EACH ticket using ONLY 1 of the classifications listed in the system prompt. Remember to think step-by-step about each ticket before classifying it.
+Reply with exactly one block per ticket, in the same order, copying the ticket id exactly as given:
+<ticket id="ID">
+<thinking>your thoughts about this ticket</thinking>
+<answer>the classification</answer>
+</ticket>
+ONLY place the classifaction in the answer tags. Nothing else.
+'''
+
+BATCH_TICKET_TEMPLATE = '''<ticket id="{ticket_id}">
+<summary_field>
+{summary}
+</summary_field>
+<description_field>
+{description}
+</description_field>
+</ticket>'''
@@ -1,34 +1,151 @@
-import boto3
+import codecs
 import csv
 from datetime import datetime
 import io
-from typing import List, Dict
+from typing import Iterable, Iterator, List, Dict, Optional
+
+from idempotency import output_name
+from metrics import metrics
+from runtime import runtime
 
 class S3Handler:
-    def __init__(self, bucket_name: str):
-        self.s3 = boto3.client('s3')
+    def __init__(self, bucket_name: str, s3_client=None):
+        self.s3 = s3_client or runtime.client('s3')
         self.bucket_name = bucket_name
 
     def read_csv(self, key: str) -> List[Dict[str, str]]:
-        response = self.s3.get_object(Bucket=self.bucket_name, Key=key)
-        file_content = response['Body'].read()
+        with metrics.span('S3ReadCsv'):
+            response = self.s3.get_object(Bucket=self.bucket_name, Key=key)
+            file_content = response['Body'].read()
+        metrics.record('S3ReadBytes', len(file_content), 'Bytes')
         csv_file = io.StringIO(file_content.decode('utf-8'))
         reader = csv.DictReader(csv_file)
         return [row for row in reader]
 
-    def upload_csv(self, data: List[Dict[str, str]]) -> None:
+    def iter_csv(self, key: str) -> Iterator[Dict[str, str]]:
+        """Yield rows straight off the S3 body stream without buffering the object."""
+        response = self.s3.get_object(Bucket=self.bucket_name, Key=key)
+        # StreamReader keeps line endings, so quoted multiline fields survive.
+        lines = codecs.getreader('utf-8')(response['Body'])
+        yield from csv.DictReader(lines)
+
+    def etag(self, key: str) -> str:
+        return self.s3.head_object(Bucket=self.bucket_name, Key=key)['ETag']
+
+    def upload_csv(self, data: List[Dict[str, str]], output_key: Optional[str] = None) -> None:
         csv_buffer = io.StringIO()
         writer = csv.DictWriter(csv_buffer, fieldnames=data[0].keys())
         writer.writeheader()
         writer.writerows(data)
 
+        filename = output_key or self.output_key()
+
+        with metrics.span('S3UploadCsv'):
+            self.s3.put_object(
+                Bucket=self.bucket_name,
+                Key=filename,
+                Body=csv_buffer.getvalue()
+            )
+
+        print(f"File {filename} uploaded to {self.bucket_name}")
+
+    def upload_csv_stream(self, rows: Iterable[Dict[str, str]], output_key: Optional[str] = None) -> int:
+        """Write rows through a multipart upload as they arrive. Returns the row count."""
+        filename = output_key or self.output_key()
+        with S3MultipartCsvWriter(self.s3, self.bucket_name, filename) as writer:
+            for row in rows:
+                writer.writerow(row)
+        print(f"File {filename} uploaded to {self.bucket_name} ({writer.rows} rows, {writer.part_number} parts)")
+        return writer.rows
+
+    @staticmethod
+    def output_key(source_key: Optional[str] = None, source_id: Optional[str] = None) -> str:
+        """Output key for source_key, the same on every run over the same input object.
+
+        Timestamped when the source is unknown.
+        """
+        if source_key and source_id:
+            return f"processed/{output_name('processed', source_key, source_id)}.csv"
         current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"processed/processed_{current_time}.csv"
+        return f"processed/processed_{current_time}.csv"
+
 
-        self.s3.put_object(
+class S3MultipartWriter:
+    """Text writer that flushes to an S3 multipart upload whenever a part fills up.
+
+    Only one part is ever held in memory. The upload is aborted if the block exits with
+    an exception.
+    """
+    MIN_PART_SIZE = 5 * 1024 * 1024
+
+    def __init__(self, s3_client, bucket_name: str, key: str, part_size: int = 8 * 1024 * 1024,
+                 content_type: str = 'text/plain'):
+        self.s3 = s3_client
+        self.bucket_name = bucket_name
+        self.key = key
+        self.part_size = max(part_size, self.MIN_PART_SIZE)
+        self.content_type = content_type
+        self.part_number = 0
+        self._parts = []
+        self._buffer = io.StringIO()
+        self._upload_id = None
+
+    def __enter__(self):
+        response = self.s3.create_multipart_upload(Bucket=self.bucket_name, Key=self.key, ContentType=self.content_type)
+        self._upload_id = response['UploadId']
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.s3.abort_multipart_upload(Bucket=self.bucket_name, Key=self.key, UploadId=self._upload_id)
+            return False
+        self._flush()
+        self.s3.complete_multipart_upload(
             Bucket=self.bucket_name,
-            Key=filename,
-            Body=csv_buffer.getvalue()
+            Key=self.key,
+            UploadId=self._upload_id,
+            MultipartUpload={'Parts': self._parts}
         )
+        return False
 
-        print(f"File {filename} uploaded to {self.bucket_name}")
+    def write(self, text: str) -> None:
+        self._buffer.write(text)
+        if self._buffer.tell() >= self.part_size:
+            self._flush()
+
+    def _flush(self) -> None:
+        body = self._buffer.getvalue().encode('utf-8')
+        # S3 requires at least one part, even for an empty file.
+        if not body and self._parts:
+            return
+        self.part_number += 1
+        with metrics.span('S3UploadPart'):
+            response = self.s3.upload_part(
+                Bucket=self.bucket_name,
+                Key=self.key,
+                UploadId=self._upload_id,
+                PartNumber=self.part_number,
+                Body=body
+            )
+        metrics.record('S3UploadBytes', len(body), 'Bytes')
+        self._parts.append({'ETag': response['ETag'], 'PartNumber': self.part_number})
+        self._buffer.seek(0)
+        self._buffer.truncate()
+
+
+class S3MultipartCsvWriter(S3MultipartWriter):
+    """Multipart writer for CSV rows. The header is taken from the first row."""
+
+    def __init__(self, s3_client, bucket_name: str, key: str, part_size: int = 8 * 1024 * 1024):
+        super().__init__(s3_client, bucket_name, key, part_size, content_type='text/csv')
+        self.rows = 0
+        self._writer = None
+
+    def writerow(self, row: Dict[str, str]) -> None:
+        if self._writer is None:
+            self._writer = csv.DictWriter(self._buffer, fieldnames=row.keys())
+            self._writer.writeheader()
+        self._writer.writerow(row)
+        self.rows += 1
+        if self._buffer.tell() >= self.part_size:
+            self._flush()
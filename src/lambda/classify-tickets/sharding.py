@@ -0,0 +1,228 @@
+import codecs
+import csv
+import json
+from datetime import datetime, timezone
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from checkpoint import CheckpointStore, run_id_for
+from idempotency import LOST_RACE_CODES, S3Ledger
+from metrics import metrics
+from s3_handler import S3Handler, S3MultipartCsvWriter, S3MultipartWriter
+
+SCAN_CHUNK_BYTES = 1024 * 1024
+
+
+def record_ranges(chunks: Iterable[bytes], shard_bytes: int) -> Tuple[int, List[Tuple[int, int]]]:
+    """(header length, [start, end) byte ranges of about shard_bytes) for a CSV read as chunks.
+
+    Ranges only end on a line break outside quotes, so a quoted multiline field is never
+    split across shards. Quotes are counted in bulk; only the line breaks just past each
+    cut point are looked at one by one.
+    """
+    offset, in_quotes, header_end, start, next_cut = 0, False, None, 0, 0
+    ranges = []
+    for chunk in chunks:
+        pos = 0
+        while True:
+            target = max(next_cut - offset, pos)
+            if target >= len(chunk):
+                break
+            in_quotes ^= chunk.count(b'"', pos, target) & 1
+            pos = target
+            newline = chunk.find(b'\n', pos)
+            if newline < 0:
+                break
+            in_quotes ^= chunk.count(b'"', pos, newline) & 1
+            pos = newline + 1
+            if in_quotes:
+                continue
+            boundary = offset + pos
+            if header_end is None:
+                header_end = boundary
+            else:
+                ranges.append((start, boundary))
+            start, next_cut = boundary, boundary + shard_bytes
+        in_quotes ^= chunk.count(b'"', pos) & 1
+        offset += len(chunk)
+    if header_end is None:
+        return offset, []
+    if start < offset:
+        ranges.append((start, offset))
+    return header_end, ranges
+
+
+class ShardedRun:
+    """Splits a staged CSV into byte-range shards, classifies them separately and merges the results.
+
+    Everything for one input object lives under <prefix>/<run_id>/:
+      manifest.json         the plan: input identity, header and byte range of each shard
+      checkpoints/<n>/      results of shard n so far, kept until output/<n>.csv is written
+      output/<n>.csv        classified rows of shard n
+      done/<n>.json         written once output/<n>.csv is complete
+      merge/lock.json       ledger record claimed by whichever shard finishes last, which then
+                            merges; completed with the output key once the merge is written
+
+    The manifest and the lock are created with conditional writes, so duplicate S3 events
+    plan a file once and simultaneous last shards merge it once. The lock is leased like an
+    idempotency claim: if the merging invocation dies, the next attempt takes it over once the
+    lease lapses and merges again from the shard outputs, which stay until the merge is written.
+    """
+
+    def __init__(self, s3_client, bucket_name: str, prefix: str = 'shards'):
+        self.s3 = s3_client
+        self.bucket_name = bucket_name
+        self.prefix = prefix.rstrip('/')
+
+    def plan(self, key: str, shard_bytes: int, max_shards: int = 100) -> Optional[dict]:
+        """Write the manifest for key. Returns None if this object was already planned."""
+        head = self.s3.head_object(Bucket=self.bucket_name, Key=key)
+        etag, size = head['ETag'], head['ContentLength']
+        run_id = run_id_for(self.bucket_name, key, etag)
+        # Bigger shards rather than more of them, so a huge file can't fan out without bound.
+        shard_bytes = max(shard_bytes, -(-size // max_shards))
+
+        with metrics.span('ShardPlanTime'):
+            body = self.s3.get_object(Bucket=self.bucket_name, Key=key)['Body']
+            header_end, ranges = record_ranges(iter(lambda: body.read(SCAN_CHUNK_BYTES), b''), shard_bytes)
+            header = self._read_range(key, 0, header_end)
+        manifest = {
+            'run_id': run_id,
+            'input': {'bucket': self.bucket_name, 'key': key, 'etag': etag.strip('"')},
+            'fieldnames': next(csv.reader([header.decode('utf-8-sig')]), []),
+            'shards': [{'index': i, 'start': start, 'end': end} for i, (start, end) in enumerate(ranges)],
+            'created_at': datetime.now(timezone.utc).isoformat(),
+        }
+        try:
+            self.s3.put_object(Bucket=self.bucket_name, Key=self._key(run_id, 'manifest.json'),
+                               Body=json.dumps(manifest, indent=2), ContentType='application/json', IfNoneMatch='*')
+        except ClientError as e:
+            if e.response['Error']['Code'] in LOST_RACE_CODES:
+                print(f"{key} (run {run_id}) was already planned")
+                return None
+            raise
+        print(f"Planned {len(ranges)} shards of ~{shard_bytes} bytes for {key} (run {run_id})")
+        return manifest
+
+    def load_manifest(self, run_id: str) -> dict:
+        response = self.s3.get_object(Bucket=self.bucket_name, Key=self._key(run_id, 'manifest.json'))
+        return json.loads(response['Body'].read())
+
+    def shard_event(self, manifest: dict, index: int) -> dict:
+        return {'shard': {'bucket': self.bucket_name, 'prefix': self.prefix, 'run_id': manifest['run_id'],
+                          'index': index}}
+
+    def checkpoint_store(self, manifest: dict, index: int) -> CheckpointStore:
+        return CheckpointStore(self.s3, self.bucket_name, f"{index:05d}",
+                               prefix=self._key(manifest['run_id'], 'checkpoints'))
+
+    def iter_shard(self, manifest: dict, index: int) -> Iterator[dict]:
+        """Rows of one shard, read with a ranged GET."""
+        shard = manifest['shards'][index]
+        body = self.s3.get_object(Bucket=self.bucket_name, Key=manifest['input']['key'],
+                                  Range=f"bytes={shard['start']}-{shard['end'] - 1}")['Body']
+        yield from csv.DictReader(codecs.getreader('utf-8')(body), fieldnames=manifest['fieldnames'])
+
+    def run_shard(self, manifest: dict, index: int, classify: Callable[[Iterator[dict]], Iterable[dict]]) -> int:
+        """Classify one shard into output/<index>.csv and mark it done. Returns the row count."""
+        run_id = manifest['run_id']
+        with metrics.span('ShardTime'):
+            with S3MultipartCsvWriter(self.s3, self.bucket_name, self._key(run_id, f"output/{index:05d}.csv")) as writer:
+                for row in classify(self.iter_shard(manifest, index)):
+                    writer.writerow(row)
+        self.s3.put_object(Bucket=self.bucket_name, Key=self._key(run_id, f"done/{index:05d}.json"),
+                           Body=json.dumps({'rows': writer.rows}), ContentType='application/json')
+        print(f"Shard {index + 1}/{len(manifest['shards'])} of run {run_id}: {writer.rows} rows")
+        return writer.rows
+
+    def shard_done(self, manifest: dict, index: int) -> bool:
+        try:
+            self.s3.head_object(Bucket=self.bucket_name, Key=self._key(manifest['run_id'], f"done/{index:05d}.json"))
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return False
+            raise
+        return True
+
+    def finished_shards(self, manifest: dict) -> List[str]:
+        paginator = self.s3.get_paginator('list_objects_v2')
+        keys = []
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=self._key(manifest['run_id'], 'done/')):
+            keys.extend(obj['Key'] for obj in page.get('Contents', []))
+        return keys
+
+    def merge_if_complete(self, manifest: dict, lease_seconds: Optional[int] = None,
+                          owner: Optional[str] = None) -> Optional[str]:
+        """Merge every shard output into processed/ once all shards are done.
+
+        Returns the output key, or None while shards are outstanding, another invocation
+        holds the merge lock, or the run was merged already. lease_seconds should outlast
+        the merge, e.g. idempotency.invocation_lease(context); owner is recorded in the lock.
+        """
+        run_id = manifest['run_id']
+        done = self.finished_shards(manifest)
+        if len(done) < len(manifest['shards']):
+            return None
+        lock = self._merge_lock(run_id)
+        if lock.claim('merge', 'lock', {'owner': owner}, lease_seconds=lease_seconds) is None:
+            return None
+
+        output_key = S3Handler.output_key(manifest['input']['key'], run_id)
+        shard_rows = [json.loads(self.s3.get_object(Bucket=self.bucket_name, Key=key)['Body'].read())['rows']
+                      for key in sorted(done)]
+        with metrics.span('ShardMergeTime'):
+            self._concatenate(run_id, len(manifest['shards']), output_key)
+        self.s3.put_object(
+            Bucket=self.bucket_name,
+            Key=output_key.rsplit('.', 1)[0] + '.manifest.json',
+            Body=json.dumps({
+                'output_key': output_key,
+                'run_id': run_id,
+                'input': manifest['input'],
+                'rows': sum(shard_rows),
+                'shards': [{**shard, 'rows': rows} for shard, rows in zip(manifest['shards'], shard_rows)],
+                'merged_at': datetime.now(timezone.utc).isoformat(),
+            }, indent=2),
+            ContentType='application/json'
+        )
+        lock.complete('merge', 'lock', output_key=output_key, owner=owner)
+        self._cleanup(run_id, len(manifest['shards']), done)
+        print(f"Merged {len(manifest['shards'])} shards of run {run_id} ({sum(shard_rows)} rows) into {output_key}")
+        return output_key
+
+    def _concatenate(self, run_id: str, shards: int, output_key: str) -> None:
+        """Stream the shard outputs into output_key, keeping only the first header."""
+        with S3MultipartWriter(self.s3, self.bucket_name, output_key, content_type='text/csv') as writer:
+            header_written = False
+            for index in range(shards):
+                body = self.s3.get_object(Bucket=self.bucket_name, Key=self._key(run_id, f"output/{index:05d}.csv"))['Body']
+                reader = codecs.getreader('utf-8')(body)
+                # Headers are plain field names, so the first line is the whole header.
+                header = reader.readline()
+                if not header:
+                    continue
+                if not header_written:
+                    writer.write(header)
+                    header_written = True
+                for text in iter(lambda: reader.read(SCAN_CHUNK_BYTES), ''):
+                    writer.write(text)
+
+    def _cleanup(self, run_id: str, shards: int, done: List[str]) -> None:
+        # The manifest and the completed lock stay behind, so a late duplicate event neither re-plans nor re-merges.
+        keys = [self._key(run_id, f"output/{i:05d}.csv") for i in range(shards)] + done
+        for start in range(0, len(keys), 1000):
+            self.s3.delete_objects(Bucket=self.bucket_name,
+                                   Delete={'Objects': [{'Key': k} for k in keys[start:start + 1000]]})
+
+    def _merge_lock(self, run_id: str) -> S3Ledger:
+        return S3Ledger(self.s3, self.bucket_name, prefix=self._key(run_id, ''))
+
+    def _read_range(self, key: str, start: int, end: int) -> bytes:
+        if end <= start:
+            return b''
+        body = self.s3.get_object(Bucket=self.bucket_name, Key=key, Range=f"bytes={start}-{end - 1}")['Body']
+        return body.read()
+
+    def _key(self, run_id: str, name: str) -> str:
+        return f"{self.prefix}/{run_id}/{name}"
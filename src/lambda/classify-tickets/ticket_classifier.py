@@ -1,56 +1,292 @@
-import boto3
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import re
-from typing import List, Dict
-from prompts import USER_PROMPT, SYSTEM_PROMPT
+import time
+from functools import partial
+from itertools import islice
+from typing import Iterable, Iterator, List, Dict
+from prompts import USER_PROMPT, SYSTEM_PROMPT, BATCH_USER_PROMPT, BATCH_TICKET_TEMPLATE, CLASSIFICATIONS
+from tokens import estimate_tokens
+from classification_cache import make_cache_key
+from bedrock_dispatcher import AdaptiveDispatcher
+from metrics import metrics
+from runtime import runtime
 
 class TicketClassifier:
     SONNET_ID = "anthropic.claude-3-sonnet-20240229-v1:0"
     HAIKU_ID = "anthropic.claude-3-haiku-20240307-v1:0"
     HYPER_PARAMS = {"temperature": 0.35, "topP": .3}
+    BATCH_HYPER_PARAMS = {**HYPER_PARAMS, "maxTokens": 4096}
     REASONING_PATTERN = r'<thinking>(.*?)</thinking>'
     CORRECTNESS_PATTERN = r'<answer>(.*?)</answer>'
+    BATCH_TICKET_PATTERN = r'<ticket id="?([^">\s]+)"?\s*>(.*?)</ticket>'
+    RESULT_FIELDS = ['Model Answer', 'Reasoning', 'Cluster Id', 'Prompt Tokens', 'Prompt Truncated']
+    TIERS = ['near_duplicate', 'keyword', 'haiku', 'sonnet']
+    # Everything in a single-ticket prompt except the summary and description.
+    PROMPT_OVERHEAD_TOKENS = estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(USER_PROMPT)
 
-    def __init__(self):
-        self.bedrock = boto3.client('bedrock-runtime')
+    def __init__(self, cache=None, dispatcher=None, bedrock_client=None, batch_size=1, batch_token_budget=8000,
+                 keyword_classifier=None, escalate=True, escalation_dispatcher=None, deduplicator=None,
+                 compactor=None):
+        """
+        batch_size > 1 packs up to that many tickets into one request, within batch_token_budget input tokens.
+        keyword_classifier answers confident tickets locally before any model call.
+        escalate re-asks SONNET_ID for tickets whose HAIKU_ID answer is not in CLASSIFICATIONS.
+        deduplicator (a NearDuplicateClusterer) classifies one representative per cluster of near-identical tickets.
+        compactor (a PromptCompactor) shrinks descriptions that would put a prompt over its token budget.
+        """
+        self.bedrock = bedrock_client or runtime.client('bedrock-runtime')
+        self.cache = cache
+        self.dispatcher = dispatcher or AdaptiveDispatcher()
+        self.batch_size = batch_size
+        self.batch_token_budget = batch_token_budget
+        self.keyword_classifier = keyword_classifier
+        self.escalate = escalate
+        # Sonnet has its own quota, so it must not shape the concurrency learned for Haiku.
+        self.escalation_dispatcher = escalation_dispatcher or AdaptiveDispatcher(deadline=self.dispatcher.deadline)
+        self.deduplicator = deduplicator
+        self.compactor = compactor
+        # Valid responses of earlier clusters, so later windows can reuse them.
+        self._cluster_responses = {}
+        self.tier_stats = {tier: {'tickets': 0, 'answered': 0, 'seconds': 0.0} for tier in self.TIERS}
 
     def classify_tickets(self, tickets: List[Dict[str, str]]) -> List[Dict[str, str]]:
-        prompts = [self._create_chat_payload(t) for t in tickets]
-        responses = self._call_threaded(prompts, self._call_bedrock)
-        formatted_responses = [self._format_results(r) for r in responses]
+        prepared = [self._compact_ticket(t) for t in tickets]
+        compacted = [t for t, _ in prepared]
+        if self.deduplicator is None:
+            responses, cluster_ids = self._classify_each(compacted), [None] * len(tickets)
+        else:
+            responses, cluster_ids = self._classify_clustered(compacted)
+        formatted_responses = [{**self._format_results(r), 'Cluster Id': c, **p}
+                               for r, c, (_, p) in zip(responses, cluster_ids, prepared)]
         return [{**d1, **d2} for d1, d2 in zip(tickets, formatted_responses)]
 
-    def _call_bedrock(self, message_list: list[dict]) -> str:
-        response = self.bedrock.converse(
-            modelId=self.HAIKU_ID,
-            messages=message_list,
-            inferenceConfig=self.HYPER_PARAMS,
-            system=[{"text": SYSTEM_PROMPT}]
+    def classify_stream(self, tickets: Iterable[Dict[str, str]], window_size: int = 100) -> Iterator[Dict[str, str]]:
+        """Classify tickets in bounded windows so only one window of prompts is alive at a time."""
+        tickets = iter(tickets)
+        while True:
+            window = list(islice(tickets, window_size))
+            if not window:
+                return
+            yield from self.classify_tickets(window)
+
+    def tier_summary(self) -> Dict[str, dict]:
+        """Tickets sent to and answered by each tier, with the wall time spent in it."""
+        return {
+            tier: {**stats,
+                   'seconds': round(stats['seconds'], 3),
+                   'ms_per_ticket': round(1000 * stats['seconds'] / stats['tickets'], 2) if stats['tickets'] else None}
+            for tier, stats in self.tier_stats.items()
+        }
+
+    def _compact_ticket(self, ticket: dict) -> tuple:
+        """(ticket as it goes into prompts, its 'Prompt Tokens' and 'Prompt Truncated' fields)."""
+        description = ticket['Description']
+        reserved = self.PROMPT_OVERHEAD_TOKENS + estimate_tokens(ticket['Summary'])
+        truncated = False
+        if self.compactor is not None:
+            description, truncated = self.compactor.compact(description, reserved)
+            if truncated:
+                metrics.count('PromptsCompacted')
+                ticket = {**ticket, 'Description': description}
+        return ticket, {'Prompt Tokens': reserved + estimate_tokens(description), 'Prompt Truncated': truncated}
+
+    def _classify_each(self, tickets: list) -> list:
+        responses = self._classify_local(tickets)
+        pending = [i for i, r in enumerate(responses) if r is None]
+        if pending:
+            prompts = [self._create_chat_payload(tickets[i]) for i in pending]
+            for i, response in zip(pending, self._call_cached(prompts, [tickets[i] for i in pending])):
+                responses[i] = response
+        return responses
+
+    def _classify_clustered(self, tickets: list) -> tuple:
+        """Classify one representative per near-duplicate cluster and fan its response out to the members."""
+        started = time.perf_counter()
+        cluster_ids = [self.deduplicator.assign(t) for t in tickets]
+        representatives = {}
+        for i, cluster_id in enumerate(cluster_ids):
+            if cluster_id not in self._cluster_responses:
+                representatives.setdefault(cluster_id, i)
+        clustering_seconds = time.perf_counter() - started
+
+        fresh = dict(zip(representatives, self._classify_each([tickets[i] for i in representatives.values()])))
+        for cluster_id, response in fresh.items():
+            if self._is_valid(response) and len(self._cluster_responses) < self.deduplicator.max_clusters:
+                self._cluster_responses[cluster_id] = response
+        responses = [self._cluster_responses.get(c) or fresh.get(c) for c in cluster_ids]
+
+        stats = self.tier_stats['near_duplicate']
+        stats['tickets'] += len(tickets)
+        classified = set(representatives.values())
+        stats['answered'] += sum(1 for i, r in enumerate(responses) if i not in classified and self._is_valid(r))
+        stats['seconds'] += clustering_seconds
+        print(f"Near-duplicate clustering: {len(tickets)} tickets, {len(representatives)} classified")
+        return responses, cluster_ids
+
+    def _classify_local(self, tickets: list) -> list:
+        if self.keyword_classifier is None:
+            return [None] * len(tickets)
+        started = time.perf_counter()
+        responses = [self.keyword_classifier.classify(t) for t in tickets]
+        self._record_tier('keyword', responses, started)
+        return responses
+
+    def _record_tier(self, tier: str, responses: list, started: float) -> None:
+        stats = self.tier_stats[tier]
+        stats['tickets'] += len(responses)
+        stats['answered'] += sum(1 for r in responses if self._is_valid(r))
+        stats['seconds'] += time.perf_counter() - started
+
+    def _is_valid(self, model_response: str) -> bool:
+        return self._extract_with_regex(model_response, self.CORRECTNESS_PATTERN) in CLASSIFICATIONS
+
+    def _call_cached(self, prompts: list, tickets: list) -> list:
+        if self.cache is None:
+            return self._call_uncached(prompts, tickets)[0]
+
+        keys = [self._cache_key(p) for p in prompts]
+        responses = self.cache.get_many(keys)
+        misses = [i for i, r in enumerate(responses) if r is None]
+        # Haiku's answer is only cached when it was usable; otherwise SONNET_ID's may be.
+        if misses and self.escalate:
+            escalated = self.cache.get_many([self._cache_key(prompts[i], self.SONNET_ID) for i in misses])
+            for i, response in zip(misses, escalated):
+                responses[i] = response
+            misses = [i for i in misses if responses[i] is None]
+
+        # Only cache misses go to the thread pool; hits never touch Bedrock.
+        if misses:
+            fresh, models = self._call_uncached([prompts[i] for i in misses], [tickets[i] for i in misses])
+            for i, response in zip(misses, fresh):
+                responses[i] = response
+            # An answer without an allowed label is asked again next time rather than served from the cache.
+            self.cache.put_many((self._cache_key(prompts[i], model), responses[i])
+                                for i, model in zip(misses, models) if self._is_valid(responses[i]))
+
+        print(f"Classification cache: {len(prompts) - len(misses)} hits, {len(misses)} misses")
+        return responses
+
+    def _call_uncached(self, prompts: list, tickets: list) -> tuple:
+        """Responses, and the model that gave each one."""
+        started = time.perf_counter()
+        if self.batch_size <= 1:
+            responses = self._call_threaded(prompts, self._call_bedrock)
+        else:
+            responses = self._call_batched(prompts, tickets)
+        self._record_tier('haiku', responses, started)
+        models = [self.HAIKU_ID] * len(responses)
+        if self.escalate:
+            for i in self._escalate(prompts, responses):
+                models[i] = self.SONNET_ID
+        return responses, models
+
+    def _escalate(self, prompts: list, responses: list) -> list:
+        """Replace, in place, every response without an allowed label with SONNET_ID's answer.
+
+        Returns the positions that were replaced. None means the call was throttled or cut off
+        by the deadline, not that Haiku answered badly; sending those to the larger model would
+        only repeat the same failure at its cost.
+        """
+        failed = [i for i, r in enumerate(responses) if r is not None and not self._is_valid(r)]
+        if not failed:
+            return []
+        started = time.perf_counter()
+        escalated = self.escalation_dispatcher.run(
+            [prompts[i] for i in failed], partial(self._call_bedrock, model_id=self.SONNET_ID)
         )
+        replaced = []
+        for i, response in zip(failed, escalated):
+            if response is not None:
+                responses[i] = response
+                replaced.append(i)
+        self._record_tier('sonnet', escalated, started)
+        print(f"Escalated {len(failed)} of {len(responses)} tickets to {self.SONNET_ID}")
+        return replaced
+
+    def _call_batched(self, prompts: list, tickets: list) -> list:
+        """Classify several tickets per request, falling back to single calls for any answer that is missing.
+
+        Each ticket's answer is cut out of the batch response into the same shape a single
+        call returns, so results format and cache exactly like single-call responses.
+        """
+        responses = [None] * len(tickets)
+        batches = [b for b in self._pack_batches(tickets) if len(b) > 1]
+        payloads = [self._create_batch_payload([tickets[i] for i in batch]) for batch in batches]
+        batch_responses = self._call_threaded(payloads, self._call_bedrock_batch)
+
+        for batch, response in zip(batches, batch_responses):
+            answers = self._split_batch_response(response)
+            for ticket_id, position in enumerate(batch, start=1):
+                answer = answers.get(str(ticket_id))
+                if self._extract_with_regex(answer, self.CORRECTNESS_PATTERN):
+                    responses[position] = answer
+
+        missing = [i for i, r in enumerate(responses) if r is None]
+        if missing:
+            print(f"Falling back to single calls for {len(missing)} of {len(tickets)} tickets")
+            for i, response in zip(missing, self._call_threaded([prompts[i] for i in missing], self._call_bedrock)):
+                responses[i] = response
+        print(f"Batched {len(tickets) - len(missing)} tickets into {len(batches)} requests")
+        return responses
+
+    def _pack_batches(self, tickets: list) -> List[List[int]]:
+        """Group ticket positions into batches of at most batch_size tickets and batch_token_budget tokens."""
+        batches, current, current_tokens = [], [], estimate_tokens(BATCH_USER_PROMPT)
+        for i, ticket in enumerate(tickets):
+            tokens = estimate_tokens(self._render_batch_ticket(0, ticket))
+            if current and (len(current) >= self.batch_size or current_tokens + tokens > self.batch_token_budget):
+                batches.append(current)
+                current, current_tokens = [], estimate_tokens(BATCH_USER_PROMPT)
+            current.append(i)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def _split_batch_response(self, model_response: str) -> Dict[str, str]:
+        if model_response is None:
+            return {}
+        return {m.group(1): m.group(2).strip() for m in re.finditer(self.BATCH_TICKET_PATTERN, model_response, re.DOTALL)}
+
+    def _cache_key(self, message_list: list[dict], model_id: str = None) -> str:
+        return make_cache_key(model_id or self.HAIKU_ID, SYSTEM_PROMPT, message_list, self.HYPER_PARAMS)
+
+    def _call_bedrock(self, message_list: list[dict], model_id: str = None) -> str:
+        return self._converse(message_list, model_id or self.HAIKU_ID, self.HYPER_PARAMS)
+
+    def _call_bedrock_batch(self, message_list: list[dict]) -> str:
+        return self._converse(message_list, self.HAIKU_ID, self.BATCH_HYPER_PARAMS)
+
+    def _converse(self, message_list: list[dict], model_id: str, inference_config: dict) -> str:
+        with metrics.span('BedrockServiceTime', Model=model_id):
+            response = self.bedrock.converse(
+                modelId=model_id,
+                messages=message_list,
+                inferenceConfig=inference_config,
+                system=[{"text": SYSTEM_PROMPT}]
+            )
+        usage = response.get('usage', {})
+        metrics.record('BedrockInputTokens', usage.get('inputTokens'), 'Count', Model=model_id)
+        metrics.record('BedrockOutputTokens', usage.get('outputTokens'), 'Count', Model=model_id)
+        metrics.record('BedrockModelLatency', response.get('metrics', {}).get('latencyMs'), Model=model_id)
         return response['output']['message']['content'][0]['text']
 
     def _call_threaded(self, requests, function):
-        future_to_position = {}
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            for i, request in enumerate(requests):
-                future = executor.submit(function, request)
-                future_to_position[future] = i
-            responses = [None] * len(requests)
-            for future in as_completed(future_to_position):
-                position = future_to_position[future]
-                try:
-                    response = future.result()
-                    responses[position] = response
-                except Exception as exc:
-                    print(f"Request at position {position} generated an exception: {exc}")
-                    responses[position] = None
-        return responses
+        return self.dispatcher.run(requests, function)
 
     def _create_chat_payload(self, ticket: dict) -> dict:
         user_prompt = USER_PROMPT.format(summary=ticket['Summary'], description=ticket['Description'])
         user_msg = {"role": "user", "content": [{"text": user_prompt}]}
         return [user_msg]
 
+    def _create_batch_payload(self, tickets: list) -> list:
+        rendered = "\n\n".join(self._render_batch_ticket(i, t) for i, t in enumerate(tickets, start=1))
+        user_prompt = BATCH_USER_PROMPT.format(count=len(tickets), tickets=rendered)
+        return [{"role": "user", "content": [{"text": user_prompt}]}]
+
+    @staticmethod
+    def _render_batch_ticket(ticket_id: int, ticket: dict) -> str:
+        return BATCH_TICKET_TEMPLATE.format(ticket_id=ticket_id, summary=ticket['Summary'], description=ticket['Description'])
+
     def _format_results(self, model_response: str) -> dict:
         reasoning = self._extract_with_regex(model_response, self.REASONING_PATTERN)
         correctness = self._extract_with_regex(model_response, self.CORRECTNESS_PATTERN)
@@ -58,5 +294,7 @@ class TicketClassifier:
 
     @staticmethod
     def _extract_with_regex(response, regex):
+        if response is None:
+            return None
         matches = re.search(regex, response, re.DOTALL)
         return matches.group(1).strip() if matches else None
\ No newline at end of file
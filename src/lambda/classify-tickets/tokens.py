@@ -0,0 +1,8 @@
+# Claude tokenizers average roughly four characters of English text per token. This is
+# only used for budgeting, so a cheap local estimate beats an exact count.
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    return len(text) // CHARS_PER_TOKEN + 1
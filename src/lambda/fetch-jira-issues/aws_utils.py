@@ -1,21 +1,15 @@
-import json
-import boto3
-
-# Initialize AWS clients
-session = boto3.session.Session()
-secrets_client = session.client(service_name='secretsmanager')
-s3_client = session.client('s3')
+from runtime import runtime
 
 def get_secret(secret_name):
+    """Jira credentials, cached across warm invocations for SECRET_TTL_SECONDS."""
     try:
-        get_secret_value_response = secrets_client.get_secret_value(SecretId=secret_name)
-        return json.loads(get_secret_value_response['SecretString'])
+        return runtime.secret(secret_name)
     except Exception as e:
         raise Exception(f"Failed to retrieve Jira credentials: {str(e)}")
 
 def upload_to_s3(csv_string, bucket, key):
     try:
-        s3_client.put_object(
+        runtime.client('s3').put_object(
             Bucket=bucket,
             Key=key,
             Body=csv_string,
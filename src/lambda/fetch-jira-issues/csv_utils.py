@@ -2,17 +2,22 @@ import csv
 import io
 
 def create_csv(data, fieldnames=None):
-    if not data:
-        print("The data list is empty.")
-        return None
-    
+    """CSV text of the rows in data, which may be any iterable when fieldnames is given."""
     if fieldnames is None:
-        fieldnames = data[0].keys()
+        data = list(data)
+        if data:
+            fieldnames = data[0].keys()
     
     output = io.StringIO()
-    writer = csv.DictWriter(output, fieldnames=fieldnames)
-    writer.writeheader()
-    for row in data:
-        writer.writerow(row)
-    
+    rows = 0
+    if fieldnames is not None:
+        writer = csv.DictWriter(output, fieldnames=fieldnames)
+        writer.writeheader()
+        for row in data:
+            writer.writerow(row)
+            rows += 1
+
+    if not rows:
+        print("The data list is empty.")
+        return None
     return output.getvalue()
\ No newline at end of file
@@ -1,18 +1,44 @@
-import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
 import requests
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
 from typing import Dict, Any
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+from metrics import metrics
+
+JIRA_TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%f%z"
+# Absolute JQL dates have minute resolution and are read in the API user's time zone.
+JQL_DATE_FORMAT = "%Y/%m/%d %H:%M"
+
+# How often a project is paged through again when its result set changed under the fetch.
+FETCH_ATTEMPTS = 3
 
 jira_mappings = {
     "Id": ["id"],
     "Key": ["key"],
     "Parent": ["fields.parent.key"],
     "Summary": ["fields.summary"],
-    "Description": ["fields.description.content.0.content.0.text"],
+    "Description": ["fields.description"],
     "Labels": ["fields.labels"]
 }
 
+# Long pasted logs are cut here; the classifier only needs the start of a description.
+DESCRIPTION_MAX_CHARS = 32000
+
+# Atlassian Document Format nodes that end with a line break, and the inline nodes whose text
+# lives in an attribute rather than in 'text'.
+ADF_BLOCK_TYPES = frozenset({
+    'paragraph', 'heading', 'codeBlock', 'blockquote', 'listItem', 'taskItem', 'decisionItem',
+    'tableRow', 'panel', 'expand', 'nestedExpand',
+})
+ADF_INLINE_ATTRS = {'mention': 'text', 'emoji': 'shortName', 'status': 'text', 'inlineCard': 'url', 'date': 'timestamp'}
+
 def get_value_from_path(data: Any, path: str) -> Any:
     keys = path.split('.')
     for key in keys:
@@ -44,37 +70,261 @@ def parse_json_with_map(json_data: Dict[str, Any], field_map: Dict[str, list]) -
                 break  # Use the first matching path
     return result
 
-def fetch_jira_issues(base_url, project_id, email, api_key):
-    url = f"{base_url}/rest/api/3/search"
+def compile_path(path: str) -> tuple:
+    """(key, list index or None) per step of a dotted path, so it is split and parsed once."""
+    steps = []
+    for key in path.split('.'):
+        try:
+            index = int(key)
+        except ValueError:
+            index = None
+        steps.append((key, index))
+    return tuple(steps)
+
+def follow_path(data: Any, steps: tuple) -> Any:
+    """get_value_from_path for a compiled path."""
+    for key, index in steps:
+        if isinstance(data, dict):
+            data = data.get(key)
+            if data is None:
+                return None
+        elif isinstance(data, list) and index is not None and 0 <= index < len(data):
+            data = data[index]
+        else:
+            return None
+    return data
 
-    # Calculate the date 8 days ago
-    eight_days_ago = (datetime.now() - timedelta(days=8)).strftime("%Y-%m-%d")
-    
-    # Create JQL
-    jql = f"project = {project_id} AND created >= '{eight_days_ago}' ORDER BY created DESC"
+def adf_to_text(node: Any, max_chars: int = DESCRIPTION_MAX_CHARS) -> Any:
+    """Plain text of an Atlassian Document Format body, one line per block, cut at max_chars.
 
-    # Pass into params of request.
-    params = {
-        "jql": jql,
-        "startAt": 0
-    }
-    all_issues = []
+    Plain strings (API v2 descriptions) are only cut. Returns None when there is no text.
+    """
+    if node is None or isinstance(node, str):
+        return node[:max_chars] if node else None
+    parts = []
+    size = 0
+    # Depth-first with an explicit stack; a block pushes '\n' to be emitted after its children.
+    stack = [node]
+    while stack and size < max_chars:
+        item = stack.pop()
+        if isinstance(item, str):
+            if parts and not parts[-1].endswith('\n'):
+                parts.append(item)
+                size += 1
+            continue
+        if not isinstance(item, dict):
+            continue
+        kind = item.get('type')
+        text = item.get('text')
+        if kind == 'hardBreak':
+            text = '\n'
+        elif kind in ADF_INLINE_ATTRS:
+            text = (item.get('attrs') or {}).get(ADF_INLINE_ATTRS[kind])
+        if text:
+            parts.append(text)
+            size += len(text)
+        children = item.get('content')
+        if children:
+            if kind in ADF_BLOCK_TYPES:
+                stack.append('\n')
+            stack.extend(reversed(children))
+    text = ''.join(parts)[:max_chars].strip()
+    return text or None
+
+class FieldExtractor:
+    """parse_json_with_map with the field map compiled once and reused for every issue.
+
+    transforms maps a field to a function applied to the value found, e.g. adf_to_text
+    for the description. rows() is lazy, so a page of issues can be written out without
+    building a list of rows first.
+    """
+
+    def __init__(self, field_map: Dict[str, list], transforms: Dict[str, Any] = None):
+        transforms = transforms or {}
+        self.fieldnames = list(field_map)
+        self._fields = [(field, tuple(compile_path(path) for path in paths), transforms.get(field))
+                        for field, paths in field_map.items()]
+
+    def __call__(self, issue: Dict[str, Any]) -> Dict[str, Any]:
+        row = {}
+        for field, paths, transform in self._fields:
+            for steps in paths:
+                value = follow_path(issue, steps)
+                if value is not None and transform is not None:
+                    value = transform(value)
+                if value is not None:
+                    row[field] = value
+                    break  # Use the first matching path
+        return row
+
+    def rows(self, issues):
+        return map(self, issues)
+
+def create_session(pool_size: int = 16) -> requests.Session:
+    """Session with a connection pool large enough to be shared by all fetch threads."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+class HostLimiter:
+    """Caps the number of in-flight requests per host across every fetch thread."""
+
+    def __init__(self, max_per_host: int = 8):
+        self.max_per_host = max_per_host
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, url: str):
+        host = urlsplit(url).netloc
+        with self._lock:
+            semaphore = self._semaphores.setdefault(host, threading.BoundedSemaphore(self.max_per_host))
+        with semaphore:
+            yield
+
+def retry_after_seconds(response, attempt: int) -> float:
+    """Seconds to wait before retrying a 429/503, honouring Retry-After when present."""
+    header = response.headers.get('Retry-After')
+    if header:
+        try:
+            return max(float(header), 0.0)
+        except ValueError:
+            try:
+                return max((parsedate_to_datetime(header) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+            except (TypeError, ValueError):
+                pass
+    return min(2 ** attempt, 30)
+
+class JiraFetchTimedOut(Exception):
+    """Jira asked for a retry later than the invocation's deadline."""
+
+def get_page(session, url, params, auth, headers, limiter, max_retries=5, deadline=None):
+    """One Jira GET, retrying 429/503. deadline is a time.monotonic() value no retry may sleep past."""
+    for attempt in range(max_retries + 1):
+        waiting = time.perf_counter()
+        with limiter.slot(url):
+            started = time.perf_counter()
+            metrics.record('JiraSlotWait', (started - waiting) * 1000)
+            response = session.get(url, headers=headers, params=params, auth=auth)
+            metrics.record('JiraPageTime', (time.perf_counter() - started) * 1000)
+        if response.status_code in (429, 503) and attempt < max_retries:
+            metrics.count('JiraRateLimited')
+            delay = retry_after_seconds(response, attempt)
+            if deadline is not None and time.monotonic() + delay > deadline:
+                metrics.count('JiraRetryPastDeadline')
+                raise JiraFetchTimedOut(f"Jira asked to retry startAt={params.get('startAt')} in {delay:.1f}s, "
+                                        f"after the invocation's deadline")
+            print(f"Jira returned {response.status_code} for startAt={params.get('startAt')}, retrying in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+        if response.status_code != 200:
+            raise Exception(f"Failed to fetch issues for {params.get('jql')}: {response.text}")
+        return response.json()
+
+def jira_time_zone(session, base_url, auth, headers, limiter, deadline=None):
+    """The zone Jira reads absolute JQL dates in: the time zone of the API user's profile."""
+    user = get_page(session, f"{base_url}/rest/api/3/myself", {}, auth, headers, limiter, deadline=deadline)
+    return ZoneInfo(user.get('timeZone') or 'UTC')
+
+def jql_date(value, time_zone):
+    return value.astimezone(time_zone).strftime(JQL_DATE_FORMAT)
+
+def build_jql(project_id, since=None, until=None, time_zone=timezone.utc, overlap_minutes=5):
+    """JQL for issues changed since the watermark, or created in the last 8 days without one.
+
+    Both bounds are absolute, so every page of a fetch is answered for the same window. With
+    `until`, issues edited mid-fetch leave the result set rather than join it, and new issues
+    never join it. Results are ordered by creation, which edits don't change.
+    """
+    if since is None:
+        # Calculate the date 8 days ago
+        eight_days_ago = (datetime.now() - timedelta(days=8)).strftime("%Y-%m-%d")
+        jql = f"project = {project_id} AND created >= '{eight_days_ago}'"
+    else:
+        start = since - timedelta(minutes=overlap_minutes)
+        jql = f"project = {project_id} AND updated >= '{jql_date(start, time_zone)}'"
+    if until is not None:
+        jql += f" AND updated < '{jql_date(until, time_zone)}'"
+    return jql + " ORDER BY created ASC, key ASC"
+
+def parse_jira_timestamp(value):
+    return datetime.strptime(value, JIRA_TIMESTAMP_FORMAT)
+
+def issue_updated(issue):
+    value = (issue.get('fields') or {}).get('updated')
+    return parse_jira_timestamp(value) if value else None
+
+class JiraFetchIncomplete(Exception):
+    """A project's result set kept changing while it was paged through, so issues may be missing."""
+
+def fetch_jira_issues(base_url, project_id, email, api_key, session=None, limiter=None, page_workers=4, since=None,
+                      until=None, time_zone=None, deadline=None):
+    """Fetch a project's issues. With `since`, only issues updated from that watermark on are returned.
+
+    With `until`, issues updated from it on are left for the next run. The query is bounded
+    by it too, so its result set can only shrink while it is paged: when every page reports
+    the first page's total nothing moved between pages, and `until` can be the next watermark.
+    Otherwise the project is fetched again, and JiraFetchIncomplete is raised after
+    FETCH_ATTEMPTS tries. `time_zone` is the API user's, looked up when not given. With a
+    time.monotonic() `deadline`, JiraFetchTimedOut is raised rather than waiting past it.
+    """
+    url = f"{base_url}/rest/api/3/search"
+    session = session or create_session()
+    limiter = limiter or HostLimiter()
 
     auth = HTTPBasicAuth(email, api_key)
     headers = {"Accept": "application/json"}
 
-    while True:
-        response = requests.get(url, headers=headers, params=params, auth=auth)
-        if response.status_code != 200:
-            raise Exception(f"Failed to fetch issues for project {project_id}: {response.text}")
-        
-        data = json.loads(response.text)
-        issues = data['issues']
-        all_issues.extend(issues)
-        
-        if len(all_issues) >= data['total']:
-            break
-        
-        params['startAt'] = len(all_issues)
-
-    return all_issues
\ No newline at end of file
+    if time_zone is None and (since is not None or until is not None):
+        time_zone = jira_time_zone(session, base_url, auth, headers, limiter, deadline)
+    jql = build_jql(project_id, since, until, time_zone or timezone.utc)
+
+    for attempt in range(FETCH_ATTEMPTS):
+        all_issues, totals = _fetch_pages(session, url, jql, auth, headers, limiter, page_workers, deadline)
+        if len(totals) == 1:
+            # Issues created mid-fetch shift the pages, so the same issue can appear twice.
+            unique_issues = {issue['id']: issue for issue in all_issues}
+            return _in_window(list(unique_issues.values()), since, until)
+        metrics.count('JiraFetchRestarted')
+        print(f"Jira total for {project_id} changed from {min(totals)} to {max(totals)} during the fetch, "
+              f"fetching again")
+    raise JiraFetchIncomplete(f"Jira results for {project_id} kept changing over {FETCH_ATTEMPTS} fetches")
+
+def _fetch_pages(session, url, jql, auth, headers, limiter, page_workers, deadline=None):
+    """Every page of a query up to the largest total any page reported, and the set of those totals."""
+    # The first page tells us the total and page size, the rest are fetched in parallel.
+    first_page = get_page(session, url, {"jql": jql, "startAt": 0}, auth, headers, limiter, deadline=deadline)
+    all_issues = list(first_page['issues'])
+    totals = {first_page['total']}
+    page_size = first_page.get('maxResults') or len(all_issues)
+    if not page_size:
+        return all_issues, totals
+
+    def fetch_page(start_at):
+        return get_page(session, url, {"jql": jql, "startAt": start_at, "maxResults": page_size},
+                        auth, headers, limiter, deadline=deadline)
+
+    # A later page can report a larger total than the first; keep going until the largest is covered.
+    covered = len(all_issues)
+    with ThreadPoolExecutor(max_workers=max(1, page_workers)) as executor:
+        while covered < max(totals):
+            start_ats = range(covered, max(totals), page_size)
+            for page in executor.map(fetch_page, start_ats):
+                all_issues.extend(page['issues'])
+                totals.add(page['total'])
+            covered = start_ats[-1] + page_size
+    return all_issues, totals
+
+def _in_window(issues, since, until):
+    # The query window overlaps the previous run, so drop what it already delivered,
+    # and what was updated from `until` on, which the next run delivers.
+    if since is None and until is None:
+        return issues
+    in_window = []
+    for issue in issues:
+        updated = issue_updated(issue)
+        if updated is None or ((since is None or updated >= since) and (until is None or updated < until)):
+            in_window.append(issue)
+    return in_window
@@ -1,29 +1,76 @@
 import os
 import json
-from datetime import datetime
-from jira_utils import fetch_jira_issues, parse_json_with_map, jira_mappings
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from jira_utils import (fetch_jira_issues, FieldExtractor, adf_to_text, jira_mappings, create_session, HostLimiter,
+                        parse_jira_timestamp, JIRA_TIMESTAMP_FORMAT, DESCRIPTION_MAX_CHARS)
 from aws_utils import get_secret, upload_to_s3
 from csv_utils import create_csv
+from sync_state import build_sync_state_store
+from metrics import metrics
 
-def process_project(project_id, jira_creds, s3_bucket, s3_prefix):
+metrics.configure(service='fetch-jira-issues')
+
+# Compiled once per container and shared by every project thread.
+issue_extractor = FieldExtractor(jira_mappings, transforms={
+    'Description': partial(adf_to_text, max_chars=int(os.environ.get('JIRA_DESCRIPTION_MAX_CHARS',
+                                                                      DESCRIPTION_MAX_CHARS))),
+})
+
+def deadline_from_context(context):
+    """time.monotonic() by which Jira must have answered, leaving time to upload and save the watermarks."""
+    if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+        return None
+    margin_ms = int(os.environ.get('JIRA_DEADLINE_MARGIN_MS', 15000))
+    return time.monotonic() + max(context.get_remaining_time_in_millis() - margin_ms, 0) / 1000
+
+def process_project(project_id, jira_creds, s3_bucket, s3_prefix, session=None, limiter=None, watermark=None,
+                    deadline=None):
     """Process a single project and return the result."""
-    issues = fetch_jira_issues(jira_creds['base_url'], project_id.strip(), jira_creds['email'], jira_creds['api_key'])
-    formatted_issues = [parse_json_with_map(i, jira_mappings) for i in issues]
-    
-    csv_string = create_csv(formatted_issues)
+    page_workers = int(os.environ.get('JIRA_PAGE_CONCURRENCY', 4))
+    since = parse_jira_timestamp(watermark) if watermark else None
+    # Fixed before the first page is requested. Edits in the last JIRA_SETTLE_SECONDS are left for
+    # the next run, which also covers clock skew between Lambda and Jira. Whole minutes, as JQL dates are.
+    until = datetime.now(timezone.utc) - timedelta(seconds=int(os.environ.get('JIRA_SETTLE_SECONDS', 60)))
+    until = until.replace(second=0, microsecond=0)
+    with metrics.span('JiraProjectFetch'):
+        issues = fetch_jira_issues(jira_creds['base_url'], project_id.strip(), jira_creds['email'],
+                                   jira_creds['api_key'], session=session, limiter=limiter,
+                                   page_workers=page_workers, since=since, until=until, deadline=deadline)
+
+    result = {
+        'project_id': project_id.strip(),
+        'issues_count': len(issues),
+        # The bound, not max(updated): it is what this run is known to have covered. fetch_jira_issues
+        # raises instead of returning when it could not confirm that, and the watermark stays put.
+        'watermark': (max(until, since) if since else until).strftime(JIRA_TIMESTAMP_FORMAT)
+    }
+    if not issues:
+        return result
+
+    # A fixed header lets the Glue job read the file with its declared schema.
+    csv_string = create_csv(issue_extractor.rows(issues), fieldnames=issue_extractor.fieldnames)
     
     current_date = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
     s3_key = f"{s3_prefix}/{project_id.strip()}_{current_date}.csv"
     
-    upload_to_s3(csv_string, s3_bucket, s3_key)
+    with metrics.span('S3UploadCsv'):
+        upload_to_s3(csv_string, s3_bucket, s3_key)
+    metrics.count('JiraIssues', len(issues))
     
-    return {
-        'project_id': project_id.strip(),
-        'issues_count': len(issues),
-        's3_path': f"s3://{s3_bucket}/{s3_key}"
-    }
+    result['s3_path'] = f"s3://{s3_bucket}/{s3_key}"
+    return result
 
 def lambda_handler(event, context):
+    try:
+        with metrics.span('HandlerTime'):
+            return sync_projects(event, context)
+    finally:
+        metrics.flush()
+
+def sync_projects(event, context):
     # Retrieve environment variables
     s3_bucket = os.environ['BUCKET_NAME']
     s3_prefix = os.environ['S3_PREFIX']
@@ -39,17 +86,36 @@ def lambda_handler(event, context):
     try:
 
         jira_creds = get_secret(secret_name)
+        sync_store = build_sync_state_store(s3_bucket)
+        sync_state = sync_store.load()
+        watermarks = sync_state['projects']
         
-        results = []
-        for project_id in project_ids:
+        max_per_host = int(os.environ.get('JIRA_MAX_CONCURRENCY', 8))
+        project_workers = int(os.environ.get('JIRA_PROJECT_CONCURRENCY', 4))
+        session = create_session(pool_size=max_per_host)
+        limiter = HostLimiter(max_per_host=max_per_host)
+        deadline = deadline_from_context(context)
+
+        def run_project(project_id):
             try:
-                result = process_project(project_id, jira_creds, s3_bucket, s3_prefix)
-                results.append(result)
+                watermark = watermarks.get(project_id.strip(), {}).get('updated')
+                return process_project(project_id, jira_creds, s3_bucket, s3_prefix, session, limiter, watermark,
+                                       deadline)
             except Exception as e:
-                results.append({
+                return {
                     'project_id': project_id.strip(),
                     'error': str(e)
-                })
+                }
+
+        with ThreadPoolExecutor(max_workers=max(1, min(project_workers, len(project_ids)))) as executor:
+            results = list(executor.map(run_project, project_ids))
+
+        # Only projects whose upload succeeded advance, and all of them in one write.
+        synced_at = datetime.now(timezone.utc).strftime(JIRA_TIMESTAMP_FORMAT)
+        for result in results:
+            if 'error' not in result and result.get('watermark'):
+                watermarks[result['project_id']] = {'updated': result['watermark'], 'synced_at': synced_at}
+        sync_store.commit(sync_state)
         
         return {
             'statusCode': 200,
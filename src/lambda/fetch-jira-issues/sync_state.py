@@ -0,0 +1,78 @@
+import json
+import os
+import tempfile
+
+from botocore.exceptions import ClientError
+
+from idempotency import LOST_RACE_CODES
+from runtime import runtime
+
+def empty_state():
+    return {'version': 1, 'projects': {}}
+
+class S3SyncStateStore:
+    """Per-project `updated` watermarks kept in a single JSON object in S3.
+
+    commit() is a conditional write against the ETag seen by load(), so two overlapping
+    runs can't silently overwrite each other's progress.
+    """
+
+    def __init__(self, bucket, key, client=None):
+        self.bucket = bucket
+        self.key = key
+        self.s3 = client or runtime.client('s3')
+        self._etag = None
+
+    def load(self):
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=self.key)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                self._etag = None
+                return empty_state()
+            raise
+        self._etag = response['ETag']
+        return json.loads(response['Body'].read())
+
+    def commit(self, state):
+        condition = {'IfMatch': self._etag} if self._etag else {'IfNoneMatch': '*'}
+        try:
+            response = self.s3.put_object(
+                Bucket=self.bucket,
+                Key=self.key,
+                Body=json.dumps(state, indent=2, sort_keys=True),
+                ContentType='application/json',
+                **condition
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] in LOST_RACE_CODES:
+                raise Exception(f"Sync state s3://{self.bucket}/{self.key} was changed by another run") from e
+            raise
+        self._etag = response['ETag']
+
+class LocalSyncStateStore:
+    """File-backed sync state for local runs and tests. Commits with an atomic rename."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return empty_state()
+
+    def commit(self, state):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+def build_sync_state_store(bucket):
+    local_path = os.environ.get('SYNC_STATE_PATH')
+    if local_path:
+        return LocalSyncStateStore(local_path)
+    return S3SyncStateStore(bucket, os.environ.get('SYNC_STATE_KEY', 'sync-state/jira.json'))
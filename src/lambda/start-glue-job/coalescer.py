@@ -0,0 +1,137 @@
+import hashlib
+import json
+import random
+import time
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+
+from botocore.exceptions import ClientError
+
+from idempotency import LOST_RACE_CODES
+
+# Concurrent uploads in a burst all update pending.json; each lost race re-reads and retries.
+MAX_UPDATE_ATTEMPTS = 25
+
+
+class UploadCoalescer:
+    """Collects uploaded CSV keys in a pending manifest and hands them to Glue in batches.
+
+    Everything lives under <prefix>/:
+      pending.json          files waiting for the next run, updated with conditional writes
+      batches/<id>.json     the input manifest of one launched run, passed as --INPUT_MANIFEST
+
+    A batch is due once it holds max_files files or max_bytes bytes, or its oldest file
+    has waited window_seconds. Uploads check the size thresholds as they arrive; a
+    scheduled flush catches batches that only the window makes due.
+    """
+
+    def __init__(self, s3_client, bucket_name: str, prefix: str = 'glue-batches', window_seconds: int = 120,
+                 max_files: int = 50, max_bytes: int = 512 * 1024 * 1024):
+        self.s3 = s3_client
+        self.bucket_name = bucket_name
+        self.prefix = prefix.rstrip('/')
+        self.window_seconds = window_seconds
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+
+    def add(self, files: List[dict]) -> dict:
+        """Queue files ({'key', 'etag', 'size', 'input_id'}). Returns the updated pending manifest."""
+        def append(pending):
+            queued = {f['input_id'] for f in pending['files']}
+            now = time.time()
+            pending['files'].extend({**f, 'queued_at': now} for f in files if f['input_id'] not in queued)
+            return pending
+
+        return self._update(append)
+
+    def due(self, pending: dict, now: Optional[float] = None) -> bool:
+        files = pending['files']
+        if not files:
+            return False
+        now = time.time() if now is None else now
+        return (len(files) >= self.max_files
+                or sum(f['size'] for f in files) >= self.max_bytes
+                or now - min(f['queued_at'] for f in files) >= self.window_seconds)
+
+    def take(self, force: bool = False) -> Optional[dict]:
+        """Write the input manifest for everything pending and empty the pending list.
+
+        Returns the batch manifest, or None if nothing is pending or (unless force) nothing is due.
+        """
+        taken = []
+
+        def empty(pending):
+            taken.clear()
+            if not pending['files'] or not (force or self.due(pending)):
+                return None
+            # Written before the files leave pending.json, so they are never only in memory.
+            batch = self._write_batch(pending['files'])
+            taken.append(batch)
+            return {**pending, 'files': []}
+
+        self._update(empty)
+        if not taken:
+            return None
+        batch = taken[0]
+        print(f"Batched {len(batch['files'])} files ({batch['bytes']} bytes) into {batch['manifest_key']}")
+        return batch
+
+    def _write_batch(self, files: List[dict]) -> dict:
+        batch_id = hashlib.sha256(''.join(sorted(f['input_id'] for f in files)).encode('utf-8')).hexdigest()[:24]
+        batch = {
+            'batch_id': batch_id,
+            'manifest_key': f"{self.prefix}/batches/{batch_id}.json",
+            # Derived from the inputs, so a retried run overwrites its own output.
+            'output_name': f"staged_batch_{batch_id[:12]}",
+            'files': files,
+            'bytes': sum(f['size'] for f in files),
+            'created_at': datetime.now(timezone.utc).isoformat(),
+        }
+        self.s3.put_object(Bucket=self.bucket_name, Key=batch['manifest_key'], Body=json.dumps(batch, indent=2),
+                           ContentType='application/json')
+        return batch
+
+    def restore(self, batch: dict) -> None:
+        """Put a batch that could not be launched back in front of the pending files."""
+        def prepend(pending):
+            queued = {f['input_id'] for f in pending['files']}
+            pending['files'] = [f for f in batch['files'] if f['input_id'] not in queued] + pending['files']
+            return pending
+
+        self._update(prepend)
+        self.s3.delete_object(Bucket=self.bucket_name, Key=batch['manifest_key'])
+        print(f"Returned {len(batch['files'])} files of batch {batch['batch_id']} to the pending list")
+
+    def pending(self) -> dict:
+        return self._read()[0]
+
+    def _update(self, change: Callable[[dict], Optional[dict]]) -> dict:
+        """Apply change to pending.json with a conditional write, retrying on lost races.
+
+        change returns the new manifest, or None to leave it as it is.
+        """
+        key = f"{self.prefix}/pending.json"
+        for attempt in range(MAX_UPDATE_ATTEMPTS):
+            pending, etag = self._read()
+            updated = change(pending)
+            if updated is None:
+                return pending
+            condition = {'IfMatch': etag} if etag else {'IfNoneMatch': '*'}
+            try:
+                self.s3.put_object(Bucket=self.bucket_name, Key=key, Body=json.dumps(updated),
+                                   ContentType='application/json', **condition)
+                return updated
+            except ClientError as e:
+                if e.response['Error']['Code'] not in LOST_RACE_CODES:
+                    raise
+            time.sleep(random.uniform(0.02, 0.05) * (attempt + 1))
+        raise RuntimeError(f"Could not update {key} after {MAX_UPDATE_ATTEMPTS} attempts")
+
+    def _read(self):
+        try:
+            response = self.s3.get_object(Bucket=self.bucket_name, Key=f"{self.prefix}/pending.json")
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return {'files': []}, None
+            raise
+        return json.loads(response['Body'].read()), response['ETag']
@@ -1,49 +1,167 @@
 import json
-import boto3
 import os
+from botocore.exceptions import ClientError
+from idempotency import build_ledger, input_id, invocation_lease, output_name
+from runtime import runtime
 
-# Initialize Boto3 Glue client
-glue_client = boto3.client('glue')
+LEDGER_SCOPE = 'glue'
 
-def handler(event, context):
-    # Print event for debugging
-    print(f"Received event: {json.dumps(event)}")
-
-    # Get bucket name and object key (file name) from the S3 event
+def parse_records(event):
+    """(bucket, key, etag, size) of every object in an S3 event; etag and size are None if missing."""
+    files = []
     try:
-        s3_event = event['Records'][0]['s3']
-        s3_bucket = s3_event['bucket']['name']
-        s3_key = s3_event['object']['key']
+        for record in event['Records']:
+            s3_event = record['s3']
+            files.append((s3_event['bucket']['name'], s3_event['object']['key'],
+                          s3_event['object'].get('eTag'), s3_event['object'].get('size')))
     except KeyError as e:
         print(f"Error parsing S3 event: {str(e)}")
         raise
 
-    # Check if the uploaded file is a CSV
-    if not s3_key.lower().endswith('.csv'):
-        print(f"Uploaded file '{s3_key}' is not a CSV file. Failing the Lambda function.")
-        raise ValueError(f"Uploaded file '{s3_key}' is not a CSV file")
+    # Check if the uploaded files are CSVs
+    for _, s3_key, _, _ in files:
+        if not s3_key.lower().endswith('.csv'):
+            print(f"Uploaded file '{s3_key}' is not a CSV file. Failing the Lambda function.")
+            raise ValueError(f"Uploaded file '{s3_key}' is not a CSV file")
+    return files
 
-    # Get the Glue job name from the environment variables
-    glue_job_name = os.environ.get('GLUE_JOB_NAME')
-    if not glue_job_name:
-        raise ValueError("GLUE_JOB_NAME environment variable not set")
+def describe_file(s3, s3_bucket, s3_key, etag, size):
+    if etag is None or size is None:
+        head = s3.head_object(Bucket=s3_bucket, Key=s3_key)
+        etag, size = head['ETag'], head['ContentLength']
+    return {'key': s3_key, 'etag': etag.strip('"'), 'size': size, 'input_id': input_id(s3_bucket, s3_key, etag)}
 
-    # Start the Glue job and pass in the bucket and new CSV file as arguments
-    try:
-        response = glue_client.start_job_run(
-            JobName=glue_job_name,
-            Arguments={
+def build_coalescer(s3, s3_bucket):
+    # Imported here: only the coalesce mode needs it.
+    from coalescer import UploadCoalescer
+    return UploadCoalescer(
+        s3,
+        s3_bucket,
+        prefix=os.environ.get('GLUE_BATCH_PREFIX', 'glue-batches'),
+        window_seconds=int(os.environ.get('GLUE_BATCH_WINDOW_SECONDS', 120)),
+        max_files=int(os.environ.get('GLUE_BATCH_MAX_FILES', 50)),
+        max_bytes=int(os.environ.get('GLUE_BATCH_MAX_BYTES', 512 * 1024 * 1024)),
+    )
+
+def start_job(glue_job_name, arguments):
+    response = runtime.client('glue').start_job_run(JobName=glue_job_name, Arguments=arguments)
+    print(f"Glue job '{glue_job_name}' started successfully with JobRunId: {response['JobRunId']}")
+    return response['JobRunId']
+
+def start_per_file(glue_job_name, s3, ledger, files, lease_seconds=None):
+    """One Glue run per uploaded file. Returns a message per file."""
+    messages = []
+    for s3_bucket, s3_key, etag, size in files:
+        # Skip S3 events that were delivered more than once for the same object
+        identity = describe_file(s3, s3_bucket, s3_key, etag, size)['input_id']
+        if ledger is not None and ledger.claim(LEDGER_SCOPE, identity, {'bucket': s3_bucket, 'key': s3_key},
+                                               lease_seconds=lease_seconds) is None:
+            messages.append(f"Glue job for {s3_key} was already started")
+            continue
+
+        # Start the Glue job and pass in the bucket and new CSV file as arguments
+        try:
+            job_run_id = start_job(glue_job_name, {
                 '--S3_BUCKET': s3_bucket,
-                '--NEW_CSV_FILE': s3_key
-            }
-        )
-        print(f"Glue job '{glue_job_name}' started successfully with JobRunId: {response['JobRunId']}")
+                '--NEW_CSV_FILE': s3_key,
+                # Derived from the input, so a retried run overwrites its own output instead of adding to it
+                '--OUTPUT_NAME': output_name('staged', s3_key, identity)
+            })
+        except Exception as e:
+            print(f"Error starting Glue job: {str(e)}")
+            if ledger is not None:
+                ledger.release(LEDGER_SCOPE, identity)
+            raise
+
+        if ledger is not None:
+            ledger.complete(LEDGER_SCOPE, identity, job_name=glue_job_name, job_run_id=job_run_id)
+        messages.append(f"Glue job started successfully with JobRunId: {job_run_id}")
+    return messages
+
+def queue_files(s3, ledger, coalescer, files, lease_seconds=None):
+    """Add the uploaded files to the pending batch. Returns the pending manifest."""
+    queued = []
+    for s3_bucket, s3_key, etag, size in files:
+        described = describe_file(s3, s3_bucket, s3_key, etag, size)
+        # Skip S3 events that were delivered more than once for the same object
+        if ledger is not None and ledger.claim(LEDGER_SCOPE, described['input_id'],
+                                               {'bucket': s3_bucket, 'key': s3_key}, lease_seconds=lease_seconds) is None:
+            continue
+        queued.append(described)
+    try:
+        pending = coalescer.add(queued) if queued else coalescer.pending()
+    except Exception:
+        if ledger is not None:
+            for described in queued:
+                ledger.release(LEDGER_SCOPE, described['input_id'])
+        raise
+    if ledger is not None:
+        for described in queued:
+            ledger.complete(LEDGER_SCOPE, described['input_id'], queued_in=coalescer.prefix)
+    print(f"Queued {len(queued)} of {len(files)} files, {len(pending['files'])} pending")
+    return pending
+
+def launch_batch(glue_job_name, coalescer, force=False):
+    """Start one Glue run for everything pending if the batch is due. Returns the JobRunId or None."""
+    batch = coalescer.take(force=force)
+    if batch is None:
+        return None
+    try:
+        return start_job(glue_job_name, {
+            '--S3_BUCKET': coalescer.bucket_name,
+            '--INPUT_MANIFEST': batch['manifest_key'],
+            '--OUTPUT_NAME': batch['output_name']
+        })
     except Exception as e:
         print(f"Error starting Glue job: {str(e)}")
+        coalescer.restore(batch)
+        # A run that is still going holds the only slot; the next flush retries.
+        if isinstance(e, ClientError) and e.response['Error']['Code'] == 'ConcurrentRunsExceededException':
+            return None
         raise
 
+def handler(event, context):
+    # Print event for debugging
+    print(f"Received event: {json.dumps(event)}")
+
+    # Get the Glue job name from the environment variables
+    glue_job_name = os.environ.get('GLUE_JOB_NAME')
+    if not glue_job_name:
+        raise ValueError("GLUE_JOB_NAME environment variable not set")
+
+    s3 = runtime.client('s3')
+    # immediate: one run per uploaded file. coalesce: uploads share a run per window or size threshold.
+    mode = os.environ.get('GLUE_TRIGGER_MODE', 'immediate').lower()
+
+    # The schedule that flushes batches only the window has made due; {"force": true} flushes regardless.
+    if event.get('source') == 'aws.events' or 'force' in event:
+        job_run_id = launch_batch(glue_job_name, build_coalescer(s3, os.environ['BUCKET_NAME']),
+                                  force=event.get('force') is True)
+        return {
+            'statusCode': 200,
+            'body': json.dumps(f"Glue job started successfully with JobRunId: {job_run_id}" if job_run_id
+                               else "No batch due")
+        }
+
+    # Get bucket name and object key (file name) of every object in the S3 event
+    files = parse_records(event)
+    s3_bucket = files[0][0]
+    ledger = build_ledger(s3, s3_bucket)
+    # A claim left by a timed-out invocation lapses before Lambda retries the event.
+    lease_seconds = invocation_lease(context)
+
+    if mode == 'immediate':
+        messages = start_per_file(glue_job_name, s3, ledger, files, lease_seconds)
+    elif mode == 'coalesce':
+        coalescer = build_coalescer(s3, s3_bucket)
+        pending = queue_files(s3, ledger, coalescer, files, lease_seconds)
+        job_run_id = launch_batch(glue_job_name, coalescer) if coalescer.due(pending) else None
+        messages = [f"Glue job started successfully with JobRunId: {job_run_id}" if job_run_id
+                    else f"{len(pending['files'])} files pending for the next Glue run"]
+    else:
+        raise ValueError(f"Unknown GLUE_TRIGGER_MODE '{mode}'")
+
     return {
         'statusCode': 200,
-        'body': json.dumps(f"Glue job started successfully with JobRunId: {response['JobRunId']}")
+        'body': json.dumps(messages[0] if len(messages) == 1 else messages)
     }
-    
\ No newline at end of file
@@ -0,0 +1,207 @@
+"""Idempotency ledger, so each input object is processed once however often its S3 event fires.
+
+Shipped to every Lambda in the shared layer (src/shared/python).
+
+An input is identified by bucket, key and ETag: a repeated event for the same object is a
+duplicate, a re-upload with new content is new work.
+
+    ledger = build_ledger(s3_client, bucket)
+    identity = input_id(bucket, key, etag)
+    if ledger.claim('classify', identity, {'key': key}, lease_seconds=invocation_lease(context)) is None:
+        return  # done already, or in progress in another invocation
+    try:
+        ...
+    except Exception:
+        ledger.release('classify', identity)   # let the retry have it
+        raise
+    ledger.complete('classify', identity, output_key=...)
+
+A claim that is neither completed nor released (the function timed out or crashed) lapses
+after its lease, and the next event for the input takes it over. invocation_lease() ends
+the lease shortly after the invocation's own timeout, before Lambda retries the event.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+IN_PROGRESS = 'in_progress'
+COMPLETED = 'completed'
+DEFAULT_LEASE_SECONDS = 3600
+# Lambda retries a failed async invocation after a minute at the earliest.
+INVOCATION_LEASE_MARGIN_SECONDS = 30
+# Conditional writes that lost a race: S3 answers 412, or 409 when a concurrent write is in flight.
+LOST_RACE_CODES = ('PreconditionFailed', 'ConditionalRequestConflict')
+
+
+def input_id(bucket: str, key: str, etag: str) -> str:
+    """Identity of the exact object version an event refers to."""
+    etag = (etag or '').strip('"')
+    return hashlib.sha256(f"{bucket}/{key}/{etag}".encode('utf-8')).hexdigest()[:24]
+
+
+def output_name(prefix: str, key: str, identity: str) -> str:
+    """Output file name derived from the input, e.g. processed_staged_20240501_101500_3f2a9c0d1b7e."""
+    stem = key.rsplit('/', 1)[-1].rsplit('.', 1)[0]
+    return f"{prefix}_{stem}_{identity[:12]}"
+
+
+def invocation_lease(context, margin_seconds: int = INVOCATION_LEASE_MARGIN_SECONDS):
+    """Lease that lapses margin_seconds after the invocation times out, or None without a Lambda context."""
+    if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+        return None
+    return context.get_remaining_time_in_millis() // 1000 + margin_seconds
+
+
+def claimable(existing, resume: bool, now: float) -> bool:
+    """Whether a new claim may replace the existing ledger record."""
+    if existing is None:
+        return True
+    if existing['state'] == COMPLETED:
+        return False
+    # A continuation carries on with its own run's claim; anyone else waits for the lease to lapse.
+    return resume or now >= existing['claimed_at'] + existing['lease_seconds']
+
+
+def describe(scope: str, identity: str, existing) -> str:
+    if existing['state'] == COMPLETED:
+        return f"{scope} {identity} already completed: {json.dumps(existing.get('result', {}))}"
+    return f"{scope} {identity} is in progress since {time.ctime(existing['claimed_at'])}"
+
+
+class S3Ledger:
+    """Ledger records as JSON objects under <prefix>/<scope>/<identity>.json, claimed with conditional puts."""
+
+    def __init__(self, s3_client, bucket_name: str, prefix: str = 'ledger', lease_seconds: int = DEFAULT_LEASE_SECONDS):
+        self.s3 = s3_client
+        self.bucket_name = bucket_name
+        self.prefix = prefix.rstrip('/')
+        self.lease_seconds = lease_seconds
+
+    def claim(self, scope: str, identity: str, details: dict = None, lease_seconds: int = None, resume: bool = False):
+        """The new in-progress record, or None if the input is completed or claimed by someone else."""
+        key = self._key(scope, identity)
+        record = {'scope': scope, 'id': identity, 'state': IN_PROGRESS, 'claimed_at': time.time(),
+                  'lease_seconds': lease_seconds or self.lease_seconds, 'input': details or {}}
+        # Create if absent; otherwise replace only the exact version that was judged claimable.
+        condition = {'IfNoneMatch': '*'}
+        for _ in range(3):
+            try:
+                self._put(key, record, **condition)
+                return record
+            except ClientError as e:
+                if e.response['Error']['Code'] not in LOST_RACE_CODES:
+                    raise
+            existing, etag = self._get(key)
+            if existing is not None and not claimable(existing, resume, time.time()):
+                print(f"Skipping duplicate: {describe(scope, identity, existing)}")
+                return None
+            condition = {'IfNoneMatch': '*'} if existing is None else {'IfMatch': etag}
+        print(f"Skipping duplicate: lost repeated races to claim {scope} {identity}")
+        return None
+
+    def complete(self, scope: str, identity: str, **result) -> None:
+        key = self._key(scope, identity)
+        existing, _ = self._get(key)
+        self._put(key, {**(existing or {'scope': scope, 'id': identity, 'input': {}}),
+                        'state': COMPLETED, 'completed_at': time.time(), 'result': result})
+
+    def release(self, scope: str, identity: str) -> None:
+        self.s3.delete_object(Bucket=self.bucket_name, Key=self._key(scope, identity))
+
+    def get(self, scope: str, identity: str):
+        return self._get(self._key(scope, identity))[0]
+
+    def _get(self, key: str):
+        try:
+            response = self.s3.get_object(Bucket=self.bucket_name, Key=key)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None, None
+            raise
+        return json.loads(response['Body'].read()), response['ETag']
+
+    def _put(self, key: str, record: dict, **condition) -> None:
+        self.s3.put_object(Bucket=self.bucket_name, Key=key, Body=json.dumps(record),
+                           ContentType='application/json', **condition)
+
+    def _key(self, scope: str, identity: str) -> str:
+        return f"{self.prefix}/{scope}/{identity}.json"
+
+
+class SQLiteLedger:
+    """The same ledger in a local SQLite file, for running the handlers without S3."""
+
+    def __init__(self, path: str, lease_seconds: int = DEFAULT_LEASE_SECONDS):
+        import sqlite3
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=30)
+        self._db.execute('CREATE TABLE IF NOT EXISTS ledger '
+                         '(scope TEXT NOT NULL, id TEXT NOT NULL, record TEXT NOT NULL, PRIMARY KEY (scope, id))')
+
+    def claim(self, scope: str, identity: str, details: dict = None, lease_seconds: int = None, resume: bool = False):
+        record = {'scope': scope, 'id': identity, 'state': IN_PROGRESS, 'claimed_at': time.time(),
+                  'lease_seconds': lease_seconds or self.lease_seconds, 'input': details or {}}
+        with self._transaction():
+            existing = self._get(scope, identity)
+            if not claimable(existing, resume, time.time()):
+                print(f"Skipping duplicate: {describe(scope, identity, existing)}")
+                return None
+            self._put(scope, identity, record)
+        return record
+
+    def complete(self, scope: str, identity: str, **result) -> None:
+        with self._transaction():
+            existing = self._get(scope, identity) or {'scope': scope, 'id': identity, 'input': {}}
+            self._put(scope, identity, {**existing, 'state': COMPLETED, 'completed_at': time.time(), 'result': result})
+
+    def release(self, scope: str, identity: str) -> None:
+        with self._transaction():
+            self._db.execute('DELETE FROM ledger WHERE scope = ? AND id = ?', (scope, identity))
+
+    def get(self, scope: str, identity: str):
+        with self._lock:
+            return self._get(scope, identity)
+
+    def _transaction(self):
+        ledger = self
+
+        class Transaction:
+            def __enter__(self):
+                ledger._lock.acquire()
+                # IMMEDIATE takes the write lock up front, so other processes can't interleave.
+                ledger._db.execute('BEGIN IMMEDIATE')
+
+            def __exit__(self, exc_type, exc, tb):
+                try:
+                    ledger._db.execute('ROLLBACK' if exc_type else 'COMMIT')
+                finally:
+                    ledger._lock.release()
+                return False
+
+        return Transaction()
+
+    def _get(self, scope: str, identity: str):
+        row = self._db.execute('SELECT record FROM ledger WHERE scope = ? AND id = ?', (scope, identity)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _put(self, scope: str, identity: str, record: dict) -> None:
+        self._db.execute('INSERT OR REPLACE INTO ledger (scope, id, record) VALUES (?, ?, ?)',
+                         (scope, identity, json.dumps(record)))
+
+
+def build_ledger(s3_client, bucket_name: str):
+    """Ledger chosen by IDEMPOTENCY_LEDGER: s3 (default), sqlite (IDEMPOTENCY_DB_PATH) or none."""
+    backend = os.environ.get('IDEMPOTENCY_LEDGER', 's3').lower()
+    lease_seconds = int(os.environ.get('IDEMPOTENCY_LEASE_SECONDS', DEFAULT_LEASE_SECONDS))
+    if backend == 'none':
+        return None
+    if backend == 'sqlite':
+        return SQLiteLedger(os.environ['IDEMPOTENCY_DB_PATH'], lease_seconds)
+    if backend == 's3':
+        return S3Ledger(s3_client, bucket_name, os.environ.get('IDEMPOTENCY_PREFIX', 'ledger'), lease_seconds)
+    raise ValueError(f"Unknown IDEMPOTENCY_LEDGER '{backend}'")
@@ -0,0 +1,183 @@
+"""Timing spans and counters written as CloudWatch Embedded Metric Format (EMF) logs.
+
+Shipped in the shared Lambda layer (src/shared/python) and to the Glue job
+through --extra-py-files.
+
+    from metrics import metrics
+    metrics.configure(service='classify-tickets')
+    with metrics.span('S3ReadCsv'):
+        ...
+    metrics.record('BedrockInputTokens', 812, unit='Count', Model=model_id)
+    metrics.flush()   # EMF documents plus a p50/p95/p99 summary line
+    metrics.flush(cloudwatch=boto3.client('cloudwatch'))   # PutMetricData instead, e.g. in Glue
+
+Samples are buffered and written at flush(), at most 100 values per metric per EMF
+document, so a run with thousands of Bedrock calls produces a handful of log lines
+rather than one per call.
+"""
+import json
+import math
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+NAMESPACE = 'JiraTicketClassification'
+# EMF accepts at most 100 metrics per document and 100 values per metric.
+MAX_METRICS_PER_DOCUMENT = 100
+MAX_VALUES_PER_METRIC = 100
+# PutMetricData takes at most 150 distinct values per datum, and requests are kept well under its 1 MB limit.
+MAX_VALUES_PER_DATUM = 150
+MAX_DATUMS_PER_REQUEST = 100
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Metrics:
+    def __init__(self, namespace=NAMESPACE, emit=print, max_samples=10000, seed=None):
+        """
+        emit: called with each output line (print in Lambda, a logger method in Glue).
+        max_samples: per metric; beyond it a uniform reservoir sample is kept.
+        """
+        self.namespace = namespace
+        self.emit = emit
+        self.max_samples = max_samples
+        self.dimensions = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def configure(self, service=None, **dimensions):
+        if service is not None:
+            dimensions['Service'] = service
+        self.dimensions = {k: str(v) for k, v in dimensions.items()}
+
+    @contextmanager
+    def span(self, name, **dimensions):
+        """Record the wall time of the block, in milliseconds, under name."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - started) * 1000, 'Milliseconds', **dimensions)
+
+    def record(self, name, value, unit='Milliseconds', **dimensions):
+        if value is None:
+            return
+        key = (name, unit, tuple(sorted((k, str(v)) for k, v in dimensions.items())))
+        with self._lock:
+            series = self._series.setdefault(key, {'count': 0, 'sum': 0.0, 'max': None, 'samples': []})
+            series['count'] += 1
+            series['sum'] += value
+            series['max'] = value if series['max'] is None else max(series['max'], value)
+            if len(series['samples']) < self.max_samples:
+                series['samples'].append(value)
+            else:
+                slot = self._random.randrange(series['count'])
+                if slot < self.max_samples:
+                    series['samples'][slot] = value
+
+    def count(self, name, value=1, **dimensions):
+        self.record(name, value, 'Count', **dimensions)
+
+    def summary(self):
+        """count/sum/max/p50/p95/p99 per metric, keyed by name and any extra dimensions."""
+        with self._lock:
+            series = {key: {**s, 'samples': sorted(s['samples'])} for key, s in self._series.items()}
+        result = {}
+        for (name, unit, dimensions), s in sorted(series.items()):
+            label = name + ''.join(f"[{k}={v}]" for k, v in dimensions)
+            result[label] = {
+                'unit': unit,
+                'count': s['count'],
+                'sum': round(s['sum'], 3),
+                'max': round(s['max'], 3),
+                'p50': round(percentile(s['samples'], 50), 3),
+                'p95': round(percentile(s['samples'], 95), 3),
+                'p99': round(percentile(s['samples'], 99), 3),
+            }
+        return result
+
+    def emf_documents(self):
+        """EMF documents for everything buffered, one per dimension set and 100-value chunk."""
+        with self._lock:
+            series = {key: list(s['samples']) for key, s in self._series.items()}
+        groups = {}
+        for (name, unit, dimensions), samples in series.items():
+            groups.setdefault(dimensions, []).append((name, unit, samples))
+
+        timestamp = int(time.time() * 1000)
+        documents = []
+        for extra, metrics in sorted(groups.items()):
+            dimensions = {**self.dimensions, **dict(extra)}
+            for start in range(0, len(metrics), MAX_METRICS_PER_DOCUMENT):
+                batch = metrics[start:start + MAX_METRICS_PER_DOCUMENT]
+                chunks = max(math.ceil(len(samples) / MAX_VALUES_PER_METRIC) for _, _, samples in batch)
+                for chunk in range(chunks):
+                    document = {
+                        '_aws': {
+                            'Timestamp': timestamp,
+                            'CloudWatchMetrics': [{
+                                'Namespace': self.namespace,
+                                'Dimensions': [sorted(dimensions)],
+                                'Metrics': [],
+                            }],
+                        },
+                        **dimensions,
+                    }
+                    for name, unit, samples in batch:
+                        values = samples[chunk * MAX_VALUES_PER_METRIC:(chunk + 1) * MAX_VALUES_PER_METRIC]
+                        if values:
+                            document['_aws']['CloudWatchMetrics'][0]['Metrics'].append({'Name': name, 'Unit': unit})
+                            document[name] = values
+                    documents.append(document)
+        return documents
+
+    def metric_data(self):
+        """PutMetricData datums for everything buffered, with repeated values sent once with a count."""
+        with self._lock:
+            series = {key: list(s['samples']) for key, s in self._series.items()}
+        datums = []
+        for (name, unit, extra), samples in sorted(series.items()):
+            dimensions = [{'Name': k, 'Value': v} for k, v in sorted({**self.dimensions, **dict(extra)}.items())]
+            counts = {}
+            for value in samples:
+                counts[value] = counts.get(value, 0) + 1
+            values = sorted(counts)
+            for start in range(0, len(values), MAX_VALUES_PER_DATUM):
+                chunk = values[start:start + MAX_VALUES_PER_DATUM]
+                datums.append({'MetricName': name, 'Dimensions': dimensions, 'Unit': unit,
+                               'Values': chunk, 'Counts': [float(counts[v]) for v in chunk]})
+        return datums
+
+    def flush(self, cloudwatch=None):
+        """Emit the EMF documents and a percentile summary, then start over.
+
+        With a CloudWatch client the metrics are sent with PutMetricData instead, for
+        runtimes whose logs are not read as EMF, such as Glue.
+        """
+        if not self._series:
+            return {}
+        if cloudwatch is not None:
+            datums = self.metric_data()
+            for start in range(0, len(datums), MAX_DATUMS_PER_REQUEST):
+                cloudwatch.put_metric_data(Namespace=self.namespace,
+                                           MetricData=datums[start:start + MAX_DATUMS_PER_REQUEST])
+        else:
+            for document in self.emf_documents():
+                self.emit(json.dumps(document))
+        summary = self.summary()
+        self.emit(json.dumps({'MetricsSummary': summary, **self.dimensions}))
+        with self._lock:
+            self._series = {}
+        return summary
+
+
+# Shared by every module of the function; configure() it once in the entry point.
+metrics = Metrics()
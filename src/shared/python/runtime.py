@@ -0,0 +1,91 @@
+"""Clients and secrets reused across warm invocations of the same Lambda container.
+
+Shipped to every Lambda in the shared layer (src/shared/python).
+
+    from runtime import runtime
+    s3 = runtime.client('s3')                                   # created once, then reused
+    bedrock = runtime.client('bedrock-runtime', max_pool_connections=32)
+    creds = runtime.secret('jira-credentials')                  # cached for SECRET_TTL_SECONDS
+
+boto3 is imported on first use rather than at module import, so code paths that never
+create a client don't pay for it during init.
+"""
+import json
+import os
+import threading
+import time
+
+DEFAULT_POOL_CONNECTIONS = 10
+# The classifier's dispatcher does its own retries with AIMD concurrency control, which
+# needs to see every throttle, so Bedrock runtime calls are not retried by botocore.
+SERVICE_RETRIES = {
+    'bedrock-runtime': {'mode': 'standard', 'total_max_attempts': 1},
+}
+DEFAULT_RETRIES = {'mode': 'adaptive', 'max_attempts': 5}
+
+
+class RuntimeContext:
+    def __init__(self, secret_ttl_seconds=None):
+        self.secret_ttl_seconds = float(secret_ttl_seconds if secret_ttl_seconds is not None
+                                        else os.environ.get('SECRET_TTL_SECONDS', 300))
+        self._session = None
+        self._clients = {}
+        self._secrets = {}
+        self._lock = threading.Lock()
+        self.stats = {'clients_created': 0, 'secret_fetches': 0, 'secret_hits': 0}
+
+    def client(self, service, max_pool_connections=None):
+        """The shared client for service, created on first use with a tuned botocore config.
+
+        max_pool_connections only applies when the client is created; size it to the
+        highest concurrency that will share the client.
+        """
+        with self._lock:
+            client = self._clients.get(service)
+            if client is None:
+                client = self._clients[service] = self._create(service, max_pool_connections)
+            return client
+
+    def set_client(self, service, client):
+        """Use client for service, e.g. a local stand-in in benchmarks."""
+        with self._lock:
+            self._clients[service] = client
+
+    def secret(self, name, ttl=None):
+        """SecretString of name parsed as JSON, fetched again only after ttl seconds."""
+        ttl = self.secret_ttl_seconds if ttl is None else ttl
+        now = time.monotonic()
+        with self._lock:
+            cached = self._secrets.get(name)
+            if cached and cached[1] > now:
+                self.stats['secret_hits'] += 1
+                return cached[0]
+        response = self.client('secretsmanager').get_secret_value(SecretId=name)
+        value = json.loads(response['SecretString'])
+        with self._lock:
+            self._secrets[name] = (value, now + ttl)
+            self.stats['secret_fetches'] += 1
+        return value
+
+    def reset(self):
+        with self._lock:
+            self._clients.clear()
+            self._secrets.clear()
+
+    def _create(self, service, max_pool_connections):
+        import boto3
+        from botocore.config import Config
+
+        config = Config(
+            max_pool_connections=max(max_pool_connections or 0, DEFAULT_POOL_CONNECTIONS),
+            tcp_keepalive=True,
+            retries=SERVICE_RETRIES.get(service, DEFAULT_RETRIES),
+        )
+        if self._session is None:
+            self._session = boto3.session.Session()
+        self.stats['clients_created'] += 1
+        return self._session.client(service, config=config)
+
+
+# One per container; survives between warm invocations.
+runtime = RuntimeContext()
@@ -0,0 +1,28 @@
+"""Puts the Lambda, Glue and shared module directories on sys.path, as the Lambda layer does.
+
+Each Lambda has its own main.py; tests load those with load_module rather than importing
+`main`, so two Lambdas' handlers never shadow each other.
+"""
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+for path in [
+    ('src', 'shared', 'python'),
+    ('src', 'lambda', 'fetch-jira-issues'),
+    ('src', 'lambda', 'classify-tickets'),
+    ('src', 'lambda', 'start-glue-job'),
+    ('benchmarks',),
+]:
+    sys.path.insert(0, os.path.join(ROOT, *path))
+
+
+def load_module(name, *path):
+    """Import the file at ROOT/path under `name`."""
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, *path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
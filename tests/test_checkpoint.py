@@ -0,0 +1,75 @@
+from checkpoint import CheckpointStore
+from conftest import load_module
+from local_s3 import LocalS3Client
+
+classify_main = load_module('classify_main', 'src', 'lambda', 'classify-tickets', 'main.py')
+
+BUCKET = 'bucket'
+
+
+class Context:
+    """Plenty of time for the first `windows` checks, then too little."""
+    invoked_function_arn = 'arn:aws:lambda:us-east-1:000000000000:function:classify-tickets'
+
+    def __init__(self, windows):
+        self.windows = windows
+
+    def get_remaining_time_in_millis(self):
+        self.windows -= 1
+        return 600000 if self.windows >= 0 else 1000
+
+
+class Classifier:
+    def __init__(self):
+        self.seen = []
+
+    def classify_tickets(self, tickets):
+        self.seen.extend(t['Key'] for t in tickets)
+        return [{**t, 'Model Answer': 'BUG_FIXING'} for t in tickets]
+
+
+class Sender:
+    def __init__(self):
+        self.events = []
+
+    def send(self, event):
+        self.events.append(event)
+
+
+def test_store_round_trips_parts(tmp_path):
+    s3 = LocalS3Client(str(tmp_path))
+    store = CheckpointStore(s3, BUCKET, 'run-1', flush_every_rows=2)
+    for n in range(5):
+        store.record(f"P-{n}", {'Model Answer': str(n)})
+        store.maybe_flush()
+    store.flush()
+
+    resumed = CheckpointStore(s3, BUCKET, 'run-1')
+    assert resumed.load() == {f"P-{n}": {'Model Answer': str(n)} for n in range(5)}
+    resumed.record('P-5', {'Model Answer': '5'})
+    resumed.flush()
+    # A resumed store keeps numbering after the parts it loaded instead of overwriting them.
+    assert len(CheckpointStore(s3, BUCKET, 'run-1').load()) == 6
+    resumed.clear()
+    assert CheckpointStore(s3, BUCKET, 'run-1').load() == {}
+
+
+def test_continuation_resumes_from_the_checkpoint(tmp_path, monkeypatch):
+    s3 = LocalS3Client(str(tmp_path))
+    rows = [{'Key': f"P-{n}", 'Summary': str(n)} for n in range(25)]
+    sender = Sender()
+    monkeypatch.setenv('CLASSIFY_WINDOW_SIZE', '10')
+    monkeypatch.setattr(classify_main, 'build_continuation', lambda context: sender)
+
+    first = Classifier()
+    store = CheckpointStore(s3, BUCKET, 'run-1')
+    assert not classify_main.classify_remaining({}, Context(windows=1), first, store, iter(rows), 'run-1')
+    assert first.seen == [f"P-{n}" for n in range(10)]
+    assert sender.events == [{'continuation': {'attempt': 1}}]
+
+    second = Classifier()
+    store = CheckpointStore(s3, BUCKET, 'run-1')
+    store.load()
+    assert classify_main.classify_remaining(sender.events[0], Context(windows=10), second, store, iter(rows), 'run-1')
+    assert second.seen == [f"P-{n}" for n in range(10, 25)]
+    assert set(CheckpointStore(s3, BUCKET, 'run-1').load()) == {r['Key'] for r in rows}
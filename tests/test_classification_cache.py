@@ -0,0 +1,51 @@
+import pytest
+
+from classification_cache import ClassificationCache, InMemoryLRUCache
+from ticket_classifier import TicketClassifier
+
+TICKET = {'Key': 'P-1', 'Summary': 'Cannot log in', 'Description': 'Access denied on the admin page'}
+
+
+class Bedrock:
+    """Haiku answers with a label outside CLASSIFICATIONS, Sonnet with an allowed one."""
+
+    def __init__(self):
+        self.calls = []
+
+    def converse(self, modelId, messages, inferenceConfig, system):
+        self.calls.append(modelId)
+        label = 'BUG_FIXING' if modelId == TicketClassifier.SONNET_ID else 'NOT_A_LABEL'
+        return {'output': {'message': {'content': [{'text': f"<reasoning>r</reasoning><answer>{label}</answer>"}]}}}
+
+
+def test_base_cache_is_abstract():
+    with pytest.raises(TypeError):
+        ClassificationCache()
+
+
+def test_escalated_answers_are_cached_under_the_model_that_gave_them():
+    cache = InMemoryLRUCache()
+    bedrock = Bedrock()
+    classifier = TicketClassifier(cache=cache, bedrock_client=bedrock)
+
+    first, = classifier.classify_tickets([TICKET])
+    assert first['Model Answer'] == 'BUG_FIXING'
+    assert bedrock.calls == [TicketClassifier.HAIKU_ID, TicketClassifier.SONNET_ID]
+    prompt = classifier._create_chat_payload(TICKET)
+    assert cache.get(classifier._cache_key(prompt)) is None
+    assert 'BUG_FIXING' in cache.get(classifier._cache_key(prompt, TicketClassifier.SONNET_ID))
+
+    second, = classifier.classify_tickets([TICKET])
+    assert second['Model Answer'] == 'BUG_FIXING'
+    assert len(bedrock.calls) == 2
+
+
+def test_unlabelled_answers_are_not_cached():
+    cache = InMemoryLRUCache()
+    bedrock = Bedrock()
+    classifier = TicketClassifier(cache=cache, bedrock_client=bedrock, escalate=False)
+
+    classifier.classify_tickets([TICKET])
+    classifier.classify_tickets([TICKET])
+    assert bedrock.calls == [TicketClassifier.HAIKU_ID] * 2
+    assert len(cache) == 0
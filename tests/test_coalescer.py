@@ -0,0 +1,73 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from coalescer import UploadCoalescer
+from local_s3 import LocalS3Client
+
+BUCKET = 'bucket'
+
+
+def upload(n, size=100):
+    return {'key': f"unprocessed/jira_issues_{n}.csv", 'etag': f"etag{n}", 'size': size, 'input_id': f"id{n}"}
+
+
+def test_concurrent_adds_keep_every_file(tmp_path):
+    coalescer = UploadCoalescer(LocalS3Client(str(tmp_path)), BUCKET)
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        list(pool.map(lambda n: coalescer.add([upload(n)]), range(32)))
+    assert sorted(f['input_id'] for f in coalescer.pending()['files']) == sorted(f"id{n}" for n in range(32))
+
+
+def test_duplicate_uploads_are_queued_once(tmp_path):
+    coalescer = UploadCoalescer(LocalS3Client(str(tmp_path)), BUCKET)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: coalescer.add([upload(1)]), range(8)))
+    assert [f['input_id'] for f in coalescer.pending()['files']] == ['id1']
+
+
+def test_adds_racing_takes_land_in_exactly_one_batch(tmp_path):
+    s3 = LocalS3Client(str(tmp_path))
+    coalescer = UploadCoalescer(s3, BUCKET, max_files=5)
+    batches = []
+    lock = threading.Lock()
+
+    def add_and_take(n):
+        coalescer.add([upload(n)])
+        batch = coalescer.take()
+        if batch is not None:
+            with lock:
+                batches.append(batch)
+
+    with ThreadPoolExecutor(max_workers=12) as pool:
+        list(pool.map(add_and_take, range(40)))
+    leftover = coalescer.take(force=True)
+    if leftover is not None:
+        batches.append(leftover)
+
+    taken = [f['input_id'] for batch in batches for f in batch['files']]
+    assert sorted(taken) == sorted(f"id{n}" for n in range(40))
+    assert coalescer.pending()['files'] == []
+    for batch in batches:
+        manifest = json.loads(s3.get_object(Bucket=BUCKET, Key=batch['manifest_key'])['Body'].read())
+        assert [f['input_id'] for f in manifest['files']] == [f['input_id'] for f in batch['files']]
+
+
+def test_restored_batch_goes_back_in_front(tmp_path):
+    s3 = LocalS3Client(str(tmp_path))
+    coalescer = UploadCoalescer(s3, BUCKET)
+    coalescer.add([upload(1), upload(2)])
+    batch = coalescer.take(force=True)
+    coalescer.add([upload(3)])
+    coalescer.restore(batch)
+    assert [f['input_id'] for f in coalescer.pending()['files']] == ['id1', 'id2', 'id3']
+    assert s3.list_objects_v2(Bucket=BUCKET, Prefix='glue-batches/batches/').get('KeyCount', 0) == 0
+
+
+def test_window_makes_a_batch_due(tmp_path):
+    coalescer = UploadCoalescer(LocalS3Client(str(tmp_path)), BUCKET, window_seconds=60, max_files=10)
+    pending = coalescer.add([upload(1)])
+    queued_at = pending['files'][0]['queued_at']
+    assert not coalescer.due(pending, now=queued_at + 59)
+    assert coalescer.due(pending, now=queued_at + 60)
+    assert coalescer.take() is None
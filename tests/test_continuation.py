@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+from conftest import load_module
+
+classify_main = load_module('classify_main', 'src', 'lambda', 'classify-tickets', 'main.py')
+
+
+class Context:
+    invoked_function_arn = 'arn:aws:lambda:us-east-1:000000000000:function:classify-tickets'
+
+    def __init__(self, remaining_ms):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+
+def sqs_event(*bodies):
+    return {'Records': [{'messageId': f"m{n}", 'eventSource': 'aws:sqs', 'body': json.dumps(body)}
+                        for n, body in enumerate(bodies)]}
+
+
+def test_every_message_of_an_sqs_batch_is_classified(monkeypatch):
+    seen = []
+
+    def classify(event, context):
+        seen.append(event['n'])
+        if event['n'] == 1:
+            raise RuntimeError('boom')
+        return {'statusCode': 200}
+
+    monkeypatch.setattr(classify_main, 'classify', classify)
+    response = classify_main.handler(sqs_event({'n': 0}, {'n': 1}, {'n': 2}), Context(60000))
+    assert seen == [0, 1, 2]
+    assert response == {'batchItemFailures': [{'itemIdentifier': 'm1'}]}
+
+
+def test_messages_near_the_deadline_are_left_for_redelivery(monkeypatch):
+    monkeypatch.setattr(classify_main, 'classify', lambda event, context: pytest.fail('should not start'))
+    response = classify_main.handler(sqs_event({'n': 0}, {'n': 1}), Context(1000))
+    assert response == {'batchItemFailures': [{'itemIdentifier': 'm0'}, {'itemIdentifier': 'm1'}]}
+
+
+def test_continuation_cap_reports_the_unprocessed_rows(monkeypatch, capsys):
+    counted = []
+    monkeypatch.setenv('MAX_CONTINUATIONS', '2')
+    monkeypatch.setattr(classify_main.metrics, 'count', lambda name, value=1, **dims: counted.append((name, value)))
+    monkeypatch.setattr(classify_main, 'build_continuation', lambda context: pytest.fail('should not hand off'))
+    with pytest.raises(RuntimeError):
+        classify_main.hand_off({'continuation': {'attempt': 2}}, Context(0), 'run-1', unprocessed=lambda: 1234)
+    assert counted == [('RowsPastContinuationCap', 1234)]
+    assert '1234 rows unclassified' in capsys.readouterr().out
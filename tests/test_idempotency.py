@@ -0,0 +1,64 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from idempotency import COMPLETED, IN_PROGRESS, S3Ledger, SQLiteLedger, invocation_lease
+from local_s3 import LocalS3Client
+
+
+@pytest.fixture(params=['s3', 'sqlite'])
+def ledger(request, tmp_path):
+    if request.param == 's3':
+        return S3Ledger(LocalS3Client(str(tmp_path)), 'bucket')
+    return SQLiteLedger(str(tmp_path / 'ledger.sqlite3'))
+
+
+def test_one_claim_per_input(ledger):
+    assert ledger.claim('classify', 'a', {'key': 'k'})['state'] == IN_PROGRESS
+    assert ledger.claim('classify', 'a') is None
+    assert ledger.claim('classify', 'b') is not None
+
+
+def test_completed_input_is_never_claimed_again(ledger):
+    ledger.claim('classify', 'a', lease_seconds=1)
+    ledger.complete('classify', 'a', output_key='processed/a.csv')
+    time.sleep(1.1)
+    assert ledger.claim('classify', 'a') is None
+    assert ledger.claim('classify', 'a', resume=True) is None
+    record = ledger.get('classify', 'a')
+    assert record['state'] == COMPLETED and record['result'] == {'output_key': 'processed/a.csv'}
+
+
+def test_released_input_can_be_claimed_again(ledger):
+    ledger.claim('classify', 'a')
+    ledger.release('classify', 'a')
+    assert ledger.claim('classify', 'a') is not None
+
+
+def test_lapsed_lease_is_taken_over(ledger):
+    ledger.claim('classify', 'a', lease_seconds=1)
+    assert ledger.claim('classify', 'a') is None
+    time.sleep(1.1)
+    assert ledger.claim('classify', 'a', lease_seconds=60) is not None
+    assert ledger.claim('classify', 'a') is None
+
+
+def test_continuation_resumes_its_own_claim(ledger):
+    ledger.claim('classify', 'a')
+    assert ledger.claim('classify', 'a', resume=True) is not None
+
+
+def test_simultaneous_claims_have_one_winner(ledger):
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        claims = list(pool.map(lambda _: ledger.claim('classify', 'a'), range(16)))
+    assert sum(1 for c in claims if c is not None) == 1
+
+
+def test_invocation_lease_ends_after_the_timeout():
+    class Context:
+        def get_remaining_time_in_millis(self):
+            return 120500
+
+    assert invocation_lease(Context()) == 150
+    assert invocation_lease(None) is None
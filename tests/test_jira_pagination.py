@@ -0,0 +1,155 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from conftest import load_module
+import jira_utils
+from jira_utils import JiraFetchIncomplete, JiraFetchTimedOut, build_jql, fetch_jira_issues, JIRA_TIMESTAMP_FORMAT
+
+UNTIL = datetime(2026, 10, 17, 12, 0, tzinfo=timezone.utc)
+
+
+def issue(number, updated=UNTIL - timedelta(minutes=10)):
+    return {'id': str(number), 'key': f"P-{number}",
+            'fields': {'summary': f"Issue {number}", 'updated': updated.strftime(JIRA_TIMESTAMP_FORMAT)}}
+
+
+class Response:
+    def __init__(self, payload, status_code=200, headers=None):
+        self.payload = payload
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = json.dumps(payload)
+
+    def json(self):
+        return self.payload
+
+
+class FakeSession:
+    """Jira search over a list of issues in creation order, paged by startAt.
+
+    on_search(n) runs before the n-th search request is answered, so a test can change the
+    result set between the pages of one fetch.
+    """
+
+    def __init__(self, issues, page_size=2, on_search=None, time_zone='UTC', retry_after=None):
+        self.issues = list(issues)
+        self.retry_after = retry_after
+        self.page_size = page_size
+        self.on_search = on_search
+        self.time_zone = time_zone
+        self.searches = []
+        self._lock = threading.Lock()
+
+    def get(self, url, headers=None, params=None, auth=None):
+        if url.endswith('/myself'):
+            return Response({'timeZone': self.time_zone})
+        with self._lock:
+            self.searches.append(params)
+            if self.retry_after is not None:
+                return Response({'errorMessages': ['Rate limit exceeded']}, 429, {'Retry-After': self.retry_after})
+            if self.on_search:
+                self.on_search(len(self.searches), self.issues)
+            start = params['startAt']
+            size = min(params.get('maxResults', self.page_size), self.page_size)
+            return Response({'startAt': start, 'maxResults': size, 'total': len(self.issues),
+                             'issues': self.issues[start:start + size]})
+
+
+def fetch(session, **kwargs):
+    return fetch_jira_issues('https://jira.example.com', 'P', 'me@example.com', 'token', session=session,
+                             page_workers=1, **kwargs)
+
+
+def test_build_jql_uses_absolute_bounds_in_the_users_time_zone():
+    since = datetime(2026, 10, 17, 9, 30, tzinfo=timezone.utc)
+    jql = build_jql('P', since=since, until=UNTIL, time_zone=jira_utils.ZoneInfo('Europe/Berlin'))
+    assert jql == ("project = P AND updated >= '2026/10/17 11:25' AND updated < '2026/10/17 14:00' "
+                   "ORDER BY created ASC, key ASC")
+
+
+def test_issue_matching_mid_fetch_does_not_hide_later_issues():
+    def insert_older_issue(search, issues):
+        # An older issue starts matching once the first page has been served, pushing
+        # every later issue one position further.
+        if search == 2:
+            issues.insert(0, issue(0))
+
+    session = FakeSession([issue(n) for n in range(1, 6)], on_search=insert_older_issue)
+    issues = fetch(session, since=UNTIL - timedelta(hours=1), until=UNTIL)
+    assert sorted(i['key'] for i in issues) == ['P-0', 'P-1', 'P-2', 'P-3', 'P-4', 'P-5']
+
+
+def test_pages_past_the_first_total_are_fetched():
+    def create_issue(search, issues):
+        # A new issue after the first page; with created ASC it lands past the first page's total.
+        if search == 2:
+            issues.append(issue(6))
+
+    session = FakeSession([issue(n) for n in range(1, 6)], on_search=create_issue)
+    issues = fetch(session)
+    assert sorted(i['key'] for i in issues) == ['P-1', 'P-2', 'P-3', 'P-4', 'P-5', 'P-6']
+    assert max(params['startAt'] for params in session.searches) >= 4
+
+
+def test_retry_after_past_the_deadline_fails_without_sleeping():
+    session = FakeSession([issue(1)], retry_after='3600')
+    started = time.monotonic()
+    with pytest.raises(JiraFetchTimedOut):
+        fetch(session, deadline=time.monotonic() + 5)
+    assert time.monotonic() - started < 1
+    assert len(session.searches) == 1
+
+
+def test_fetch_gives_up_when_the_result_set_keeps_changing():
+    def remove_issue(search, issues):
+        if search % 2 == 0 and issues:
+            issues.pop(0)
+
+    session = FakeSession([issue(n) for n in range(1, 20)], on_search=remove_issue)
+    with pytest.raises(JiraFetchIncomplete):
+        fetch(session, since=UNTIL - timedelta(hours=1), until=UNTIL)
+    assert len(session.searches) > 1
+
+
+def test_window_is_half_open():
+    since = UNTIL - timedelta(hours=1)
+    session = FakeSession([issue(1, updated=since), issue(2, updated=UNTIL), issue(3)])
+    assert [i['key'] for i in fetch(session, since=since, until=UNTIL)] == ['P-1', 'P-3']
+
+
+def test_watermark_stays_put_when_coverage_is_not_confirmed(monkeypatch):
+    fetch_main = load_module('fetch_main', 'src', 'lambda', 'fetch-jira-issues', 'main.py')
+    watermark = (UNTIL - timedelta(hours=1)).strftime(JIRA_TIMESTAMP_FORMAT)
+    state = {'projects': {'P': {'updated': watermark}}}
+    committed = []
+
+    class Store:
+        def load(self):
+            return state
+
+        def commit(self, value):
+            committed.append(json.loads(json.dumps(value)))
+
+    def shrink(search, issues):
+        if issues:
+            issues.pop()
+
+    monkeypatch.setenv('BUCKET_NAME', 'bucket')
+    monkeypatch.setenv('S3_PREFIX', 'unprocessed')
+    monkeypatch.setenv('JIRA_CREDENTIALS_SECRET', 'secret')
+    monkeypatch.setenv('PROJECT_IDS_COMMA_SEPARATED', 'P')
+    monkeypatch.setattr(fetch_main, 'get_secret', lambda name: {
+        'base_url': 'https://jira.example.com', 'email': 'me@example.com', 'api_key': 'token'})
+    monkeypatch.setattr(fetch_main, 'build_sync_state_store', lambda bucket: Store())
+    monkeypatch.setattr(fetch_main, 'create_session',
+                        lambda pool_size: FakeSession([issue(n) for n in range(1, 40)], on_search=shrink))
+    monkeypatch.setattr(fetch_main, 'upload_to_s3', lambda *args: pytest.fail('nothing should be uploaded'))
+
+    response = fetch_main.sync_projects({}, None)
+    result, = json.loads(response['body'])['results']
+    assert 'kept changing' in result['error']
+    assert committed[-1]['projects']['P']['updated'] == watermark
@@ -0,0 +1,38 @@
+from metrics import Metrics, MAX_VALUES_PER_DATUM
+
+
+class CloudWatch:
+    def __init__(self):
+        self.requests = []
+
+    def put_metric_data(self, Namespace, MetricData):
+        self.requests.append((Namespace, MetricData))
+
+
+def test_flush_to_cloudwatch_sends_values_with_counts_instead_of_logging():
+    lines = []
+    metrics = Metrics(emit=lines.append)
+    metrics.configure(service='glue-etl')
+    for value in [5, 5, 7]:
+        metrics.record('GlueStageTime', value, Stage='ReadInput')
+    metrics.count('GlueRowsWritten', 3)
+    cloudwatch = CloudWatch()
+
+    summary = metrics.flush(cloudwatch=cloudwatch)
+
+    (namespace, datums), = cloudwatch.requests
+    assert namespace == 'JiraTicketClassification'
+    stage = next(d for d in datums if d['MetricName'] == 'GlueStageTime')
+    assert stage['Dimensions'] == [{'Name': 'Service', 'Value': 'glue-etl'}, {'Name': 'Stage', 'Value': 'ReadInput'}]
+    assert (stage['Unit'], stage['Values'], stage['Counts']) == ('Milliseconds', [5, 7], [2.0, 1.0])
+    # Only the summary is logged, and nothing is left buffered.
+    assert len(lines) == 1 and '_aws' not in lines[0]
+    assert summary['GlueStageTime[Stage=ReadInput]']['count'] == 3
+    assert metrics.flush(cloudwatch=cloudwatch) == {}
+
+
+def test_many_distinct_values_are_split_across_datums():
+    metrics = Metrics()
+    for value in range(MAX_VALUES_PER_DATUM + 1):
+        metrics.record('JiraPageTime', value)
+    assert [len(d['Values']) for d in metrics.metric_data()] == [MAX_VALUES_PER_DATUM, 1]
@@ -0,0 +1,78 @@
+import csv
+import io
+import time
+
+import pytest
+
+from local_s3 import LocalS3Client
+from sharding import ShardedRun, record_ranges
+
+BUCKET = 'bucket'
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.fixture
+def s3(tmp_path):
+    return LocalS3Client(str(tmp_path))
+
+
+def planned_run(s3, rows=30, shard_bytes=200):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=['Key', 'Description'])
+    writer.writeheader()
+    writer.writerows({'Key': f"P-{n}", 'Description': f"line one\nline two, \"quoted\" {n}"} for n in range(rows))
+    s3.put_object(Bucket=BUCKET, Key='staged/input.csv', Body=buffer.getvalue().encode('utf-8'))
+    run = ShardedRun(s3, BUCKET)
+    manifest = run.plan('staged/input.csv', shard_bytes)
+    for index in range(len(manifest['shards'])):
+        run.run_shard(manifest, index, lambda shard_rows: shard_rows)
+    return run, manifest
+
+
+def merged_keys(s3, output_key):
+    body = s3.get_object(Bucket=BUCKET, Key=output_key)['Body'].read().decode('utf-8')
+    return [row['Key'] for row in csv.DictReader(io.StringIO(body))]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64, 4096])
+def test_record_ranges_never_cut_inside_quotes(chunk_size):
+    data = b'Key,Description\nP-1,"a\nb"\nP-2,"say ""hi""\n,x"\nP-3,plain\nP-4,"\n"\n'
+    header_end, ranges = record_ranges(chunked(data, chunk_size), shard_bytes=1)
+    assert data[:header_end] == b'Key,Description\n'
+    assert [data[start:end] for start, end in ranges] == [
+        b'P-1,"a\nb"\n', b'P-2,"say ""hi""\n,x"\n', b'P-3,plain\n', b'P-4,"\n"\n']
+
+
+def test_record_ranges_without_trailing_newline():
+    data = b'Key\nP-1\nP-2'
+    header_end, ranges = record_ranges(chunked(data, 3), shard_bytes=100)
+    assert header_end == 4
+    assert ranges == [(4, len(data))]
+
+
+def test_merge_is_taken_over_after_a_crash(s3, monkeypatch):
+    run, manifest = planned_run(s3)
+    assert len(manifest['shards']) > 1
+    concatenate = run._concatenate
+
+    def crash(*args):
+        raise RuntimeError('merge died')
+
+    monkeypatch.setattr(run, '_concatenate', crash)
+    with pytest.raises(RuntimeError):
+        run.merge_if_complete(manifest, lease_seconds=1, owner='first')
+    monkeypatch.setattr(run, '_concatenate', concatenate)
+
+    # Still leased to the invocation that crashed.
+    assert run.merge_if_complete(manifest, lease_seconds=1, owner='second') is None
+    time.sleep(1.1)
+    output_key = run.merge_if_complete(manifest, lease_seconds=60, owner='second')
+    assert merged_keys(s3, output_key) == [f"P-{n}" for n in range(30)]
+
+    lock = run._merge_lock(manifest['run_id']).get('merge', 'lock')
+    assert lock['state'] == 'completed' and lock['result'] == {'output_key': output_key, 'owner': 'second'}
+    # A late duplicate neither merges again nor fails.
+    assert run.merge_if_complete(manifest, lease_seconds=60, owner='third') is None